@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+CLAP CPU Auto-Tuner
+Benchmarks intra-op threads, inter-op threads, parallel model instances
+and audio batch size on this host with synthetic clips, and keeps the
+fastest combination as a profile per (backend, model version, precision,
+machine) that clap_similarity.py applies to CPU runs at startup.
+"""
+
+import json
+import os
+import platform
+import queue
+import time
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+
+# Profiles of every backend tuned on this machine, in one JSON file
+DEFAULT_PROFILE_PATH = Path(os.environ.get(
+    'CLAP_TUNING_PROFILES',
+    Path(os.environ.get('TORCH_HOME', Path.home() / '.cache' / 'torch')) / 'clap_tuning.json'
+))
+
+DEFAULT_BATCH_SIZES = (4, 8, 16, 32)
+
+# Timed batches per configuration, after one warm-up batch
+DEFAULT_BATCHES = 3
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (respects taskset/cgroup affinity where available)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def machine_id() -> str:
+    """Identify the host: name, CPU model and usable core count."""
+    cpu_model = platform.processor() or platform.machine()
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    cpu_model = line.split(':', 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{platform.node()}|{cpu_model}|{available_cpus()} cpus"
+
+
+def _profile_key(backend: str, version: str, precision: str) -> str:
+    return f"{backend}|{version}|{precision}@{machine_id()}"
+
+
+def _read_profiles(path: Path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_profile(backend: str, version: str, precision: str, path=None):
+    """
+    Return the saved profile for this model and precision on this machine,
+    or None. A profile measured on another version or precision is never
+    returned, since the fastest threads and batch size differ between them.
+    """
+    profile = _read_profiles(Path(path or DEFAULT_PROFILE_PATH)).get(_profile_key(backend, version, precision))
+    if profile is None or profile.get('version') != version or profile.get('precision') != precision:
+        return None
+    return profile
+
+
+def save_profile(profile, path=None):
+    """Store a profile from autotune() under its backend, version and precision, keeping other entries."""
+    path = Path(path or DEFAULT_PROFILE_PATH)
+    profiles = _read_profiles(path)
+    profiles[_profile_key(profile['backend'], profile['version'], profile['precision'])] = profile
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(profiles, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def apply_threads(intra_threads: int, interop_threads: int = None):
+    """
+    Set torch's intra-op and inter-op thread counts.
+
+    The inter-op pool can only be sized before torch first uses it, so a
+    late call keeps the current size; returns whether it was applied.
+    """
+    import torch
+
+    torch.set_num_threads(intra_threads)
+    if not interop_threads or torch.get_num_interop_threads() == interop_threads:
+        return True
+    try:
+        torch.set_num_interop_threads(interop_threads)
+        return True
+    except RuntimeError:
+        return False
+
+
+def candidate_configs(cpus: int, threads=None, interop_threads=None, instances=None):
+    """
+    (intra_threads, interop_threads, instances) combinations to benchmark.
+
+    Defaults: powers of two up to the core count for intra-op threads and
+    instances, 1 or 2 inter-op threads, and never more busy threads than
+    cores. Explicitly given lists are combined as they are.
+    """
+    powers = [n for n in (1, 2, 4, 8, 16, 32, 64, 128) if n < cpus] + [cpus]
+    configs = []
+    for intra in threads or powers:
+        for interop in interop_threads or [n for n in (1, 2) if n <= cpus]:
+            for count in instances or powers:
+                if instances or threads or intra * count <= cpus:
+                    configs.append((intra, interop, count))
+    return configs
+
+
+def _trial_worker(backend, version, precision, intra, interop, batch_sizes, batches, barrier, results):
+    """Load one model instance with the given threads and time every batch size in lockstep with its peers."""
+    apply_threads(intra, interop)
+
+    import numpy as np
+    import clap_similarity
+
+    model = clap_similarity.get_model(backend, version, 'cpu', precision)
+    rng = np.random.default_rng(os.getpid())
+    for batch_size in batch_sizes:
+        clips = rng.uniform(-0.5, 0.5, (batch_size, int(model.clip_samples))).astype(np.float32)
+        model.embed_waveforms(clips)  # warm-up
+        barrier.wait()
+        start = time.perf_counter()
+        for _ in range(batches):
+            model.embed_waveforms(clips)
+        results.put((batch_size, time.perf_counter() - start))
+
+
+def benchmark_config(backend: str, version: str, precision: str, intra: int, interop: int, instances: int,
+                     batch_sizes=DEFAULT_BATCH_SIZES, batches: int = DEFAULT_BATCHES):
+    """
+    Aggregate audio throughput (clips/s) per batch size for one thread/instance configuration.
+
+    Each instance is a fresh spawned process, since inter-op threads can
+    only be set once per process; instances start each batch size together
+    and throughput is measured against the slowest of them.
+    """
+    ctx = get_context('spawn')
+    barrier = ctx.Barrier(instances)
+    results = ctx.Queue()
+    workers = [
+        ctx.Process(target=_trial_worker,
+                    args=(backend, version, precision, intra, interop, batch_sizes, batches, barrier, results))
+        for _ in range(instances)
+    ]
+    for worker in workers:
+        worker.start()
+
+    elapsed = {batch_size: [] for batch_size in batch_sizes}
+    try:
+        for _ in range(instances * len(batch_sizes)):
+            while True:
+                try:
+                    batch_size, seconds = results.get(timeout=5)
+                    break
+                except queue.Empty:
+                    if any(worker.exitcode not in (None, 0) for worker in workers):
+                        raise RuntimeError("benchmark worker failed (see its traceback above)") from None
+            elapsed[batch_size].append(seconds)
+    finally:
+        barrier.abort()
+        for worker in workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+
+    return {batch_size: instances * batches * batch_size / max(times) for batch_size, times in elapsed.items()}
+
+
+def autotune(backend: str = 'msclap', version: str = None, precision: str = 'fp32', threads=None,
+             interop_threads=None, instances=None, batch_sizes=DEFAULT_BATCH_SIZES, batches: int = DEFAULT_BATCHES):
+    """
+    Benchmark every candidate configuration; return (best_profile, trials).
+
+    trials holds one row per (configuration, batch size) with its
+    clips_per_second; the profile is the fastest row plus what it was
+    measured on.
+    """
+    import torch
+    import clap_similarity
+
+    version = version or clap_similarity.DEFAULT_VERSIONS[backend]
+    cpus = available_cpus()
+    configs = candidate_configs(cpus, threads, interop_threads, instances)
+    print(f"Tuning {backend} ({version}, {precision}) on {cpus} CPUs: "
+          f"{len(configs)} thread/instance configurations x {len(batch_sizes)} batch sizes")
+
+    trials = []
+    for intra, interop, count in configs:
+        throughput = benchmark_config(backend, version, precision, intra, interop, count, batch_sizes, batches)
+        for batch_size, clips_per_second in throughput.items():
+            trials.append({
+                'intra_threads': intra,
+                'interop_threads': interop,
+                'instances': count,
+                'batch_size': batch_size,
+                'clips_per_second': clips_per_second,
+            })
+            print(f"  threads={intra:<3d} interop={interop:<2d} instances={count:<3d} batch={batch_size:<4d} "
+                  f"{clips_per_second:8.2f} clips/s")
+
+    best = max(trials, key=lambda trial: trial['clips_per_second'])
+    profile = {
+        **best,
+        'backend': backend,
+        'version': version,
+        'precision': precision,
+        'machine': machine_id(),
+        'torch_version': torch.__version__,
+        'tuned_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+    return profile, trials
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+CLAP Batch Planning
+Groups variable-length inputs into batches of similar length. Audio files
+are ordered by the duration read from their headers and batched under a
+budget of decoded seconds, so a batch of long tracks does not decode
+32 full files at once. Texts are ordered by token count, so each batch
+is padded only to its own longest text. Either plan can also be capped
+to a memory estimate (see clap_memory). Plans are lists of input indices;
+callers put results back in input order with scatter_rows.
+"""
+
+import numpy as np
+
+from clap_similarity import DEFAULT_MAX_BATCH_SECONDS
+
+
+def audio_duration(audio_path):
+    """
+    Duration in seconds from the file header, without decoding; None if unknown.
+
+    soundfile reads WAV/FLAC/OGG headers directly. Other formats go through
+    librosa, which asks its audioread backend for the duration.
+    """
+    import soundfile as sf
+
+    try:
+        return sf.info(str(audio_path)).duration
+    except RuntimeError:
+        pass
+    try:
+        import librosa
+        return librosa.get_duration(path=str(audio_path))
+    except Exception:
+        return None
+
+
+def _plan(order, batch_size: int, checks=()):
+    """Cut sorted indices into batches of at most batch_size items for which every check(batch, index) holds."""
+    batches, batch = [], []
+    for index in order:
+        if batch and (len(batch) >= batch_size or not all(fits(batch, index) for fits in checks)):
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def plan_audio_batches(audio_paths, batch_size: int, clip_seconds: float,
+                       max_batch_seconds: float = DEFAULT_MAX_BATCH_SECONDS, file_bytes=None,
+                       max_batch_bytes: float = None):
+    """
+    Return batches of indices into audio_paths, shortest files first.
+
+    A file costs its duration, or clip_seconds if shorter (short files are
+    tiled up to the clip). Files whose duration cannot be read count as
+    one clip. With max_batch_bytes, the file_bytes(seconds) estimates of a
+    batch also stay under it. A single file over either budget gets a
+    batch of its own.
+    """
+    costs = []
+    for path in audio_paths:
+        duration = audio_duration(path)
+        costs.append(max(duration or 0.0, clip_seconds))
+    order = sorted(range(len(costs)), key=lambda i: costs[i])
+    checks = []
+    if max_batch_seconds is not None:
+        checks.append(lambda batch, i: sum(costs[j] for j in batch) + costs[i] <= max_batch_seconds)
+    if max_batch_bytes is not None:
+        sizes = [file_bytes(cost) for cost in costs]
+        checks.append(lambda batch, i: sum(sizes[j] for j in batch) + sizes[i] <= max_batch_bytes)
+    return _plan(order, batch_size, checks)
+
+
+def plan_text_batches(token_counts, batch_size: int, max_batch_tokens: int = None, batch_bytes=None,
+                      max_batch_bytes: float = None):
+    """
+    Return batches of indices into token_counts, shortest texts first.
+
+    With max_batch_tokens, a batch also stops growing once its padded size
+    (rows x longest text) would exceed it; with max_batch_bytes, once
+    batch_bytes(rows, longest text) would.
+    """
+    order = sorted(range(len(token_counts)), key=lambda i: token_counts[i])
+    # Sorted ascending, so the newest text is the longest and sets the padded length
+    checks = []
+    if max_batch_tokens is not None:
+        checks.append(lambda batch, i: (len(batch) + 1) * token_counts[i] <= max_batch_tokens)
+    if max_batch_bytes is not None:
+        checks.append(lambda batch, i: batch_bytes(len(batch) + 1, token_counts[i]) <= max_batch_bytes)
+    return _plan(order, batch_size, checks)
+
+
+def scatter_rows(batches, outputs, count: int):
+    """Stack per-batch outputs into one (count, dim) array in original input order."""
+    result = None
+    for batch, rows in zip(batches, outputs):
+        rows = np.asarray(rows)
+        if result is None:
+            result = np.empty((count,) + rows.shape[1:], dtype=rows.dtype)
+        result[batch] = rows
+    return result if result is not None else np.zeros((0, 0), dtype=np.float32)
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Persistent CLAP embedding cache.
+Stores audio embeddings on disk keyed by a hash of the audio file's bytes,
+the backend, the model version and the preprocessing settings, so clips
+that were already scored are never sent through the audio encoder again.
+Text embeddings are cached the same way, with an in-memory LRU in front.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; eviction then runs unlocked
+    fcntl = None
+
+# Lives next to the msclap/torch model files so it shares the clap-model-cache volume
+DEFAULT_CACHE_DIR = Path(os.environ.get(
+    'CLAP_EMBEDDING_CACHE',
+    Path(os.environ.get('TORCH_HOME', Path.home() / '.cache' / 'torch')) / 'clap_embeddings'
+))
+DEFAULT_CACHE_SIZE_MB = float(os.environ.get('CLAP_EMBEDDING_CACHE_MB', '1024'))
+
+# Text embeddings kept in memory per engine
+DEFAULT_TEXT_MEMORY_ENTRIES = int(os.environ.get('CLAP_TEXT_CACHE_ENTRIES', '4096'))
+
+# Fraction of the size limit kept after an eviction pass
+EVICTION_WATERMARK = 0.9
+
+
+class _DirectoryLock:
+    """Exclusive advisory lock on a file inside the cache directory."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+def _atomic_write(path: Path, write):
+    """Write a file via a temporary sibling and rename, so readers never see partial data."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class EmbeddingStore:
+    """
+    Directory of .npy embeddings with least-recently-used eviction.
+
+    Recency is tracked through file modification times, which are bumped on
+    every hit. Writes are atomic renames so any number of processes can
+    share one store; eviction passes are serialized with a lock file.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._written = 0
+
+    def _path(self, namespace: str, key: str) -> Path:
+        return self.root / namespace / key[:2] / f"{key}.npy"
+
+    def get(self, namespace: str, key: str):
+        path = self._path(namespace, key)
+        try:
+            embedding = np.load(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # Truncated or corrupt entry: drop it and treat as a miss
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # Evicted by another process after we read it
+        return embedding
+
+    def put(self, namespace: str, key: str, embedding):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        _atomic_write(self._path(namespace, key), lambda f: np.save(f, embedding))
+
+        # Only walk the directory once enough new data has been written
+        self._written += embedding.nbytes + 128
+        if self._written > self.max_bytes * (1 - EVICTION_WATERMARK):
+            self._written = 0
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the store fits its size limit."""
+        with _DirectoryLock(self.root / '.lock'):
+            entries = []
+            total = 0
+            for path in self.root.rglob('*.npy'):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return 0
+
+            removed = 0
+            target = self.max_bytes * EVICTION_WATERMARK
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+            return removed
+
+    def reset_namespace(self, namespace: str, fingerprint: str):
+        """
+        Drop a namespace whose checkpoint fingerprint has changed.
+
+        The fingerprint is recorded in a marker file; entries written for a
+        different checkpoint are deleted before the cache is used.
+        """
+        marker = self.root / namespace / 'CHECKPOINT'
+        try:
+            if marker.read_text() == fingerprint:
+                return False
+        except FileNotFoundError:
+            pass
+
+        with _DirectoryLock(self.root / '.lock'):
+            try:
+                if marker.read_text() == fingerprint:
+                    return False  # Another process already reset it
+            except FileNotFoundError:
+                pass
+            shutil.rmtree(self.root / namespace, ignore_errors=True)
+            _atomic_write(marker, lambda f: f.write(fingerprint.encode()))
+        return True
+
+
+def cache_namespace(kind: str, engine) -> str:
+    """
+    Cache namespace for one engine: kind, backend, version, for exported
+    models the runtime, and a hash of the resolved checkpoint path, so two
+    checkpoints (or export directories) with the same backend and version
+    keep separate caches.
+    """
+    runtime = getattr(engine, 'runtime', None)
+    namespace = f"{kind}-{engine.backend}-{engine.version}" + (f"-{runtime}" if runtime else "")
+    if engine.checkpoint_path:
+        namespace += "-" + hashlib.sha256(str(Path(engine.checkpoint_path).resolve()).encode()).hexdigest()[:12]
+    return namespace
+
+
+def checkpoint_fingerprint(checkpoint_path) -> str:
+    """Identify a checkpoint file by path, size and modification time."""
+    if not checkpoint_path:
+        return 'unknown'
+    path = Path(checkpoint_path).resolve()
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return f"{path}:missing"
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def hash_file(path, chunk_bytes: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AudioEmbeddingCache:
+    """
+    On-disk audio embedding cache for one loaded CLAP engine.
+
+    Keys combine the hash of the file's bytes with the engine's precision
+    and preprocessing settings; the namespace is (backend, version, runtime,
+    checkpoint path) and is invalidated whenever the checkpoint file changes.
+    """
+
+    def __init__(self, engine, cache_dir: Path = None, max_bytes: int = None):
+        self.store = EmbeddingStore(
+            cache_dir or DEFAULT_CACHE_DIR,
+            max_bytes if max_bytes is not None else int(DEFAULT_CACHE_SIZE_MB * 1024 * 1024)
+        )
+        self.namespace = cache_namespace('audio', engine)
+        self.settings = {'precision': engine.precision, **engine.preprocessing}
+        self.store.reset_namespace(self.namespace, checkpoint_fingerprint(engine.checkpoint_path))
+        self._audio_hashes = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, audio_path, **settings) -> str:
+        path = Path(audio_path)
+        stat = path.stat()
+        stat_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+        if stat_key not in self._audio_hashes:
+            # The file bytes, not the decoded samples: decoding only for the key would decode every new file twice.
+            # The settings below cover how the bytes are decoded
+            self._audio_hashes[stat_key] = hash_file(path)
+        payload = {'audio': self._audio_hashes[stat_key], **self.settings, **settings}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str):
+        embedding = self.store.get(self.namespace, key)
+        if embedding is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return embedding
+
+    def put(self, key: str, embedding):
+        self.store.put(self.namespace, key, embedding)
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a description for cache lookups (NFC, collapsed whitespace)."""
+    return " ".join(unicodedata.normalize('NFC', text).split())
+
+
+class TextEmbeddingCache:
+    """
+    Text embedding cache for one loaded CLAP engine.
+
+    An in-memory LRU of recently used descriptions sits in front of the
+    on-disk store. Keys are the normalized text plus the engine's
+    precision; the namespace is (backend, version, runtime).
+    """
+
+    def __init__(self, engine, cache_dir: Path = None, max_bytes: int = None,
+                 memory_entries: int = DEFAULT_TEXT_MEMORY_ENTRIES):
+        self.store = EmbeddingStore(
+            cache_dir or DEFAULT_CACHE_DIR,
+            max_bytes if max_bytes is not None else int(DEFAULT_CACHE_SIZE_MB * 1024 * 1024)
+        )
+        self.namespace = cache_namespace('text', engine)
+        self.precision = engine.precision
+        self.store.reset_namespace(self.namespace, checkpoint_fingerprint(engine.checkpoint_path))
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        payload = {'text': normalize_text(text), 'precision': self.precision}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def _remember(self, key: str, embedding):
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        embedding = self._memory.get(key)
+        if embedding is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+        embedding = self.store.get(self.namespace, key)
+        if embedding is None:
+            self.misses += 1
+            return None
+        self._remember(key, embedding)
+        self.hits += 1
+        return embedding
+
+    def put(self, key: str, embedding):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        self._remember(key, embedding)
+        self.store.put(self.namespace, key, embedding)
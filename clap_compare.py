@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+CLAP Precision Comparison
+Scores a reference set of audio/description pairs with a reference and a
+candidate precision (e.g. fp32 vs int8) and reports what the candidate
+costs: embedding speed, model memory, score deltas and ranking agreement.
+The same report compares silence trimming against untrimmed audio.
+"""
+
+import time
+import numpy as np
+
+import clap_similarity
+
+
+def rank_correlation(a, b) -> float:
+    """Spearman rank correlation of two score vectors (ties broken by position)."""
+    a = np.asarray(a, dtype=np.float64).ravel()
+    b = np.asarray(b, dtype=np.float64).ravel()
+    if len(a) < 2:
+        return float('nan')
+    rank_a = np.argsort(np.argsort(a)).astype(np.float64)
+    rank_b = np.argsort(np.argsort(b)).astype(np.float64)
+    return float(np.corrcoef(rank_a, rank_b)[0, 1])
+
+
+def timed_embeddings(model, audio_paths, texts, batch_size: int = 32, text_batch_size: int = 256, repeats: int = 3,
+                     silence_db: float = None):
+    """
+    Embed the reference set `repeats` times with the cache disabled.
+
+    Returns (audio_embeddings, text_embeddings, audio_seconds, text_seconds),
+    with the fastest run of each encoder; the first run also warms up the model.
+    With silence_db, the model's silence totals are those of the last run.
+    """
+    audio_times = []
+    text_times = []
+    for _ in range(max(1, repeats)):
+        model.silence_stats = None
+        start = time.perf_counter()
+        audio_embeddings = clap_similarity.embed_audio_batched(model, audio_paths, batch_size, use_cache=False,
+                                                               silence_db=silence_db)
+        audio_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        text_embeddings = clap_similarity.embed_text_batched(model, texts, text_batch_size, use_cache=False)
+        text_times.append(time.perf_counter() - start)
+    return audio_embeddings, text_embeddings, min(audio_times), min(text_times)
+
+
+def _timed_run(model, audio_paths, texts, batch_size: int, text_batch_size: int, repeats: int,
+               silence_db: float = None):
+    """Embeddings, timings, model memory and scores of one configuration."""
+    audio, text, audio_s, text_s = timed_embeddings(model, audio_paths, texts, batch_size, text_batch_size, repeats,
+                                                    silence_db)
+    return {
+        'audio': audio,
+        'text': text,
+        'audio_seconds': audio_s,
+        'text_seconds': text_s,
+        'memory_bytes': model.memory_bytes,
+        'paired': clap_similarity.paired_cosine_similarity(audio, text),
+        'matrix': clap_similarity.cosine_similarity_matrix(audio, text),
+    }
+
+
+def compare_precisions(backend: str, audio_paths, texts, version: str = None, device: str = 'cpu',
+                       reference: str = 'fp32', candidate: str = 'int8', batch_size: int = 32,
+                       text_batch_size: int = 256, repeats: int = 3, use_compile: bool = False):
+    """
+    Score (audio_paths[i], texts[i]) pairs at two precisions and compare.
+
+    Paired scores measure the absolute error; the full audio x text matrix
+    measures whether text-to-audio rankings survive the change in precision.
+    """
+    runs = {}
+    for precision in (reference, candidate):
+        model = clap_similarity.get_model(backend, version, device, precision, use_compile)
+        runs[precision] = _timed_run(model, audio_paths, texts, batch_size, text_batch_size, repeats)
+    return _summarize(backend, reference, candidate, runs[reference], runs[candidate])
+
+
+def compare_trimming(backend: str, audio_paths, texts, version: str = None, device: str = 'cpu',
+                     precision: str = 'fp32', silence_db: float = clap_similarity.DEFAULT_SILENCE_DB,
+                     batch_size: int = 32, text_batch_size: int = 256, repeats: int = 3, use_compile: bool = False):
+    """
+    Score (audio_paths[i], texts[i]) pairs with and without silence trimming and compare.
+
+    Both runs decode through clap_pipeline.decode_clip, so trimming is the
+    only difference. The report adds the audio trimmed and the encoder
+    inputs skipped under `silence`.
+    """
+    model = clap_similarity.get_model(backend, version, device, precision, use_compile)
+    runs = {}
+    # No frame is quieter than -inf dB: the untrimmed run takes the trimming code path without trimming anything
+    for label, level in (('untrimmed', float('-inf')), ('trimmed', silence_db)):
+        runs[label] = _timed_run(model, audio_paths, texts, batch_size, text_batch_size, repeats, level)
+    report = _summarize(backend, 'untrimmed', 'trimmed', runs['untrimmed'], runs['trimmed'])
+    stats = clap_similarity.get_silence_stats(model)
+    report['silence'] = dict(vars(stats), silence_db=silence_db, summary=stats.summary())
+    return report
+
+
+def _summarize(backend: str, reference: str, candidate: str, ref, cand):
+    """Report of a candidate run against a reference run of the same pairs."""
+    deltas = cand['paired'] - ref['paired']
+    column_correlations = [rank_correlation(ref['matrix'][:, j], cand['matrix'][:, j])
+                           for j in range(ref['matrix'].shape[1])]
+
+    return {
+        'backend': backend,
+        'reference': reference,
+        'candidate': candidate,
+        'pairs': len(ref['paired']),
+        'audio_seconds': (ref['audio_seconds'], cand['audio_seconds']),
+        'text_seconds': (ref['text_seconds'], cand['text_seconds']),
+        'audio_speedup': ref['audio_seconds'] / cand['audio_seconds'],
+        'text_speedup': ref['text_seconds'] / cand['text_seconds'],
+        'memory_bytes': (ref['memory_bytes'], cand['memory_bytes']),
+        'audio_embedding_cosine': float(np.mean(clap_similarity.paired_cosine_similarity(ref['audio'], cand['audio']))),
+        'text_embedding_cosine': float(np.mean(clap_similarity.paired_cosine_similarity(ref['text'], cand['text']))),
+        'mean_abs_delta': float(np.mean(np.abs(deltas))),
+        'max_abs_delta': float(np.max(np.abs(deltas))),
+        'mean_delta': float(np.mean(deltas)),
+        'pair_rank_correlation': rank_correlation(ref['paired'], cand['paired']),
+        'retrieval_rank_correlation': float(np.nanmean(column_correlations)),
+        'top1_agreement': float(np.mean(np.argmax(ref['matrix'], axis=0) == np.argmax(cand['matrix'], axis=0))),
+    }
+
+
+def print_report(report):
+    """Print a comparison report produced by compare_precisions."""
+    ref, cand = report['reference'], report['candidate']
+    ref_mb, cand_mb = (b / 1024 / 1024 for b in report['memory_bytes'])
+
+    print(f"{report['backend']}: {cand} vs {ref} on {report['pairs']} pairs")
+    print("-" * 60)
+    print(f"Audio embedding:  {report['audio_seconds'][0]:.3f}s -> {report['audio_seconds'][1]:.3f}s "
+          f"({report['audio_speedup']:.2f}x)")
+    print(f"Text embedding:   {report['text_seconds'][0]:.3f}s -> {report['text_seconds'][1]:.3f}s "
+          f"({report['text_speedup']:.2f}x)")
+    if 'silence' in report:
+        print(report['silence']['summary'])
+    else:
+        print(f"Model memory:     {ref_mb:.1f} MB -> {cand_mb:.1f} MB ({ref_mb - cand_mb:.1f} MB saved)")
+    print("-" * 60)
+    print(f"Embedding cosine to {ref}: audio {report['audio_embedding_cosine']:.4f}, "
+          f"text {report['text_embedding_cosine']:.4f}")
+    print(f"Score delta:      mean {report['mean_delta']:+.4f}, mean |d| {report['mean_abs_delta']:.4f}, "
+          f"max |d| {report['max_abs_delta']:.4f}")
+    print(f"Rank correlation: pairs {report['pair_rank_correlation']:.4f}, "
+          f"per-text retrieval {report['retrieval_rank_correlation']:.4f}")
+    print(f"Top-1 agreement:  {report['top1_agreement']:.1%}")
+    print("-" * 60)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+CLAP Compiled Encoders
+Wraps a loaded engine's audio and text encoders with torch.compile. Inputs
+are padded to a small set of fixed shapes (batch-size buckets, plus token
+length buckets for text) so each bucket is compiled once, and a warm-up
+pass compiles them all when the model is loaded instead of on the first
+real batches.
+"""
+
+import time
+from collections.abc import Mapping
+import numpy as np
+import torch
+
+# Batch sizes the encoders are compiled for; larger batches run in chunks of the largest
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+# Token lengths the text encoder is compiled for. Both backends pad to 77
+# tokens; msclap widens batches holding longer texts, which are padded up to
+# the next bucket and compiled the first time they are seen.
+LENGTH_BUCKETS = (77, 128, 256, 512, 1024)
+
+WARMUP_TEXT = "warm-up"
+
+
+def _bucket(size: int, buckets) -> int:
+    """Smallest bucket that holds size (size itself if it is larger than all of them)."""
+    for bucket in buckets:
+        if size <= bucket:
+            return bucket
+    return size
+
+
+def _map_tensors(fn, value, inplace: bool = False):
+    """
+    Apply fn to every tensor in nested tuples, lists and mappings.
+
+    Mappings are copied to plain dicts, or with inplace updated where they
+    are, which keeps the type of outputs such as transformers' ModelOutput.
+    """
+    if isinstance(value, torch.Tensor):
+        return fn(value)
+    if isinstance(value, (tuple, list)):
+        return type(value)(_map_tensors(fn, item, inplace) for item in value)
+    if isinstance(value, Mapping):
+        if not inplace:
+            return {key: _map_tensors(fn, item) for key, item in value.items()}
+        for key in list(value.keys()):
+            value[key] = _map_tensors(fn, value[key], inplace)
+        return value
+    return value
+
+
+def _first_tensor(value):
+    if isinstance(value, torch.Tensor):
+        return value
+    items = value.values() if isinstance(value, Mapping) else value if isinstance(value, (tuple, list)) else ()
+    for item in items:
+        tensor = _first_tensor(item)
+        if tensor is not None:
+            return tensor
+    return None
+
+
+def _concat(outputs, chunk_rows):
+    """Join per-chunk outputs along the batch axis; chunk_rows[i] is the batch size of chunk i."""
+    first = outputs[0]
+    if isinstance(first, torch.Tensor):
+        is_batch = all(out.dim() and out.shape[0] == rows for out, rows in zip(outputs, chunk_rows))
+        return torch.cat(outputs) if is_batch else first
+    if isinstance(first, (tuple, list)):
+        return type(first)(_concat(list(items), chunk_rows) for items in zip(*outputs))
+    if isinstance(first, Mapping):
+        for key in list(first.keys()):
+            first[key] = _concat([output[key] for output in outputs], chunk_rows)
+        return first
+    return first
+
+
+class BucketedEncoder(torch.nn.Module):
+    """
+    Run an encoder through torch.compile at a fixed set of input shapes.
+
+    Every tensor argument whose leading dimension is the batch is padded to
+    the next batch bucket by repeating its last row, and outputs are sliced
+    back to the real rows. With length_buckets, 2-D integer inputs (token
+    ids and attention masks) are also right-padded with zeros to the next
+    length bucket; the padding is masked out, so embeddings do not change.
+    """
+
+    def __init__(self, encoder, batch_buckets=BATCH_BUCKETS, length_buckets=None):
+        super().__init__()
+        self.encoder = encoder
+        self.batch_buckets = tuple(sorted(batch_buckets))
+        self.length_buckets = tuple(sorted(length_buckets)) if length_buckets else None
+        # dynamic=False: one specialized graph per bucket instead of a symbolic-shape graph.
+        # Kept out of the module tree so the weights are not registered twice.
+        self.__dict__['compiled'] = torch.compile(encoder.forward, dynamic=False)
+
+    def _pad(self, tensor, rows: int, bucket: int):
+        if tensor.dim() and tensor.shape[0] == rows:
+            if self.length_buckets and tensor.dim() == 2 and not tensor.is_floating_point():
+                length = _bucket(tensor.shape[1], self.length_buckets)
+                if length != tensor.shape[1]:
+                    tensor = torch.nn.functional.pad(tensor, (0, length - tensor.shape[1]))
+            if bucket != rows:
+                tensor = torch.cat([tensor, tensor[-1:].expand(bucket - rows, *tensor.shape[1:])])
+        return tensor
+
+    def _run(self, rows: int, args, kwargs):
+        bucket = _bucket(rows, self.batch_buckets)
+        pad = lambda tensor: self._pad(tensor, rows, bucket)
+        output = self.compiled(*_map_tensors(pad, args), **_map_tensors(pad, kwargs))
+        if bucket == rows:
+            return output
+        return _map_tensors(lambda t: t[:rows] if t.dim() and t.shape[0] == bucket else t, output, inplace=True)
+
+    def forward(self, *args, **kwargs):
+        first = _first_tensor([args, kwargs])
+        if first is None or not first.dim():
+            return self.compiled(*args, **kwargs)
+
+        rows = first.shape[0]
+        largest = self.batch_buckets[-1]
+        if rows <= largest:
+            return self._run(rows, args, kwargs)
+
+        starts = range(0, rows, largest)
+        chunk_rows = [min(largest, rows - start) for start in starts]
+        outputs = []
+        for start, size in zip(starts, chunk_rows):
+            chunk = lambda t: t[start:start + size] if t.dim() and t.shape[0] == rows else t
+            outputs.append(self._run(size, _map_tensors(chunk, args), _map_tensors(chunk, kwargs)))
+        return _concat(outputs, chunk_rows)
+
+
+def engine_encoders(engine):
+    """
+    Return [(parent_module, attribute, is_text)] for the encoders of a loaded engine.
+
+    These are the submodules every embedding path goes through, so wrapping
+    them covers file, waveform and text inputs alike. Towers the engine was
+    loaded without are left out.
+    """
+    if engine.backend == 'msclap':
+        parent, names = engine.model.clap, ('audio_encoder', 'caption_encoder')
+    elif engine.backend == 'laion':
+        parent, names = engine.model.model, ('audio_branch', 'text_branch')
+    else:
+        raise ValueError(f"Backend '{engine.backend}' cannot be compiled; it runs exported graphs")
+    return [(parent, name, is_text) for name, is_text in zip(names, (False, True))
+            if getattr(parent, name, None) is not None]
+
+
+def compile_engine(engine, batch_buckets=BATCH_BUCKETS, length_buckets=LENGTH_BUCKETS, warmup: bool = True):
+    """
+    Swap the engine's encoders for bucketed torch.compile wrappers, in place.
+
+    With warmup, every batch bucket is run once for each loaded tower (text
+    at the shortest length bucket), so compilation happens here rather than in the
+    middle of a job. Returns the warm-up time in seconds.
+    """
+    if getattr(engine, 'compiled', None):
+        return 0.0
+
+    limit = 'recompile_limit' if hasattr(torch._dynamo.config, 'recompile_limit') else 'cache_size_limit'
+    needed = len(batch_buckets) * len(length_buckets)
+    setattr(torch._dynamo.config, limit, max(getattr(torch._dynamo.config, limit), needed))
+
+    encoders = engine_encoders(engine)
+    for parent, name, is_text in encoders:
+        encoder = getattr(parent, name)
+        setattr(parent, name, BucketedEncoder(encoder, batch_buckets, length_buckets if is_text else None))
+    engine.compiled = tuple(batch_buckets)
+    if not warmup:
+        return 0.0
+
+    print(f"Compiling encoders for batch sizes {', '.join(map(str, batch_buckets))}...")
+    start = time.perf_counter()
+    rng = np.random.default_rng(0)
+    with torch.no_grad():
+        for size in batch_buckets:
+            for _, _, is_text in encoders:
+                if is_text:
+                    engine.embed_text([WARMUP_TEXT] * size)
+                else:
+                    engine.embed_waveforms(rng.uniform(-0.1, 0.1, (size, int(engine.clip_samples)))
+                                           .astype(np.float32))
+    elapsed = time.perf_counter() - start
+    print(f"Compiled in {elapsed:.1f}s")
+    return elapsed
@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+"""
+CLAP Dataset Evaluation
+Scores every audio file of one or more datasets against its own
+description. All audio and all descriptions are embedded in one batched
+pass each. Writes the text summaries under
+data_sanity_checks/results/positive_tests plus a JSON report per dataset.
+
+In negatives mode every audio file is scored against every description
+across all datasets, reported as per-dataset positive/negative
+separation, Recall@K, mAP and ROC-AUC under
+data_sanity_checks/results/negative_tests.
+
+Scores are kept in a results ledger (see clap_ledger), so a rerun only
+scores pairs that are new or whose audio changed, and reports are built
+from the ledger.
+"""
+
+import json
+from pathlib import Path
+import numpy as np
+
+import clap_similarity
+
+REPO_DIR = Path(__file__).resolve().parent
+
+# Default directory for the per-dataset .txt and .json reports
+RESULTS_DIR = REPO_DIR / "data_sanity_checks" / "results" / "positive_tests"
+
+# Default directory for the cross-dataset and negative sample reports
+NEGATIVE_RESULTS_DIR = REPO_DIR / "data_sanity_checks" / "results" / "negative_tests"
+
+# Default results ledger, shared by both modes (positive pairs are cells of the negatives matrix)
+LEDGER_PATH = REPO_DIR / "data_sanity_checks" / "results" / "ledger.sqlite3"
+
+# Cutoffs reported as Recall@K
+RECALL_KS = (1, 5, 10)
+
+# Bundled datasets: directory under test_data, audio pattern, report title and file stem
+DATASETS = {
+    'dcase': {'dir': 'dcase', 'pattern': '*.wav', 'title': 'DCASE', 'stem': 'dcase_results'},
+    'librispeech': {'dir': 'librispeech', 'pattern': '*.flac', 'title': 'LibriSpeech', 'stem': 'librispeech_results'},
+    'musiccaps': {'dir': 'music_caps', 'pattern': '*.wav', 'title': 'MusicCaps', 'stem': 'musiccaps_results'},
+}
+
+# Single-description reports of the negative_tests scripts, read from the cross-dataset
+# matrix: the description file, the datasets whose audio it is scored against (in report
+# order), the report wording and the output file
+NEGATIVE_SAMPLES = {
+    'dcase': {
+        'description': 'dev_001_description.txt',
+        'against': ['librispeech', 'musiccaps'],
+        'heading': 'NEGATIVE SAMPLE TEST RESULTS',
+        'summary_title': 'NEGATIVE SAMPLE TEST - SUMMARY STATISTICS',
+        'expected': ('DCASE audio event descriptions', 'speech (LibriSpeech) and music (MusicCaps)'),
+        'file': 'negative_sample_test_results_dcase.txt',
+    },
+    'librispeech': {
+        'description': '174-168635-0007_description.txt',
+        'against': ['musiccaps', 'dcase'],
+        'heading': 'NEGATIVE SAMPLE TEST RESULTS (LibriSpeech Description)',
+        'summary_title': 'NEGATIVE SAMPLE TEST (LibriSpeech) - SUMMARY STATISTICS',
+        'expected': ('speech descriptions', 'music (MusicCaps) and audio events (DCASE)'),
+        'file': 'negative_sample_librispeech_test_results.txt',
+    },
+    'musiccaps': {
+        'description': '-0Gj8-vB1q4_description.txt',
+        'against': ['librispeech', 'dcase'],
+        'heading': 'NEGATIVE SAMPLE TEST RESULTS (MusicCaps Description)',
+        'summary_title': 'NEGATIVE SAMPLE TEST (MusicCaps) - SUMMARY STATISTICS',
+        'expected': ('music descriptions', 'speech (LibriSpeech) and audio events (DCASE)'),
+        'file': 'negative_sample_test_results_musiccaps.txt',
+    },
+}
+
+
+class Dataset:
+    """Audio files of one evaluation set, paired with their descriptions."""
+
+    def __init__(self, name: str, title: str, audio_files, pairs, stem: str = None):
+        self.name = name
+        self.title = title
+        # Every audio file found, including those without a description
+        self.audio_files = list(audio_files)
+        # (audio_path, description) for the files that can be scored
+        self.pairs = list(pairs)
+        self.stem = stem or f"{name}_results"
+
+
+def _paired(name: str, title: str, audio_files, stem: str = None) -> Dataset:
+    from clap_index import find_caption
+
+    pairs = []
+    for audio_file in audio_files:
+        description = find_caption(audio_file)
+        if description is None:
+            print(f"Warning: No description file found for {Path(audio_file).name}")
+            continue
+        pairs.append((str(audio_file), description))
+    return Dataset(name, title, audio_files, pairs, stem)
+
+
+def load_dataset(source: str) -> Dataset:
+    """
+    Resolve a bundled dataset name (dcase, librispeech, musiccaps) or a
+    directory of audio files with <stem>_description.txt next to them.
+    """
+    from clap_index import collect_audio_files
+
+    if source in DATASETS:
+        spec = DATASETS[source]
+        audio_files = sorted((REPO_DIR / "test_data" / spec['dir']).glob(spec['pattern']))
+        return _paired(source, spec['title'], audio_files, spec['stem'])
+    root = Path(source)
+    return _paired(root.name, root.name, collect_audio_files([root]))
+
+
+def load_manifest_dataset(manifest_path: str) -> Dataset:
+    """A dataset of the usable pairs in a CSV/JSONL manifest (see clap_similarity.read_manifest)."""
+    records = list(clap_similarity.read_manifest(manifest_path))
+    for record in records:
+        if 'error' in record:
+            print(f"Warning: Skipping manifest line {record['line']}: {record['error']}")
+    name = Path(manifest_path).stem
+    pairs = [(record['audio'], record['text']) for record in records if 'error' not in record]
+    return Dataset(name, name, [record['audio'] for record in records if record.get('audio')], pairs)
+
+
+def summary_statistics(scores) -> dict:
+    scores = np.asarray(scores, dtype=np.float64)
+    return {
+        'count': int(len(scores)),
+        'mean': float(np.mean(scores)),
+        'std': float(np.std(scores)),
+        'min': float(np.min(scores)),
+        'max': float(np.max(scores)),
+        'median': float(np.median(scores)),
+    }
+
+
+def summary_lines(stats: dict):
+    """The SUMMARY STATISTICS block of a text report."""
+    return [
+        "=" * 80,
+        "SUMMARY STATISTICS",
+        "=" * 80,
+        f"Number of samples: {stats['count']}",
+        f"Mean similarity: {stats['mean']:.4f}",
+        f"Std deviation: {stats['std']:.4f}",
+        f"Min similarity: {stats['min']:.4f}",
+        f"Max similarity: {stats['max']:.4f}",
+        f"Median similarity: {stats['median']:.4f}",
+        "=" * 80,
+    ]
+
+
+def score_cells(model, cells, ledger=None, batch_size: int = 32, text_batch_size: int = 256, use_cache: bool = True,
+                decode_workers: int = 0, max_batch_seconds: float = clap_similarity.DEFAULT_MAX_BATCH_SECONDS,
+                silence_db: float = None) -> dict:
+    """
+    Cosine similarity of each (audio_path, description) cell; returns {cell: score}.
+
+    With a ledger (clap_ledger.ResultsLedger), cells it already holds for
+    this model and these settings are read from it, and each batch of new
+    scores is committed to it as soon as the batch leaves the audio
+    encoder. The missing cells' descriptions are embedded first, then their
+    audio goes through embed_audio_batched in a single call, so batches
+    fill up across datasets.
+    """
+    from clap_ledger import hash_text, ledger_settings
+
+    cells = list(dict.fromkeys(cells))
+    scores = {}
+    if ledger is not None:
+        settings = {'decode': 'pipeline'} if decode_workers or silence_db is not None else {}
+        if silence_db is not None:
+            settings['silence_db'] = silence_db
+        settings = ledger_settings(model, **settings)
+        audio_hashes = {audio: ledger.audio_hash(audio) for audio in dict.fromkeys(audio for audio, _ in cells)}
+        text_hashes = {text: hash_text(text) for text in dict.fromkeys(text for _, text in cells)}
+        recorded = ledger.scores(model.backend, model.version, settings)
+        for audio, text in cells:
+            score = recorded.get((audio_hashes[audio], text_hashes[text]))
+            if score is not None:
+                scores[(audio, text)] = score
+        print(f"Ledger: {len(scores)} of {len(cells)} scores already recorded in {ledger.path}; "
+              f"scoring {len(cells) - len(scores)}")
+
+    texts_by_audio = {}
+    for audio, text in cells:
+        if (audio, text) not in scores:
+            texts_by_audio.setdefault(audio, []).append(text)
+    if not texts_by_audio:
+        return scores
+    texts = list(dict.fromkeys(text for audio_texts in texts_by_audio.values() for text in audio_texts))
+    text_embeddings = clap_similarity.embed_text_batched(model, texts, text_batch_size, use_cache=use_cache)
+    text_rows = dict(zip(texts, clap_similarity.normalize_embeddings(text_embeddings)))
+
+    def record(paths, embeddings):
+        entries = []
+        for audio, row in zip(paths, clap_similarity.normalize_embeddings(embeddings)):
+            for text in texts_by_audio.pop(audio, ()):
+                scores[(audio, text)] = float(row @ text_rows[text])
+                entries.append((audio, text))
+        if ledger is not None and entries:
+            ledger.record(model.backend, model.version, settings,
+                          [(audio_hashes[audio], text_hashes[text], scores[(audio, text)], audio, text)
+                           for audio, text in entries])
+
+    audio_paths = list(texts_by_audio)
+    audio_embeddings = clap_similarity.embed_audio_batched(model, audio_paths, batch_size, use_cache=use_cache,
+                                                           decode_workers=decode_workers,
+                                                           max_batch_seconds=max_batch_seconds,
+                                                           silence_db=silence_db, on_batch=record)
+    # Embeddings that came from the cache never passed through on_batch
+    record(audio_paths, audio_embeddings)
+    return scores
+
+
+def evaluate_datasets(model, datasets, ledger=None, **embed_options):
+    """
+    Score each dataset's pairs; returns one result dict per dataset that has any.
+
+    All pairs go through score_cells together (embed_options and ledger
+    are passed on). Each result holds the positive `scores` of its pairs
+    and their `summary` statistics.
+    """
+    scores = score_cells(model, [pair for dataset in datasets for pair in dataset.pairs], ledger, **embed_options)
+
+    results = []
+    for dataset in datasets:
+        if not dataset.pairs:
+            print(f"Error: No audio files with descriptions found for {dataset.title}")
+            continue
+        dataset_scores = np.array([scores[pair] for pair in dataset.pairs])
+        results.append({
+            'dataset': dataset,
+            'scores': dataset_scores,
+            'summary': summary_statistics(dataset_scores),
+        })
+    return results
+
+
+def recall_at_k(matrix, relevant, ks=RECALL_KS) -> dict:
+    """
+    Share of query rows with a relevant column among their k highest
+    scores, for each k. Negatives tied with a relevant score rank above it.
+    """
+    best = np.where(relevant, matrix, -np.inf).max(axis=1)
+    rank = (np.where(relevant, -np.inf, matrix) >= best[:, None]).sum(axis=1) + 1
+    return {f"R@{k}": float(np.mean(rank <= k)) for k in ks}
+
+
+def mean_average_precision(matrix, relevant) -> float:
+    """Mean over query rows of the average precision of ranking the columns by score (ties as in recall_at_k)."""
+    order = np.lexsort((relevant, -matrix), axis=1)
+    hits = np.take_along_axis(relevant, order, axis=1)
+    precision = np.cumsum(hits, axis=1) / np.arange(1, matrix.shape[1] + 1)
+    return float(np.mean((precision * hits).sum(axis=1) / hits.sum(axis=1)))
+
+
+def roc_auc(positives, negatives):
+    """
+    Area under the ROC curve of separating positive from negative scores:
+    the chance a positive outscores a negative, ties counting half. None if
+    either side is empty.
+    """
+    if len(positives) == 0 or len(negatives) == 0:
+        return None
+    scores = np.concatenate([positives, negatives])
+    _, inverse, counts = np.unique(scores, return_inverse=True, return_counts=True)
+    ranks = (np.cumsum(counts) - (counts - 1) / 2)[inverse]
+    n = len(positives)
+    return float((ranks[:n].sum() - n * (n + 1) / 2) / (n * len(negatives)))
+
+
+def _retrieval(matrix, relevant, ks):
+    return {**recall_at_k(matrix, relevant, ks), 'mAP': mean_average_precision(matrix, relevant)}
+
+
+def _separation(name, title, matrix, relevant, rows, columns, owner, ks):
+    """Metrics of the audio rows (and description columns) selected by the masks rows and columns."""
+    block, block_relevant = matrix[rows], relevant[rows]
+    same = owner[rows][:, None] == owner[None, :]
+    positives = block[block_relevant]
+    within = block[~block_relevant & same]
+    across = block[~same]
+    return {
+        'dataset': name,
+        'title': title,
+        'pairs': int(rows.sum()),
+        'positives': summary_statistics(positives),
+        'negatives_within': summary_statistics(within) if len(within) else None,
+        'negatives_across': summary_statistics(across) if len(across) else None,
+        'separation': float(np.mean(positives) - np.mean(across)) if len(across) else None,
+        'roc_auc': roc_auc(positives, block[~block_relevant]),
+        'roc_auc_across': roc_auc(positives, across),
+        'audio_to_text': _retrieval(block, block_relevant, ks),
+        'text_to_audio': _retrieval(matrix[:, columns].T, relevant[:, columns].T, ks),
+    }
+
+
+def cross_dataset_evaluation(model, datasets, ledger=None, ks=RECALL_KS, **embed_options) -> dict:
+    """
+    Score every audio file against every description of all datasets.
+
+    Row and column i of the `matrix` are the audio and description of the
+    i-th pair, datasets in order; its cells go through score_cells
+    (embed_options and ledger are passed on). A cell is a positive when
+    its audio and description come from one pair, or share the audio file
+    or the exact description; every other cell is a negative, either
+    within the audio's dataset or across datasets. Audio-to-text retrieval
+    ranks all descriptions for each audio file, text-to-audio all audio
+    files for each description. Returns the matrix with per-dataset and
+    overall metrics, the mean similarity of each audio dataset to each
+    description dataset and which dataset each audio file's best
+    description is from.
+    """
+    datasets = [dataset for dataset in datasets if dataset.pairs]
+    pairs = [pair for dataset in datasets for pair in dataset.pairs]
+    owner = np.repeat(np.arange(len(datasets)), [len(dataset.pairs) for dataset in datasets])
+    audio_index = {audio: i for i, audio in enumerate(dict.fromkeys(audio for audio, _ in pairs))}
+    text_index = {text: i for i, text in enumerate(dict.fromkeys(text for _, text in pairs))}
+    scores = score_cells(model, [(audio, text) for audio in audio_index for text in text_index], ledger,
+                         **embed_options)
+    matrix = np.array([[scores[(audio, text)] for _, text in pairs] for audio, _ in pairs], dtype=np.float32)
+
+    audio_ids = np.array([audio_index[audio] for audio, _ in pairs])
+    text_ids = np.array([text_index[text] for _, text in pairs])
+    relevant = (audio_ids[:, None] == audio_ids[None, :]) | (text_ids[:, None] == text_ids[None, :])
+
+    everything = np.ones(len(pairs), dtype=bool)
+    per_dataset = [_separation(dataset.name, dataset.title, matrix, relevant, owner == i, owner == i, owner, ks)
+                   for i, dataset in enumerate(datasets)]
+    overall = _separation('all', 'All', matrix, relevant, everything, everything, owner, ks)
+
+    mean_similarity = [[float(np.mean(matrix[owner == i][:, owner == j])) for j in range(len(datasets))]
+                       for i in range(len(datasets))]
+    best_owner = owner[np.argmax(matrix, axis=1)]
+    top1 = [[int(np.sum(best_owner[owner == i] == j)) for j in range(len(datasets))] for i in range(len(datasets))]
+    return {
+        'datasets': datasets,
+        'pairs': pairs,
+        'matrix': matrix,
+        'per_dataset': per_dataset,
+        'overall': overall,
+        'mean_similarity': mean_similarity,
+        'top1': top1,
+        'ks': list(ks),
+    }
+
+
+def print_result(result):
+    dataset = result['dataset']
+    print(f"Evaluating {len(dataset.audio_files)} {dataset.title} samples...")
+    print("=" * 80)
+    for (audio, description), score in zip(dataset.pairs, result['scores']):
+        print(f"{Path(audio).name}: {score:.4f}")
+        print(f"  Description: {description}")
+        print("-" * 80)
+    print("\n" + "\n".join(summary_lines(result['summary'])))
+
+
+def write_result(result, model, results_dir=RESULTS_DIR):
+    """Write <stem>.txt (per-file scores and summary statistics) and <stem>.json into results_dir."""
+    dataset = result['dataset']
+    results_dir = Path(results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+
+    text_path = results_dir / f"{dataset.stem}.txt"
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write(f"{dataset.title} CLAP Similarity Evaluation Results\n")
+        f.write(f"Evaluating {len(dataset.audio_files)} samples\n")
+        f.write("=" * 80 + "\n\n")
+        for (audio, description), score in zip(dataset.pairs, result['scores']):
+            f.write(f"{Path(audio).name}: {score:.4f} - {description}\n")
+        f.write("\n")
+        for line in summary_lines(result['summary']):
+            f.write(line + "\n")
+
+    json_path = results_dir / f"{dataset.stem}.json"
+    report = {
+        'dataset': dataset.name,
+        'backend': model.backend,
+        'version': model.version,
+        'precision': model.precision,
+        'audio_files': len(dataset.audio_files),
+        'summary': result['summary'],
+        'samples': [{'audio': audio, 'description': description, 'similarity': float(score)}
+                    for (audio, description), score in zip(dataset.pairs, result['scores'])],
+    }
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return text_path, json_path
+
+
+def _value(value, spec='.4f'):
+    return '-' if value is None else format(value, spec)
+
+
+def cross_dataset_lines(result):
+    """The text report of a cross_dataset_evaluation result."""
+    datasets = result['datasets']
+    titles = [dataset.title for dataset in datasets]
+    width = max([len(title) for title in titles] + [len('Dataset')]) + 2
+    column = max([len(title) for title in titles] + [8]) + 2
+    lines = [
+        "=" * 80,
+        "CROSS-DATASET SIMILARITY (rows: audio, columns: descriptions)",
+        "=" * 80,
+        f"{'Mean':<{width}}" + "".join(f"{title:>{column}}" for title in titles),
+    ]
+    for title, row in zip(titles, result['mean_similarity']):
+        lines.append(f"{title:<{width}}" + "".join(f"{value:>{column}.4f}" for value in row))
+    lines.append("")
+    lines.append(f"{'Top-1':<{width}}" + "".join(f"{title:>{column}}" for title in titles))
+    for title, row in zip(titles, result['top1']):
+        lines.append(f"{title:<{width}}" + "".join(f"{count:>{column}}" for count in row))
+
+    entries = result['per_dataset'] + [result['overall']]
+    lines += [
+        "",
+        "=" * 80,
+        "POSITIVE / NEGATIVE SEPARATION (mean similarity; negatives within and across datasets)",
+        "=" * 80,
+        f"{'Dataset':<{width}}{'Pairs':>6}{'Positive':>10}{'Within':>9}{'Across':>9}{'Margin':>9}"
+        f"{'ROC-AUC':>9}{'AUC across':>12}",
+    ]
+    for entry in entries:
+        within, across = entry['negatives_within'], entry['negatives_across']
+        lines.append(
+            f"{entry['title']:<{width}}{entry['pairs']:>6}{entry['positives']['mean']:>10.4f}"
+            f"{_value(within and within['mean']):>9}{_value(across and across['mean']):>9}"
+            f"{_value(entry['separation']):>9}{_value(entry['roc_auc']):>9}{_value(entry['roc_auc_across']):>12}"
+        )
+
+    metrics = [f"R@{k}" for k in result['ks']] + ['mAP']
+    lines += [
+        "",
+        "=" * 80,
+        "RETRIEVAL (audio -> text | text -> audio, over all descriptions / audio files)",
+        "=" * 80,
+        f"{'Dataset':<{width}}" + "".join(f"{metric:>7}" for metric in metrics) + " |"
+        + "".join(f"{metric:>7}" for metric in metrics),
+    ]
+    for entry in entries:
+        lines.append(
+            f"{entry['title']:<{width}}" + "".join(f"{entry['audio_to_text'][metric]:>7.3f}" for metric in metrics)
+            + " |" + "".join(f"{entry['text_to_audio'][metric]:>7.3f}" for metric in metrics)
+        )
+    lines.append("=" * 80)
+    return lines
+
+
+def negative_sample_report(result, name: str):
+    """
+    The report of data_sanity_checks/negative_tests/test_negative_samples_<name>.py:
+    the NEGATIVE_SAMPLES description of that bundled dataset scored against
+    the audio of the other datasets, read from the cross-dataset matrix.
+    Returns (scores, result lines, summary lines), or None if the
+    description or one of those datasets was not evaluated.
+    """
+    spec = NEGATIVE_SAMPLES[name]
+    by_name = {dataset.name: i for i, dataset in enumerate(result['datasets'])}
+    if name not in by_name or any(other not in by_name for other in spec['against']):
+        return None
+    stem = spec['description'][:-len('_description.txt')]
+    start = sum(len(dataset.pairs) for dataset in result['datasets'][:by_name[name]])
+    matches = [start + i for i, (audio, _) in enumerate(result['datasets'][by_name[name]].pairs)
+               if Path(audio).stem == stem]
+    if not matches:
+        return None
+    column = matches[0]
+    description = result['pairs'][column][1]
+
+    lines, scores, groups = [], [], []
+    for other in spec['against']:
+        index = by_name[other]
+        dataset = result['datasets'][index]
+        start = sum(len(d.pairs) for d in result['datasets'][:index])
+        group = [float(score) for score in result['matrix'][start:start + len(dataset.pairs), column]]
+        lines += [f"{dataset.title}/{Path(audio).name}: {score:.4f}" for (audio, _), score in zip(dataset.pairs, group)]
+        scores += group
+        groups.append((dataset.title, group))
+
+    title = result['datasets'][by_name[name]].title
+    summary = [
+        "=" * 80,
+        spec['summary_title'],
+        "=" * 80,
+        f"Test description: '{description}'",
+        f"Source: {spec['description']}",
+        "",
+        f"Total audio files tested: {len(scores)}",
+    ]
+    summary += [f"  - {group_title}: {len(group)}" for group_title, group in groups]
+    summary += [
+        "",
+        "Overall Statistics:",
+        f"  Mean similarity: {np.mean(scores):.4f}",
+        f"  Std deviation: {np.std(scores):.4f}",
+        f"  Min similarity: {np.min(scores):.4f}",
+        f"  Max similarity: {np.max(scores):.4f}",
+        f"  Median similarity: {np.median(scores):.4f}",
+        "",
+    ]
+    for group_title, group in groups:
+        summary += [
+            f"{group_title} Statistics:",
+            f"  Mean: {np.mean(group):.4f}",
+            f"  Min: {np.min(group):.4f}",
+            f"  Max: {np.max(group):.4f}",
+            "",
+        ]
+    summary += [
+        f"Expected: Low scores (< 0.1) since {spec['expected'][0]}",
+        f"          are unrelated to {spec['expected'][1]}",
+        "=" * 80,
+    ]
+    heading = [spec['heading'], f"Testing {title} description against unrelated audio", "=" * 80, ""]
+    return scores, heading + lines, summary
+
+
+def write_cross_dataset_result(result, model, results_dir=NEGATIVE_RESULTS_DIR):
+    """
+    Write cross_dataset_results.txt/.json and the full similarity matrix
+    (cross_dataset_matrix.npy) into results_dir, plus the negative sample
+    report of every bundled dataset that was evaluated with the datasets it
+    is scored against. Returns the paths written.
+    """
+    results_dir = Path(results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    datasets = result['datasets']
+
+    text_path = results_dir / "cross_dataset_results.txt"
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write("CLAP Cross-Dataset Evaluation Results\n")
+        f.write(f"Evaluating {len(result['pairs'])} audio files against {len(result['pairs'])} descriptions ("
+                + ", ".join(f"{dataset.title}: {len(dataset.pairs)}" for dataset in datasets) + ")\n\n")
+        for line in cross_dataset_lines(result):
+            f.write(line + "\n")
+
+    matrix_path = results_dir / "cross_dataset_matrix.npy"
+    np.save(matrix_path, result['matrix'])
+
+    json_path = results_dir / "cross_dataset_results.json"
+    report = {
+        'backend': model.backend,
+        'version': model.version,
+        'precision': model.precision,
+        'datasets': [{'dataset': dataset.name, 'title': dataset.title, 'audio_files': len(dataset.audio_files),
+                      'pairs': len(dataset.pairs)} for dataset in datasets],
+        'matrix': matrix_path.name,
+        'audio': [audio for audio, _ in result['pairs']],
+        'descriptions': [text for _, text in result['pairs']],
+        'mean_similarity': result['mean_similarity'],
+        'top1': result['top1'],
+        'per_dataset': result['per_dataset'],
+        'overall': result['overall'],
+    }
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    paths = [text_path, json_path, matrix_path]
+    for name, spec in NEGATIVE_SAMPLES.items():
+        sample = negative_sample_report(result, name)
+        if sample is None:
+            continue
+        _, lines, summary = sample
+        path = results_dir / spec['file']
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n\n" + "\n".join(summary) + "\n")
+        paths.append(path)
+    return paths
+
+
+def run_evaluation(sources=(), manifest: str = None, backend: str = 'msclap', version: str = None,
+                   device: str = 'cpu', precision: str = 'fp32', use_compile: bool = False, workers: int = 0,
+                   worker_threads: int = None, results_dir=None, negatives: bool = False, ledger_path=LEDGER_PATH,
+                   **embed_options):
+    """
+    Load the model once, evaluate the named datasets / directories (and
+    manifest), print and write each report. embed_options go to
+    score_cells; scores are kept in the ledger at ledger_path (None = no
+    ledger). Returns the per-dataset result dicts, or with negatives the
+    cross_dataset_evaluation result (None if nothing could be scored);
+    results_dir defaults to RESULTS_DIR or NEGATIVE_RESULTS_DIR.
+    """
+    datasets = [load_dataset(source) for source in sources]
+    if manifest:
+        datasets.append(load_manifest_dataset(manifest))
+
+    model = clap_similarity.get_model(backend, version, device, precision, use_compile)
+    if workers:
+        clap_similarity.get_worker_pool(model, workers, worker_threads)
+    ledger = None
+    if ledger_path is not None:
+        from clap_ledger import ResultsLedger
+        ledger = ResultsLedger(ledger_path)
+
+    try:
+        if negatives:
+            for dataset in datasets:
+                if not dataset.pairs:
+                    print(f"Error: No audio files with descriptions found for {dataset.title}")
+            if not any(dataset.pairs for dataset in datasets):
+                return None
+            if sum(1 for dataset in datasets if dataset.pairs) < 2:
+                print("Warning: Only one dataset to evaluate; all negatives are within it")
+            result = cross_dataset_evaluation(model, datasets, ledger, **embed_options)
+            if embed_options.get('silence_db') is not None:
+                print(clap_similarity.get_silence_stats(model).summary())
+            print("\n".join(cross_dataset_lines(result)))
+            paths = write_cross_dataset_result(result, model, results_dir or NEGATIVE_RESULTS_DIR)
+            print("\nResults saved to: " + ", ".join(str(path) for path in paths) + "\n")
+            return result
+
+        results = evaluate_datasets(model, datasets, ledger, **embed_options)
+        if embed_options.get('silence_db') is not None:
+            print(clap_similarity.get_silence_stats(model).summary())
+        for result in results:
+            print_result(result)
+            text_path, json_path = write_result(result, model, results_dir or RESULTS_DIR)
+            print(f"\nResults saved to: {text_path} (JSON: {json_path})\n")
+        return results
+    finally:
+        if ledger is not None:
+            ledger.close()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+CLAP Model Export
+Exports the audio and text towers of a loaded CLAP engine to ONNX or
+TorchScript, together with its tokenizer and preprocessing settings, so
+that ExportedEngine can run them without constructing the backend model
+classes. Includes a parity check against the original engine.
+"""
+
+import importlib
+import json
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+import clap_similarity
+
+EXPORT_FORMAT_VERSION = 1
+
+EXPORT_FORMATS = {
+    'onnx': '.onnx',
+    'torchscript': '.pt',
+}
+
+DEFAULT_OPSET = 17
+
+# Probe text used to trace the text tower. A batch of one matters: the traced
+# GPT-2 causal mask keeps the example's batch size, and only 1 broadcasts.
+EXAMPLE_TEXT = "a dog barks in the distance"
+
+
+class _MSClapAudioTower(torch.nn.Module):
+    """(batch, samples) waveforms -> projected audio embeddings, as _get_audio_embeddings."""
+
+    input_names = ['waveform']
+
+    def __init__(self, encoder):
+        super().__init__()
+        self.encoder = encoder
+
+    def forward(self, waveform):
+        return self.encoder(waveform)[0]
+
+
+class _MSClapTextTower(torch.nn.Module):
+    """
+    Token ids -> projected text embeddings, as _get_text_embeddings.
+
+    The GPT-2 encoder reads the hidden state of the last real token, and
+    causal attention never looks at the padding after it, so the attention
+    mask does not change the result. Leaving it out keeps transformers'
+    padding-mask construction (which cannot be traced) out of the graph.
+    """
+
+    input_names = ['input_ids']
+
+    def __init__(self, encoder):
+        super().__init__()
+        self.encoder = encoder
+
+    def forward(self, input_ids):
+        return self.encoder({'input_ids': input_ids})
+
+
+class _LaionAudioTower(torch.nn.Module):
+    """(batch, samples) waveforms -> normalized audio embeddings, as CLAP.get_audio_embedding."""
+
+    input_names = ['waveform']
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, waveform):
+        embedding = self.model.encode_audio({'waveform': waveform}, device=waveform.device)['embedding']
+        return F.normalize(self.model.audio_projection(embedding), dim=-1)
+
+
+class _LaionTextTower(torch.nn.Module):
+    """Token ids and mask -> normalized text embeddings, as CLAP.get_text_embedding."""
+
+    input_names = ['input_ids', 'attention_mask']
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model.get_text_embedding({'input_ids': input_ids, 'attention_mask': attention_mask})
+
+
+def _window_reverse(windows, window_size: int, H: int, W: int):
+    """HTSAT window_reverse with the batch dimension left symbolic."""
+    channels = windows.shape[-1]
+    x = windows.view(-1, H // window_size, W // window_size, window_size, window_size, channels)
+    return x.permute(0, 1, 3, 2, 4, 5).contiguous().view(-1, H, W, channels)
+
+
+@contextmanager
+def _traceable_htsat(module_name: str):
+    """
+    Swap in a trace-friendly HTSAT window_reverse while exporting.
+
+    The original computes the batch size with int(), which tracing records
+    as a constant, so the exported graph would silently mix up rows for any
+    other batch size.
+    """
+    htsat = importlib.import_module(module_name)
+    original = htsat.window_reverse
+    htsat.window_reverse = _window_reverse
+    try:
+        yield
+    finally:
+        htsat.window_reverse = original
+
+
+def engine_towers(engine):
+    """
+    Return (audio_tower, text_tower, tokenizer, tokenizer_settings, htsat_module) for a loaded engine.
+
+    tokenizer_settings are the keyword arguments for
+    clap_similarity.tokenize_texts that reproduce the backend's tokenization;
+    htsat_module is the module whose window_reverse is patched for tracing.
+    """
+    if engine.backend == 'msclap':
+        args = engine.model.args
+        settings = {
+            'suffix': ' <|endoftext|>' if 'gpt' in args.text_model else '',
+            'max_length': args.text_len,
+            'truncation': False,
+        }
+        return (_MSClapAudioTower(engine.model.clap.audio_encoder), _MSClapTextTower(engine.model.clap.caption_encoder),
+                engine.model.tokenizer, settings, 'msclap.models.htsat')
+
+    if engine.backend == 'laion':
+        if 'fusion' in engine.version:
+            raise ValueError("Fusion checkpoints cannot be exported: their audio input depends on clip length")
+        settings = {'suffix': '', 'max_length': 77, 'truncation': True}
+        return (_LaionAudioTower(engine.model.model), _LaionTextTower(engine.model.model),
+                engine.model.tokenize, settings, 'laion_clap.clap_module.htsat')
+
+    raise ValueError(f"Cannot export backend '{engine.backend}'")
+
+
+def _export_tower(tower, inputs, path: Path, fmt: str, opset: int):
+    """Export a tower given a dict of example inputs; only the batch axis is dynamic."""
+    input_names = tower.input_names
+    example_inputs = tuple(torch.as_tensor(inputs[name]) for name in input_names)
+    dynamic_axes = {name: {0: 'batch'} for name in input_names}
+    tower.eval()
+    with torch.no_grad():
+        if fmt == 'onnx':
+            torch.onnx.export(
+                tower,
+                example_inputs,
+                str(path),
+                input_names=input_names,
+                output_names=['embedding'],
+                dynamic_axes={**dynamic_axes, 'embedding': {0: 'batch'}},
+                opset_version=opset,
+                dynamo=False
+            )
+        else:
+            traced = torch.jit.trace(tower, example_inputs, check_trace=False)
+            torch.jit.freeze(traced).save(str(path))
+
+
+def export_model(engine, output_dir, fmt: str = 'onnx', opset: int = DEFAULT_OPSET):
+    """
+    Write the engine's audio and text towers, tokenizer and meta.json to output_dir.
+
+    The audio tower takes (batch, clip_samples) float32 waveforms; the text
+    tower takes int64 token arrays (meta['text_inputs']) of the backend's
+    padded length. Both have a dynamic batch dimension and return one
+    embedding per row.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}")
+    if engine.device != 'cpu' or engine.precision != 'fp32':
+        raise ValueError("Export from an fp32 model loaded on CPU")
+    if getattr(engine, 'tower', 'both') != 'both':
+        raise ValueError("Export from a model loaded with both towers")
+    if fmt == 'onnx':
+        try:
+            import onnx  # noqa: F401  (needed by torch.onnx.export)
+        except ImportError:
+            raise ValueError("ONNX export needs the onnx package: pip install onnx onnxruntime") from None
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    audio_tower, text_tower, tokenizer, tokenizer_settings, htsat_module = engine_towers(engine)
+    suffix = EXPORT_FORMATS[fmt]
+
+    waveform = torch.randn(2, engine.clip_samples) * 0.1
+    with _traceable_htsat(htsat_module):
+        _export_tower(audio_tower, {'waveform': waveform}, output_dir / f"audio_encoder{suffix}", fmt, opset)
+
+    # transformers builds the causal mask from the traced sequence length, so the
+    # text graph only accepts max_length tokens and longer texts are truncated
+    tokenizer_settings = {**tokenizer_settings, 'truncation': True}
+    tokens = clap_similarity.tokenize_texts(tokenizer, [EXAMPLE_TEXT], **tokenizer_settings)
+    _export_tower(text_tower, tokens, output_dir / f"text_encoder{suffix}", fmt, opset)
+
+    tokenizer.save_pretrained(str(output_dir / 'tokenizer'))
+
+    meta = {
+        'format_version': EXPORT_FORMAT_VERSION,
+        'format': fmt,
+        'backend': engine.backend,
+        'version': engine.version,
+        'audio_encoder': f"audio_encoder{suffix}",
+        'text_encoder': f"text_encoder{suffix}",
+        'sample_rate': engine.sample_rate,
+        'clip_samples': int(engine.clip_samples),
+        'preprocessing': engine.preprocessing,
+        'tokenizer': tokenizer_settings,
+        'text_inputs': text_tower.input_names,
+        'source_checkpoint': str(engine.checkpoint_path),
+        'torch_version': torch.__version__,
+    }
+    with open(output_dir / 'meta.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return output_dir
+
+
+def _difference(reference, candidate, count: int) -> dict:
+    return {
+        'max_abs_diff': float(np.max(np.abs(reference - candidate))),
+        'min_cosine': float(np.min(clap_similarity.paired_cosine_similarity(reference, candidate))),
+        'count': count,
+    }
+
+
+def check_parity(engine, exported, audio_paths, texts):
+    """
+    Compare exported-engine embeddings with the original engine on the same inputs.
+
+    Audio is decoded once and fed to both engines' embed_waveforms, so the
+    comparison isolates the exported graph from file loading. Returns the
+    largest absolute difference, the lowest cosine similarity and the
+    number of inputs compared per tower. Texts longer than the exported
+    graph's token length are truncated by it but read whole by msclap, so
+    they are compared separately, as 'truncated_text'.
+    """
+    from clap_pipeline import decode_clip
+
+    waveforms = np.stack([decode_clip(path, engine.sample_rate, engine.clip_samples) for path in audio_paths])
+    report = {'audio': _difference(engine.embed_waveforms(waveforms), exported.embed_waveforms(waveforms),
+                                   len(waveforms))}
+
+    max_length = exported.text_settings['max_length']
+    truncated = [count > max_length for count in engine.count_tokens(texts)]
+    for name, selected in (('text', [text for text, cut in zip(texts, truncated) if not cut]),
+                           ('truncated_text', [text for text, cut in zip(texts, truncated) if cut])):
+        if selected:
+            report[name] = _difference(engine.embed_text(selected), exported.embed_text(selected), len(selected))
+    return report
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+CLAP Retrieval Index
+Persistent vector index over CLAP audio (and caption) embeddings for
+text-to-audio and audio-to-text search.
+Provides an exact brute-force engine and an approximate IVF engine
+(inverted lists over spherical k-means centroids), both numpy-only.
+"""
+
+import json
+import time
+from pathlib import Path
+import numpy as np
+
+INDEX_FORMAT_VERSION = 1
+
+# Audio extensions picked up when a directory is indexed
+AUDIO_EXTENSIONS = {'.wav', '.flac', '.mp3', '.ogg'}
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _top_k(scores, k: int):
+    """Indices of the k highest scores in each row, best first."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.zeros((scores.shape[0], 0), dtype=np.int64)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+class ExactIndex:
+    """Brute-force cosine search: one normalized matmul plus argpartition."""
+
+    kind = 'exact'
+
+    def __init__(self, embeddings):
+        self.embeddings = _normalize(embeddings)
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def search(self, queries, k: int = 10):
+        """Return (indices, scores) arrays of shape (n_queries, k)."""
+        scores = _normalize(queries) @ self.embeddings.T
+        indices = _top_k(scores, k)
+        return indices, np.take_along_axis(scores, indices, axis=1)
+
+
+def spherical_kmeans(vectors, n_clusters: int, iterations: int = 20, seed: int = 0):
+    """Cluster unit vectors by cosine similarity; returns unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for cluster in range(n_clusters):
+            members = vectors[assignments == cluster]
+            if len(members):
+                centroids[cluster] = members.sum(axis=0)
+            else:
+                # Re-seed empty clusters with a random point
+                centroids[cluster] = vectors[rng.integers(len(vectors))]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Approximate cosine search over inverted lists.
+
+    Vectors are grouped by their nearest k-means centroid; a query scores
+    only the vectors in its `nprobe` closest lists.
+    """
+
+    kind = 'ivf'
+
+    def __init__(self, embeddings, n_lists: int = None, nprobe: int = None, centroids=None, seed: int = 0):
+        self.embeddings = _normalize(embeddings)
+        n_lists = n_lists or max(1, int(np.sqrt(len(self.embeddings))))
+        n_lists = min(n_lists, len(self.embeddings))
+        self.centroids = _normalize(centroids) if centroids is not None else \
+            spherical_kmeans(self.embeddings, n_lists, seed=seed)
+        self.nprobe = nprobe or max(1, len(self.centroids) // 8)
+
+        assignments = np.argmax(self.embeddings @ self.centroids.T, axis=1)
+        self.order = np.argsort(assignments, kind='stable')
+        self.offsets = np.searchsorted(assignments[self.order], np.arange(len(self.centroids) + 1))
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def search(self, queries, k: int = 10, nprobe: int = None):
+        """Return (indices, scores) arrays of shape (n_queries, k); missing slots are -1 / -inf."""
+        queries = _normalize(queries)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probes = _top_k(queries @ self.centroids.T, nprobe)
+
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for row, (query, lists) in enumerate(zip(queries, probes)):
+            candidates = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+            candidate_scores = self.embeddings[candidates] @ query
+            best = _top_k(candidate_scores[None, :], k)[0]
+            indices[row, :len(best)] = candidates[best]
+            scores[row, :len(best)] = candidate_scores[best]
+        return indices, scores
+
+
+class ClapIndex:
+    """
+    Audio embeddings (plus optional caption embeddings) with their labels.
+
+    Text queries search the audio embeddings; audio queries search the
+    caption embeddings. Only clips that have a caption are in the caption
+    index: caption_rows gives the audio row of each caption (by default,
+    captions follow audio_paths one to one). Saved as a directory of .npy
+    files and meta.json.
+    """
+
+    def __init__(self, audio_paths, audio_embeddings, backend: str, version: str,
+                 captions=None, caption_embeddings=None, engine: str = 'exact', n_lists: int = None,
+                 caption_rows=None):
+        self.audio_paths = list(audio_paths)
+        self.backend = backend
+        self.version = version
+        self.captions = list(captions) if captions is not None else None
+        self.caption_rows = list(caption_rows) if caption_rows is not None else \
+            (list(range(len(self.captions))) if self.captions is not None else None)
+        self.engine = engine
+        self.audio = self._make_engine(audio_embeddings, engine, n_lists)
+        self.caption_index = None
+        if caption_embeddings is not None and len(caption_embeddings):
+            self.caption_index = self._make_engine(caption_embeddings, engine, n_lists)
+
+    @staticmethod
+    def _make_engine(embeddings, engine: str, n_lists: int = None, centroids=None):
+        if engine == 'exact':
+            return ExactIndex(embeddings)
+        if engine == 'ivf':
+            return IVFIndex(embeddings, n_lists=n_lists, centroids=centroids)
+        raise ValueError(f"Unknown index engine '{engine}'. Use 'exact' or 'ivf'.")
+
+    def search_audio(self, text_embeddings, k: int = 10, **kwargs):
+        """Text -> audio: [(audio_path, score), ...] per query."""
+        indices, scores = self.audio.search(text_embeddings, k, **kwargs)
+        return [[(self.audio_paths[i], float(s)) for i, s in zip(row_i, row_s) if i >= 0]
+                for row_i, row_s in zip(indices, scores)]
+
+    def search_captions(self, audio_embeddings, k: int = 10, **kwargs):
+        """Audio -> text: [(audio_path, caption, score), ...] per query."""
+        if self.caption_index is None:
+            raise ValueError("Index has no captions; rebuild with --captions over clips that have "
+                             "<stem>_description.txt files")
+        indices, scores = self.caption_index.search(audio_embeddings, k, **kwargs)
+        return [[(self.audio_paths[self.caption_rows[i]], self.captions[i], float(s))
+                 for i, s in zip(row_i, row_s) if i >= 0]
+                for row_i, row_s in zip(indices, scores)]
+
+    def save(self, index_dir):
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        np.save(index_dir / 'audio_embeddings.npy', self.audio.embeddings)
+        if self.engine == 'ivf':
+            np.save(index_dir / 'audio_centroids.npy', self.audio.centroids)
+        if self.caption_index is not None:
+            np.save(index_dir / 'caption_embeddings.npy', self.caption_index.embeddings)
+            if self.engine == 'ivf':
+                np.save(index_dir / 'caption_centroids.npy', self.caption_index.centroids)
+
+        meta = {
+            'format': INDEX_FORMAT_VERSION,
+            'backend': self.backend,
+            'version': self.version,
+            'engine': self.engine,
+            'audio_paths': self.audio_paths,
+            'captions': self.captions,
+            'caption_rows': self.caption_rows,
+        }
+        with open(index_dir / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, index_dir, engine: str = None):
+        """Load a saved index, optionally switching the search engine."""
+        index_dir = Path(index_dir)
+        with open(index_dir / 'meta.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format in {index_dir}")
+
+        index = cls.__new__(cls)
+        index.audio_paths = meta['audio_paths']
+        index.backend = meta['backend']
+        index.version = meta['version']
+        index.captions = meta['captions']
+        index.caption_rows = meta.get('caption_rows')
+        index.engine = engine or meta['engine']
+
+        def restore(name, rows=None):
+            embeddings = np.load(index_dir / f'{name}_embeddings.npy')
+            if rows is not None:
+                embeddings = embeddings[rows]
+            centroids_path = index_dir / f'{name}_centroids.npy'
+            centroids = np.load(centroids_path) if centroids_path.exists() and index.engine == 'ivf' else None
+            return cls._make_engine(embeddings, index.engine, centroids=centroids)
+
+        rows = None
+        if index.captions is not None and index.caption_rows is None:
+            # Indexes saved before caption_rows hold an empty caption for every clip without one
+            rows = [row for row, caption in enumerate(index.captions) if caption]
+            index.captions = [index.captions[row] for row in rows]
+            index.caption_rows = rows
+
+        index.audio = restore('audio')
+        index.caption_index = None
+        if (index_dir / 'caption_embeddings.npy').exists() and index.captions:
+            index.caption_index = restore('caption', rows)
+        return index
+
+
+def collect_audio_files(paths):
+    """Expand directories (recursively) and files into a sorted list of audio files."""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(p for p in path.rglob('*') if p.suffix.lower() in AUDIO_EXTENSIONS)
+        else:
+            files.append(path)
+    return sorted(dict.fromkeys(str(f) for f in files))
+
+
+def find_caption(audio_path):
+    """Description stored next to an audio file as <stem>_description.txt, if any."""
+    caption_path = Path(audio_path).with_name(f"{Path(audio_path).stem}_description.txt")
+    if caption_path.exists():
+        return caption_path.read_text(encoding='utf-8').strip()
+    return None
+
+
+def benchmark_index(index: ClapIndex, queries, k: int = 10, nprobes=(1, 2, 4, 8, 16), n_lists: int = None):
+    """
+    Recall@k and per-query latency of the IVF engine against exact search.
+
+    Returns a list of dicts, one per engine setting, starting with exact.
+    """
+    queries = _normalize(queries)
+    exact = ExactIndex(index.audio.embeddings)
+    ivf = index.audio if isinstance(index.audio, IVFIndex) else IVFIndex(index.audio.embeddings, n_lists=n_lists)
+
+    start = time.perf_counter()
+    truth, _ = exact.search(queries, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    rows = [{'engine': 'exact', 'nprobe': None, 'recall': 1.0, 'latency_ms': exact_ms}]
+
+    for nprobe in sorted(set(min(n, len(ivf.centroids)) for n in nprobes)):
+        start = time.perf_counter()
+        found, _ = ivf.search(queries, k, nprobe=nprobe)
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+        rows.append({
+            'engine': 'ivf',
+            'nprobe': nprobe,
+            'recall': hits / truth.size,
+            'latency_ms': latency_ms,
+        })
+    return rows
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+CLAP Results Ledger
+A SQLite file of every similarity score an evaluation has computed, keyed
+by the hash of the audio file's bytes, the hash of the normalized
+description, the backend, the model version and the scoring settings.
+Reruns look their pairs up first and only score the ones that are new or
+whose file changed; scores are committed one batch at a time, so an
+interrupted run loses at most the batch in flight.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from clap_cache import hash_file, normalize_text
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scores (
+    audio_hash TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    version TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    score REAL NOT NULL,
+    audio_path TEXT,
+    text TEXT,
+    scored_at REAL NOT NULL,
+    PRIMARY KEY (audio_hash, text_hash, backend, version, settings)
+);
+"""
+
+
+def ledger_settings(engine, **settings) -> str:
+    """
+    Canonical JSON of what, besides the model, changes an engine's scores:
+    precision, runtime, preprocessing and the given embedding settings.
+    """
+    payload = {'precision': engine.precision, 'runtime': getattr(engine, 'runtime', None),
+               **engine.preprocessing, **settings}
+    return json.dumps(payload, sort_keys=True)
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+
+class ResultsLedger:
+    """
+    Scores recorded by earlier evaluations, stored in one SQLite file.
+
+    File hashes are remembered by (path, size, mtime), so unchanged files
+    are not read again on the next run. Writes go through WAL journaling
+    and one transaction per record() call.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.path))
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(_SCHEMA)
+        self.connection.commit()
+
+    def audio_hash(self, audio_path) -> str:
+        """SHA-256 of an audio file's bytes, read from the ledger while the file is unchanged."""
+        path = Path(audio_path).resolve()
+        stat = path.stat()
+        row = self.connection.execute("SELECT size, mtime_ns, hash FROM files WHERE path = ?", (str(path),)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = hash_file(path)
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                                    (str(path), stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def scores(self, backend: str, version: str, settings: str) -> dict:
+        """{(audio_hash, text_hash): score} of everything recorded for one model and settings."""
+        rows = self.connection.execute(
+            "SELECT audio_hash, text_hash, score FROM scores WHERE backend = ? AND version = ? AND settings = ?",
+            (backend, str(version), settings))
+        return {(audio_hash, text_hash): score for audio_hash, text_hash, score in rows}
+
+    def record(self, backend: str, version: str, settings: str, entries):
+        """Commit (audio_hash, text_hash, score, audio_path, text) entries in one transaction."""
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(audio_hash, text_hash, backend, str(version), settings, float(score), str(audio_path), text, now)
+                 for audio_hash, text_hash, score, audio_path, text in entries])
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+CLAP Batch Memory Governor
+Estimates the memory a batch needs before it runs (decoded audio plus
+encoder activations, per backend) so batches can be capped to the memory
+left under a budget, and shrinks a batch that still fails to allocate by
+splitting it and retrying the halves.
+"""
+
+import gc
+import os
+import sys
+
+# Encoder activation bytes per audio clip at fp32, measured as the peak RSS
+# growth of a batch of 16 (both backends run HTSAT on a 256 x 256 mel image)
+AUDIO_ACTIVATION_BYTES = {
+    'msclap': 40 * 2**20,
+    'laion': 40 * 2**20,
+}
+
+# LAION fusion checkpoints encode four local mel chunks next to the global view
+FUSION_ACTIVATION_FACTOR = 2
+
+# bf16 keeps the front end and projections in fp32, so activations shrink by about a third
+PRECISION_ACTIVATION_FACTOR = {'fp32': 1.0, 'int8': 1.0, 'bf16': 0.7}
+
+# Decoding holds the file as read, its mono mix and the resampled copy
+DECODE_COPIES = 3
+
+# Text encoder activation bytes per token (GPT-2 / RoBERTa base, 768 wide)
+TEXT_TOKEN_BYTES = 64 * 2**10
+
+# Without a configured budget, batches may use this share of the memory still available
+DEFAULT_AVAILABLE_SHARE = 0.8
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process."""
+    try:
+        with open('/proc/self/statm', encoding='ascii') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _read_int(path):
+    try:
+        with open(path, encoding='ascii') as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def available_memory_bytes():
+    """
+    Memory this process can still allocate: the smaller of MemAvailable and
+    the cgroup (container) limit minus its usage. None if unknown.
+    """
+    candidates = []
+    try:
+        with open('/proc/meminfo', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    candidates.append(int(line.split()[1]) * 1024)
+                    break
+    except OSError:
+        pass
+    for limit_path, usage_path in (('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory.current'),
+                                   ('/sys/fs/cgroup/memory/memory.limit_in_bytes',
+                                    '/sys/fs/cgroup/memory/memory.usage_in_bytes')):
+        limit, usage = _read_int(limit_path), _read_int(usage_path)
+        # cgroup v1 reports "no limit" as a huge number
+        if limit is not None and usage is not None and limit < 2**60:
+            candidates.append(max(0, limit - usage))
+            break
+    return min(candidates) if candidates else None
+
+
+def is_out_of_memory(error) -> bool:
+    """
+    Whether an exception is a failed CPU or CUDA allocation that a smaller
+    batch may avoid. A dead worker process (BrokenProcessPool) is not: its
+    pool cannot run anything else.
+    """
+    from concurrent.futures import BrokenExecutor
+
+    if isinstance(error, MemoryError):
+        return True
+    if isinstance(error, BrokenExecutor):
+        return False
+    message = str(error)
+    return isinstance(error, RuntimeError) and (
+        'out of memory' in message or "can't allocate memory" in message or 'DefaultCPUAllocator' in message)
+
+
+class MemoryGovernor:
+    """
+    Batch memory estimates and the budget they are checked against for one engine.
+
+    budget_bytes caps the process RSS (on CUDA, the batch is checked
+    against free device memory instead). Without a budget, batches may use
+    DEFAULT_AVAILABLE_SHARE of the memory available when they are planned.
+    An allocation failure caps that tower's batches at half the rows that
+    failed for the rest of the run, both when planning and for batches
+    already planned.
+    """
+
+    def __init__(self, engine, budget_bytes: int = None):
+        self.device = engine.device
+        self.sample_rate = engine.sample_rate
+        self.budget_bytes = budget_bytes
+        activation = AUDIO_ACTIVATION_BYTES.get(engine.backend, AUDIO_ACTIVATION_BYTES['msclap'])
+        if 'fusion' in str(engine.version):
+            activation *= FUSION_ACTIVATION_FACTOR
+        self.clip_bytes = activation * PRECISION_ACTIVATION_FACTOR.get(engine.precision, 1.0)
+        self.token_bytes = TEXT_TOKEN_BYTES
+        # Largest batch each tower ('audio', 'text') may still run, lowered by failures
+        self.max_rows = {}
+        self.failures = 0
+
+    def headroom_bytes(self):
+        """Bytes a batch may use now, or None when nothing limits it."""
+        if self.device == 'cuda':
+            import torch
+            free, _ = torch.cuda.mem_get_info()
+            return int(free * DEFAULT_AVAILABLE_SHARE)
+        if self.budget_bytes is not None:
+            return max(0, self.budget_bytes - current_rss_bytes())
+        available = available_memory_bytes()
+        return int(available * DEFAULT_AVAILABLE_SHARE) if available is not None else None
+
+    def audio_bytes(self, seconds: float) -> float:
+        """Estimated bytes to decode and encode one file of this many seconds (at least one clip)."""
+        decoded = seconds * self.sample_rate * 4 * DECODE_COPIES if self.device == 'cpu' else 0
+        return decoded + self.clip_bytes
+
+    def text_bytes(self, rows: int, tokens: int) -> float:
+        """Estimated bytes to encode rows texts padded to tokens."""
+        return rows * tokens * self.token_bytes
+
+    def batch_limit(self, tower: str, batch_size: int) -> int:
+        """batch_size, lowered to the tower's row limit if failures set one."""
+        return min(batch_size, self.max_rows.get(tower, batch_size))
+
+    def record_failure(self, tower: str, rows: int):
+        """Note that a batch of rows ran out of memory and cap the tower's batches below it."""
+        self.failures += 1
+        self.max_rows[tower] = min(self.max_rows.get(tower, rows), max(1, rows // 2))
+        print(f"Out of memory embedding {rows} inputs ({tower}); retrying in batches of at most "
+              f"{self.max_rows[tower]}", file=sys.stderr)
+        gc.collect()
+        torch = sys.modules.get('torch')
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+
+def run_splitting(embed, batch, governor: MemoryGovernor, tower: str, first=None):
+    """
+    Return embed(batch), splitting the batch in halves and retrying while it runs out of memory.
+
+    A batch over the tower's learned row limit is split before it is
+    tried. first is an optional future already computing embed(batch)
+    (e.g. on a worker pool), used for the first attempt. A single item
+    that still cannot be allocated raises the original error.
+    """
+    import numpy as np
+
+    if first is not None or len(batch) <= governor.batch_limit(tower, len(batch)):
+        try:
+            return first.result() if first is not None else embed(batch)
+        except Exception as e:
+            if not is_out_of_memory(e) or len(batch) <= 1:
+                raise
+        # Retried outside the except block, so the failed attempt's frames (and tensors) are released first
+        governor.record_failure(tower, len(batch))
+    half = len(batch) // 2
+    return np.concatenate([run_splitting(embed, batch[:half], governor, tower),
+                           run_splitting(embed, batch[half:], governor, tower)])
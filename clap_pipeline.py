@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+CLAP Audio Decode Pipeline
+Decodes and resamples audio files in a pool of worker processes, writing
+fixed-length clips straight into shared-memory batch buffers that the
+inference loop hands to the model without copying.
+"""
+
+import os
+import weakref
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+import numpy as np
+
+from clap_similarity import fit_to_clip
+
+# Batches decoded ahead of the one the model is working on
+DEFAULT_PREFETCH = 2
+
+# Shared-memory segments attached in this worker process, by name
+_ATTACHED = {}
+
+
+def decode_clip(audio_path, sample_rate: int, clip_samples: int, resample: bool = True, silence_db: float = None,
+                stats=None):
+    """
+    Decode a file to mono float32, resample it and repeat-pad or truncate to clip_samples.
+
+    With silence_db, leading and trailing silence is trimmed first (see
+    clap_silence) and recorded in stats; a file that is silent throughout
+    becomes an all-zero clip.
+    """
+    import librosa
+    import soundfile as sf
+
+    try:
+        audio, source_rate = sf.read(str(audio_path), dtype='float32', always_2d=True)
+        audio = audio.mean(axis=1)
+    except RuntimeError:
+        # Formats libsndfile cannot open (e.g. MP3 on older builds)
+        audio, source_rate = librosa.load(str(audio_path), sr=None, mono=True)
+
+    if silence_db is not None:
+        from clap_silence import trim_silence
+
+        seconds = len(audio) / source_rate
+        audio = trim_silence(audio, source_rate, silence_db)
+        if stats is not None:
+            stats.add_file(seconds, len(audio) / source_rate)
+    if resample and source_rate != sample_rate and len(audio):
+        audio = librosa.resample(audio, orig_sr=source_rate, target_sr=sample_rate)
+    return fit_to_clip(audio, clip_samples)
+
+
+def _decode_into(shm_name: str, shape, row: int, audio_path, sample_rate: int, clip_samples: int, resample: bool,
+                 silence_db: float = None):
+    """Worker task: decode one file into a row of a shared-memory buffer; returns its SilenceStats when trimming."""
+    shm = _ATTACHED.get(shm_name)
+    if shm is None:
+        for stale in _ATTACHED.values():
+            stale.close()
+        _ATTACHED.clear()
+        shm = _ATTACHED[shm_name] = shared_memory.SharedMemory(name=shm_name)
+
+    stats = None
+    if silence_db is not None:
+        from clap_silence import SilenceStats
+        stats = SilenceStats()
+    buffer = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+    buffer[row] = decode_clip(audio_path, sample_rate, clip_samples, resample, silence_db, stats)
+    return stats
+
+
+def _release(executor, segments):
+    executor.shutdown(wait=True, cancel_futures=True)
+    for shm in segments:
+        shm.close()
+        shm.unlink()
+
+
+class DecodePipeline:
+    """
+    Producer/consumer decoding for one model's sample rate and clip length.
+
+    Worker processes decode into `prefetch` shared-memory batch buffers.
+    While the model embeds one buffer, the workers fill the others; a
+    buffer is only refilled after the consumer has moved on, so decoding
+    never runs more than `prefetch` batches ahead.
+    """
+
+    def __init__(self, sample_rate: int, clip_samples: int, workers: int = None, prefetch: int = DEFAULT_PREFETCH):
+        self.sample_rate = sample_rate
+        self.clip_samples = clip_samples
+        self.workers = workers or os.cpu_count()
+        self.prefetch = max(1, prefetch)
+        # spawn: workers must not inherit the parent's torch threads and CUDA state
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=get_context('spawn'))
+        self._segments = []
+        self._shm = None
+        self._batch_size = 0
+        self._finalizer = weakref.finalize(self, _release, self.executor, self._segments)
+
+    def _buffers(self, batch_size: int):
+        """Shared (prefetch * batch_size, clip_samples) float32 array, reallocated if the batch size changes."""
+        if self._shm is None or batch_size != self._batch_size:
+            for shm in self._segments:
+                shm.close()
+                shm.unlink()
+            self._segments.clear()
+            nbytes = self.prefetch * batch_size * self.clip_samples * np.dtype(np.float32).itemsize
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self._segments.append(self._shm)
+            self._batch_size = batch_size
+        shape = (self.prefetch * batch_size, self.clip_samples)
+        return shape, np.ndarray(shape, dtype=np.float32, buffer=self._shm.buf)
+
+    def iter_batches(self, audio_paths, batch_size: int = 32, resample: bool = True):
+        """
+        Yield (paths, waveforms) per batch of batch_size files, in order.
+
+        `waveforms` is a (len(paths), clip_samples) view into shared memory;
+        it is only valid until the next batch is requested. A file that fails
+        to decode raises its exception when its batch is reached.
+        """
+        audio_paths = [str(p) for p in audio_paths]
+        yield from self.iter_planned([audio_paths[i:i + batch_size] for i in range(0, len(audio_paths), batch_size)],
+                                     resample)
+
+    def iter_planned(self, batches, resample: bool = True, silence_db: float = None, stats=None):
+        """
+        Like iter_batches, for batches of paths already formed by the caller (they may differ in size).
+
+        With silence_db, workers trim silence from each file (see decode_clip)
+        and their totals are merged into stats.
+        """
+        batches = [[str(p) for p in batch] for batch in batches if batch]
+        if not batches:
+            return
+        batch_size = max(len(batch) for batch in batches)
+        shape, buffers = self._buffers(batch_size)
+
+        free = deque(range(self.prefetch))
+        pending = deque()
+        next_batch = 0
+        while pending or next_batch < len(batches):
+            while free and next_batch < len(batches):
+                slot = free.popleft()
+                batch = batches[next_batch]
+                next_batch += 1
+                futures = [
+                    self.executor.submit(_decode_into, self._shm.name, shape, slot * batch_size + i, path,
+                                         self.sample_rate, self.clip_samples, resample, silence_db)
+                    for i, path in enumerate(batch)
+                ]
+                pending.append((slot, batch, futures))
+
+            slot, batch, futures = pending.popleft()
+            for path, future in zip(batch, futures):
+                try:
+                    decoded = future.result()
+                except Exception as e:
+                    raise RuntimeError(f"Failed to decode {path}: {e}") from e
+                if stats is not None and decoded is not None:
+                    stats.merge(decoded)
+            yield batch, buffers[slot * batch_size:slot * batch_size + len(batch)]
+            free.append(slot)
+
+    def close(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+CLAP Scoring Service
+Long-running local HTTP server that keeps a CLAP model resident and
+coalesces concurrent requests into micro-batches before they reach it.
+
+Endpoints (JSON in, JSON out):
+  POST /embed/audio  {"audio": [path, ...]}              -> {"embeddings": [[...], ...]}
+  POST /embed/text   {"texts": [text, ...]}              -> {"embeddings": [[...], ...]}
+  POST /score        {"audio": path|[...], "text": str|[...]} -> {"similarity": x | [...]}
+  GET  /health                                           -> {"status": "ok", ...}
+"""
+
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import clap_similarity
+
+
+class MicroBatcher:
+    """
+    Coalesce single items from many threads into batched calls.
+
+    A worker thread waits for the first pending item, then keeps collecting
+    until max_batch_size items are queued or max_wait_ms has passed since
+    that first item, and runs `process` once on the whole batch. An item
+    that makes `process` fail only fails its own request.
+    """
+
+    def __init__(self, process, max_batch_size: int = 32, max_wait_ms: float = 10.0, name: str = "batcher"):
+        self.process = process
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item) -> Future:
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def map(self, items):
+        """Submit items and wait for all results, in order."""
+        futures = [self.submit(item) for item in items]
+        return [future.result() for future in futures]
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._process(batch)
+
+    def _process(self, batch):
+        """
+        Run `process` on a batch of (item, future) and resolve the futures.
+
+        If the call raises, the batch is retried in halves, so only the
+        futures of the items that fail on their own get the exception.
+        """
+        try:
+            results = self.process([item for item, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            half = len(batch) // 2
+            self._process(batch[:half])
+            self._process(batch[half:])
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+class ClapService:
+    """Resident model plus one micro-batcher per encoder tower."""
+
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 10.0, use_cache: bool = True):
+        self.model = model
+        # Both batcher threads plan against this one governor
+        clap_similarity.get_memory_governor(model)
+        self.audio = MicroBatcher(
+            lambda paths: clap_similarity.embed_audio_batched(model, paths, max_batch_size, use_cache=use_cache),
+            max_batch_size, max_wait_ms, name="audio-batcher"
+        )
+        self.text = MicroBatcher(
+            lambda texts: clap_similarity.embed_text_batched(model, texts, max_batch_size, use_cache=use_cache),
+            max_batch_size, max_wait_ms, name="text-batcher"
+        )
+
+    def embed_audio(self, paths):
+        return self.audio.map(self._existing(paths))
+
+    def embed_text(self, texts):
+        return self.text.map(texts)
+
+    def score(self, paths, texts):
+        import numpy as np
+
+        audio_future = [self.audio.submit(path) for path in self._existing(paths)]
+        text_embeddings = self.embed_text(texts)
+        audio_embeddings = [future.result() for future in audio_future]
+        return clap_similarity.paired_cosine_similarity(np.stack(audio_embeddings), np.stack(text_embeddings))
+
+    @staticmethod
+    def _existing(paths):
+        for path in paths:
+            if not Path(path).exists():
+                raise FileNotFoundError(f"Audio file not found: {path}")
+        return paths
+
+    def stats(self):
+        return {
+            'backend': self.model.backend,
+            'version': self.model.version,
+            'audio_batches': self.audio.batches,
+            'audio_items': self.audio.items,
+            'text_batches': self.text.batches,
+            'text_items': self.text.items,
+        }
+
+
+def _as_list(value, name: str):
+    if isinstance(value, str):
+        return [value], True
+    if isinstance(value, list) and value and all(isinstance(v, str) for v in value):
+        return value, False
+    raise ValueError(f"'{name}' must be a string or a non-empty list of strings")
+
+
+class ClapRequestHandler(BaseHTTPRequestHandler):
+    """JSON request handler; the ClapService lives on the server object."""
+
+    server_version = "ClapSimilarity/1.0"
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok', **self.server.service.stats()})
+        else:
+            self._send_json(404, {'error': f"unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+
+            if self.path == '/embed/audio':
+                paths, _ = _as_list(request.get('audio'), 'audio')
+                embeddings = service.embed_audio(paths)
+                self._send_json(200, {'embeddings': [e.tolist() for e in embeddings]})
+            elif self.path == '/embed/text':
+                texts, _ = _as_list(request.get('texts', request.get('text')), 'texts')
+                embeddings = service.embed_text(texts)
+                self._send_json(200, {'embeddings': [e.tolist() for e in embeddings]})
+            elif self.path == '/score':
+                paths, single_audio = _as_list(request.get('audio'), 'audio')
+                texts, single_text = _as_list(request.get('text'), 'text')
+                if len(paths) != len(texts):
+                    raise ValueError("'audio' and 'text' must have the same length")
+                scores = [float(score) for score in service.score(paths, texts)]
+                self._send_json(200, {'similarity': scores[0] if single_audio and single_text else scores})
+            else:
+                self._send_json(404, {'error': f"unknown endpoint {self.path}"})
+        except (ValueError, FileNotFoundError) as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}", file=sys.stderr)
+
+
+def serve(model, host: str = '127.0.0.1', port: int = 8765, max_batch_size: int = 32, max_wait_ms: float = 10.0,
+          use_cache: bool = True):
+    """Run the scoring service until interrupted."""
+    server = ThreadingHTTPServer((host, port), ClapRequestHandler)
+    server.daemon_threads = True
+    server.service = ClapService(model, max_batch_size, max_wait_ms, use_cache)
+
+    print(f"Serving {model.backend} ({model.version}) on http://{host}:{server.server_address[1]}")
+    print(f"Micro-batching: up to {max_batch_size} items or {max_wait_ms:g} ms per batch")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        server.server_close()
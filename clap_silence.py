@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+CLAP Silence Trimming
+Energy-based voice/activity detection for the audio preprocessing path.
+Leading and trailing silence (including zero padding) is cut from each
+decoded file before it is tiled to the model's clip, clips left with no
+audio at all share one embedding of silence instead of running the
+encoder, and windowed scoring skips windows that are entirely silent.
+"""
+
+import numpy as np
+
+from clap_similarity import DEFAULT_SILENCE_DB
+
+# Length of the frames whose energy is measured
+FRAME_SECONDS = 0.02
+
+# Audio kept on each side of the detected activity, so onsets and decays are not clipped
+TRIM_MARGIN_SECONDS = 0.1
+
+
+def frame_levels_db(audio, sample_rate: int, frame_seconds: float = FRAME_SECONDS):
+    """RMS level in dBFS of consecutive frames of a mono waveform (the last frame may be shorter)."""
+    audio = np.asarray(audio, dtype=np.float32)
+    frame = max(1, int(sample_rate * frame_seconds))
+    if len(audio) == 0:
+        return np.zeros(0, dtype=np.float32)
+    padded = np.zeros(-(-len(audio) // frame) * frame, dtype=np.float32)
+    padded[:len(audio)] = audio
+    power = np.square(padded).reshape(-1, frame).sum(axis=1)
+    counts = np.full(len(power), frame)
+    counts[-1] = len(audio) - frame * (len(power) - 1)
+    return 10 * np.log10(np.maximum(power / counts, 1e-20))
+
+
+def active_span(audio, sample_rate: int, silence_db: float = DEFAULT_SILENCE_DB):
+    """
+    (start, end) sample range from the first to the last frame louder than
+    silence_db, widened by TRIM_MARGIN_SECONDS; (0, 0) if every frame is silent.
+    """
+    loud = np.flatnonzero(frame_levels_db(audio, sample_rate) > silence_db)
+    if len(loud) == 0:
+        return 0, 0
+    frame = max(1, int(sample_rate * FRAME_SECONDS))
+    margin = int(sample_rate * TRIM_MARGIN_SECONDS)
+    return max(0, int(loud[0]) * frame - margin), min(len(audio), (int(loud[-1]) + 1) * frame + margin)
+
+
+def trim_silence(audio, sample_rate: int, silence_db: float = DEFAULT_SILENCE_DB):
+    """Drop leading and trailing silence; an entirely silent waveform comes back empty."""
+    start, end = active_span(audio, sample_rate, silence_db)
+    return audio[start:end]
+
+
+def is_silent(audio, sample_rate: int, silence_db: float = DEFAULT_SILENCE_DB) -> bool:
+    """Whether no frame of the waveform is louder than silence_db."""
+    return not np.any(frame_levels_db(audio, sample_rate) > silence_db)
+
+
+class SilenceStats:
+    """Running totals of the audio trimmed and encoder inputs skipped for one engine."""
+
+    def __init__(self):
+        self.files = 0
+        self.seconds = 0.0
+        self.kept_seconds = 0.0
+        self.clips = 0
+        self.silent_clips = 0
+        self.windows = 0
+        self.silent_windows = 0
+
+    def add_file(self, seconds: float, kept_seconds: float):
+        self.files += 1
+        self.seconds += seconds
+        self.kept_seconds += kept_seconds
+
+    def merge(self, other):
+        for name, value in vars(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def skipped_inputs(self) -> int:
+        """Encoder inputs (clips and windows) that were never run through the encoder."""
+        return self.silent_clips + self.silent_windows
+
+    def summary(self) -> str:
+        parts = []
+        if self.files:
+            trimmed = self.seconds - self.kept_seconds
+            parts.append(f"trimmed {trimmed:.1f}s of {self.seconds:.1f}s "
+                         f"({trimmed / self.seconds if self.seconds else 0:.0%}) from {self.files} files")
+        inputs = self.clips + self.windows
+        if inputs:
+            parts.append(f"skipped {self.skipped_inputs} of {inputs} encoder inputs as silent "
+                         f"({self.silent_clips} clips, {self.silent_windows} windows)")
+        return "Silence: " + ("; ".join(parts) if parts else "no audio decoded (embeddings came from the cache)")
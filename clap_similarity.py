@@ -6,10 +6,75 @@ Supports both Microsoft CLAP and LAION CLAP backends.
 """
 
 import argparse
+import csv
+import gc
+import glob
+import inspect
+import itertools
+import json
+import os
 import sys
+import threading
+from collections import OrderedDict
 from pathlib import Path
-import torch
-import numpy as np
+
+# numpy, torch and the CLAP backends are imported inside the functions that
+# use them, so `--help`, argument errors and light library use (text loading,
+# cosine helpers) start fast. scripts/check_import_time.py guards this.
+
+# Checkpoint used when no version is requested
+DEFAULT_VERSIONS = {
+    'msclap': '2023',
+    'laion': '630k-audioset-best',
+}
+
+# LAION checkpoints, in the order expected by CLAP_Module.load_ckpt(model_id=...)
+LAION_CHECKPOINTS = [
+    '630k-best',
+    '630k-audioset-best',
+    '630k-fusion-best',
+    '630k-audioset-fusion-best',
+]
+
+# fp32: full precision; int8: dynamically quantized nn.Linear layers;
+# bf16: bfloat16 weights and autocast, with fp32 front end and projections
+PRECISIONS = ['fp32', 'int8', 'bf16']
+
+# Precisions implemented for CPU kernels only
+CPU_PRECISIONS = ['int8', 'bf16']
+
+# both: audio and text encoders; audio / text: that encoder and its projection only
+TOWERS = ['both', 'audio', 'text']
+
+# Seconds of audio decoded per batch before files are cropped or tiled to the
+# model's clip length; long files are batched together under this budget
+DEFAULT_MAX_BATCH_SECONDS = 600.0
+
+# Frames quieter than this RMS level (dB relative to full scale) count as silence
+# when --trim-silence is on (see clap_silence)
+DEFAULT_SILENCE_DB = -60.0
+
+# Text embedded by `snapshot` to check a restored model against the original
+SNAPSHOT_CHECK_TEXT = "a dog barks in the distance"
+
+# Loaded models keyed by (backend, version, device, precision), least recently used first
+_MODEL_REGISTRY = OrderedDict()
+
+# Upper bound on memory held by loaded models, in bytes (None = unlimited)
+_MODEL_MEMORY_BUDGET = (
+    int(float(os.environ['CLAP_MODEL_MEMORY_BUDGET_MB']) * 1024 * 1024)
+    if os.environ.get('CLAP_MODEL_MEMORY_BUDGET_MB') else None
+)
+
+# Upper bound on process RSS while embedding, in bytes; batches are planned to
+# fit what is left of it (None = a share of the memory available, see clap_memory)
+_BATCH_MEMORY_BUDGET = (
+    int(float(os.environ['CLAP_BATCH_MEMORY_MB']) * 1024 * 1024)
+    if os.environ.get('CLAP_BATCH_MEMORY_MB') else None
+)
+
+# Guards attaching a memory governor, which concurrent towers (embed_pair, serve) share
+_GOVERNOR_LOCK = threading.Lock()
 
 
 def load_text_file(text_path: str) -> str:
@@ -18,72 +83,1272 @@ def load_text_file(text_path: str) -> str:
         return f.read().strip()
 
 
-def calculate_similarity_msclap(audio_path: str, text_description: str, use_cuda: bool = True):
-    """Calculate similarity using Microsoft CLAP."""
-    import msclap
+def normalize_embeddings(embeddings):
+    """Scale each row of an embedding matrix to unit length."""
+    import numpy as np
 
-    device = 'cuda' if use_cuda and torch.cuda.is_available() else 'cpu'
-    print(f"Backend: Microsoft CLAP")
-    print(f"Using device: {device}")
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
 
-    # Load model
-    print("Loading CLAP model...")
-    model = msclap.CLAP(version='2023', use_cuda=use_cuda)
 
-    # Get embeddings
-    print("Processing audio...")
-    audio_embeddings = model.get_audio_embeddings([audio_path], resample=True)
+def cosine_similarity_matrix(audio_embeddings, text_embeddings):
+    """Cosine similarity between every audio row and every text row."""
+    return normalize_embeddings(audio_embeddings) @ normalize_embeddings(text_embeddings).T
 
-    print("Processing text...")
-    text_embeddings = model.get_text_embeddings([text_description])
 
-    # Calculate similarity (cosine similarity)
-    # Normalize embeddings to ensure proper cosine similarity calculation
-    audio_norm = audio_embeddings / np.linalg.norm(audio_embeddings, axis=1, keepdims=True)
-    text_norm = text_embeddings / np.linalg.norm(text_embeddings, axis=1, keepdims=True)
-    similarity = audio_norm @ text_norm.T
-    similarity_score = float(similarity[0][0])
+def paired_cosine_similarity(audio_embeddings, text_embeddings):
+    """Cosine similarity between matching rows of two embedding matrices."""
+    import numpy as np
 
-    return similarity_score
+    return np.sum(normalize_embeddings(audio_embeddings) * normalize_embeddings(text_embeddings), axis=1)
 
 
-def calculate_similarity_laion(audio_path: str, text_description: str, use_cuda: bool = True):
-    """Calculate similarity using LAION CLAP."""
-    import laion_clap
+def _to_numpy(embeddings):
+    """Convert backend output (tensor or array) to a float32 numpy array."""
+    import numpy as np
+    import torch
+
+    if isinstance(embeddings, torch.Tensor):
+        embeddings = embeddings.detach().float().cpu().numpy()
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def resolve_device(use_cuda: bool = True, precision: str = 'fp32') -> str:
+    """Pick the torch device for inference; int8 and bf16 always run on CPU."""
+    import torch
+
+    return 'cuda' if use_cuda and precision not in CPU_PRECISIONS and torch.cuda.is_available() else 'cpu'
+
+
+def quantize_dynamic_int8(module):
+    """
+    Replace the nn.Linear layers of a module with dynamically quantized int8 versions.
+
+    Weights are stored as int8 and activations are quantized on the fly, so
+    this needs no calibration data. Quantized kernels exist for CPU only.
+    """
+    import warnings
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    with warnings.catch_warnings():
+        # Newer torch releases warn that eager-mode quantization is moving to torchao
+        warnings.simplefilter('ignore')
+        # In place: msclap's HTSAT holds its config module, which cannot be deep-copied
+        return quantize_dynamic(module.eval(), {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def _run_in_fp32(module):
+    """Make a submodule run outside autocast, on fp32 copies of its floating-point inputs."""
+    import torch
+
+    forward = module.forward
+
+    def fp32_forward(*args, **kwargs):
+        args = [arg.float() if isinstance(arg, torch.Tensor) and arg.is_floating_point() else arg for arg in args]
+        with torch.autocast('cpu', enabled=False):
+            return forward(*args, **kwargs)
+
+    module.forward = fp32_forward
+
+
+def cast_bf16(module, fp32_modules=()):
+    """
+    Store the weights of a module in bfloat16 for inference under bf16_autocast.
+
+    Normalization layers keep fp32 weights. Submodules whose attribute name
+    is in fp32_modules (the spectrogram front end and the projection heads)
+    keep fp32 weights and run outside autocast, so features are extracted
+    and embeddings projected in full precision.
+    """
+    import torch
+
+    norms = (torch.nn.LayerNorm, torch.nn.GroupNorm, torch.nn.modules.batchnorm._BatchNorm)
+    kept = [sub for name, sub in module.named_modules() if name.rsplit('.', 1)[-1] in fp32_modules]
+    for sub in kept:
+        _run_in_fp32(sub)
+
+    kept_params = {id(param) for sub in kept for param in sub.parameters()}
+    for sub in module.modules():
+        if isinstance(sub, norms):
+            continue
+        for param in sub.parameters(recurse=False):
+            # scalars such as logit scales stay fp32; they cost nothing
+            if id(param) not in kept_params and param.is_floating_point() and param.dim():
+                param.data = param.data.to(torch.bfloat16)
+    return module.eval()
+
+
+def bf16_autocast(precision: str):
+    """Context for running an engine's encoders: bf16 autocast for bf16, a no-op otherwise."""
+    import torch
+
+    return torch.autocast('cpu', dtype=torch.bfloat16, enabled=precision == 'bf16')
+
+
+def _require_tower(engine, tower: str):
+    """Raise ValueError if engine was loaded without its audio or text tower."""
+    if getattr(engine, 'tower', 'both') not in ('both', tower):
+        raise ValueError(f"This {engine.backend} model was loaded with its {engine.tower} tower only; "
+                         f"{tower} embeddings need tower='{tower}' or 'both'")
+
+
+class MSClapEngine:
+    """Microsoft CLAP model wrapped with numpy embedding helpers."""
+
+    backend = 'msclap'
+
+    def __init__(self, version: str, device: str, precision: str, use_snapshot: bool = True, tower: str = 'both'):
+        from clap_snapshot import load_snapshot
+        from clap_towers import build_msclap_tower, drop_tower
+
+        self.version = version
+        self.device = device
+        self.precision = precision
+        self.tower = tower
+        self.model = load_snapshot(self.backend, version) if use_snapshot else None
+        self.from_snapshot = self.model is not None
+        if self.model is None:
+            if tower == 'both':
+                import msclap
+                self.model = msclap.CLAP(version=version, use_cuda=device == 'cuda')
+            else:
+                self.model = build_msclap_tower(version, device == 'cuda', tower)
+        else:
+            drop_tower(self.model, self.backend, tower)
+            if device != 'cpu':
+                self.model.clap = self.model.clap.to(device)
+                self.model.use_cuda = True
+        if precision == 'int8':
+            self.model.clap = quantize_dynamic_int8(self.model.clap)
+        elif precision == 'bf16':
+            cast_bf16(self.model.clap, ('spectrogram_extractor', 'logmel_extractor', 'projection'))
+        self.checkpoint_path = self.model.model_fp
+        self.sample_rate = self.model.args.sampling_rate
+        self.clip_samples = self.model.args.duration * self.sample_rate
+        self.preprocessing = {'sample_rate': self.sample_rate, 'duration': self.model.args.duration}
+
+    def modules(self):
+        return [self.model.clap]
+
+    def embed_audio(self, audio_paths, resample: bool = True):
+        _require_tower(self, 'audio')
+        with bf16_autocast(self.precision):
+            return _to_numpy(self.model.get_audio_embeddings([str(p) for p in audio_paths], resample=resample))
+
+    def embed_waveforms(self, waveforms):
+        """Embed a (batch, clip_samples) array of mono audio at self.sample_rate."""
+        import torch
+
+        _require_tower(self, 'audio')
+        audio = torch.as_tensor(waveforms, dtype=torch.float32).to(self.device)
+        with bf16_autocast(self.precision):
+            return _to_numpy(self.model._get_audio_embeddings(audio.unsqueeze(1)))
+
+    def _text_inputs(self, texts):
+        """msclap's caption text with its end-of-text suffix for GPT-2 models."""
+        suffix = ' <|endoftext|>' if 'gpt' in self.model.args.text_model else ''
+        return [text + suffix for text in texts]
+
+    def count_tokens(self, texts):
+        _require_tower(self, 'text')
+        return [len(ids) for ids in self.model.tokenizer(self._text_inputs(texts))['input_ids']]
+
+    def embed_text(self, texts):
+        """
+        Embed texts padded to the longest in the batch rather than msclap's fixed text_len.
+
+        GPT-2 reads the last real token and BERT the first, both masked, so
+        the padding length does not change the embeddings.
+        """
+        import torch
+
+        _require_tower(self, 'text')
+        tokens = self.model.tokenizer(self._text_inputs(texts), padding='longest', return_tensors='pt')
+        tokens = {key: tokens[key].to(self.device) for key in self.model.token_keys}
+        with torch.no_grad(), bf16_autocast(self.precision):
+            return _to_numpy(self.model.clap.caption_encoder(tokens))
+
+
+def _int16_round_trip(waveforms):
+    """Quantize waveforms to int16 and back, as LAION's get_audio_embedding_from_filelist does."""
+    import numpy as np
+
+    waveforms = np.clip(np.asarray(waveforms, dtype=np.float32), -1.0, 1.0)
+    return (waveforms * 32767.0).astype(np.int16).astype(np.float32) / 32767.0
+
+
+class LaionClapEngine:
+    """LAION CLAP model wrapped with numpy embedding helpers."""
+
+    backend = 'laion'
+
+    def __init__(self, version: str, device: str, precision: str, use_snapshot: bool = True, tower: str = 'both'):
+        import laion_clap
+        from clap_snapshot import load_snapshot
+        from clap_towers import drop_tower
+
+        if version not in LAION_CHECKPOINTS:
+            raise ValueError(f"Unknown LAION checkpoint '{version}'. Use one of: {', '.join(LAION_CHECKPOINTS)}")
+
+        self.version = version
+        self.device = device
+        self.precision = precision
+        self.tower = tower
+        self.model = load_snapshot(self.backend, version) if use_snapshot else None
+        self.from_snapshot = self.model is not None
+        if self.model is None:
+            self.model = laion_clap.CLAP_Module(enable_fusion='fusion' in version, device=device)
+            # Downloads model on first run, cached afterwards
+            self.model.load_ckpt(model_id=LAION_CHECKPOINTS.index(version))
+        elif device != 'cpu':
+            self.model.model = self.model.model.to(device)
+        # CLAP_Module always builds both branches; the unused one is released once loaded
+        drop_tower(self.model, self.backend, tower)
+        if precision == 'int8':
+            self.model.model = quantize_dynamic_int8(self.model.model)
+        elif precision == 'bf16':
+            cast_bf16(self.model.model, ('spectrogram_extractor', 'logmel_extractor',
+                                         'audio_projection', 'text_projection'))
+        # load_ckpt() stores downloaded checkpoints next to the laion_clap package
+        self.checkpoint_path = Path(inspect.getfile(type(self.model))).parent / f"{version}.pt"
+        self.sample_rate = 48000
+        self.clip_samples = self.model.model_cfg['audio_cfg']['clip_samples']
+        self.preprocessing = {'sample_rate': self.sample_rate}
+
+    def modules(self):
+        return [self.model]
 
-    device = 'cuda' if use_cuda and torch.cuda.is_available() else 'cpu'
-    print(f"Backend: LAION CLAP")
-    print(f"Using device: {device}")
+    def embed_audio(self, audio_paths, resample: bool = True):
+        _require_tower(self, 'audio')
+        with bf16_autocast(self.precision):
+            return _to_numpy(self.model.get_audio_embedding_from_filelist(
+                x=[str(p) for p in audio_paths],
+                use_tensor=False
+            ))
 
-    # Load model
-    print("Loading CLAP model...")
-    model = laion_clap.CLAP_Module(enable_fusion=False, device=device)
-    model.load_ckpt()  # Downloads model on first run, cached afterwards
+    def embed_waveforms(self, waveforms):
+        """Embed a (batch, clip_samples) array of mono audio at self.sample_rate."""
+        _require_tower(self, 'audio')
+        with bf16_autocast(self.precision):
+            return _to_numpy(self.model.get_audio_embedding_from_data(x=_int16_round_trip(waveforms),
+                                                                      use_tensor=False))
 
-    # Get embeddings
-    print("Processing audio...")
-    audio_embed = model.get_audio_embedding_from_filelist(
-        x=[audio_path],
-        use_tensor=False
+    def _tokenize(self, texts):
+        """Tokenize like CLAP_Module.tokenizer, but padded to the longest text instead of 77 tokens."""
+        tokens = self.model.tokenize(list(texts), padding='longest', truncation=True, max_length=77,
+                                     return_tensors='pt')
+        return {'input_ids': tokens['input_ids'], 'attention_mask': tokens['attention_mask']}
+
+    def count_tokens(self, texts):
+        _require_tower(self, 'text')
+        return [len(ids) for ids in self.model.tokenize(list(texts), truncation=True, max_length=77)['input_ids']]
+
+    def embed_text(self, texts):
+        _require_tower(self, 'text')
+        with bf16_autocast(self.precision):
+            return _to_numpy(self.model.get_text_embedding(list(texts), tokenizer=self._tokenize, use_tensor=False))
+
+
+def tokenize_texts(tokenizer, texts, suffix: str = '', max_length: int = 77, truncation: bool = True):
+    """
+    Tokenize texts the way the backend wrappers do, as int64 numpy arrays.
+
+    Rows are padded to max_length; without truncation, longer texts widen
+    the batch instead (padding after the last token does not change the
+    embedding).
+    """
+    import numpy as np
+
+    encoded = tokenizer(
+        [text + suffix for text in texts],
+        padding='longest',
+        truncation=truncation,
+        max_length=max_length if truncation else None,
+        return_tensors='np'
     )
+    input_ids = np.asarray(encoded['input_ids'], dtype=np.int64)
+    attention_mask = np.asarray(encoded['attention_mask'], dtype=np.int64)
+    if input_ids.shape[1] < max_length:
+        pad = ((0, 0), (0, max_length - input_ids.shape[1]))
+        input_ids = np.pad(input_ids, pad, constant_values=tokenizer.pad_token_id)
+        attention_mask = np.pad(attention_mask, pad, constant_values=0)
+    return {'input_ids': input_ids, 'attention_mask': attention_mask}
+
+
+class ExportedEngine:
+    """
+    Audio and text towers written by `clap_similarity.py export`, run with
+    onnxruntime or TorchScript instead of the backend model classes.
+
+    The version is the export directory. Audio files are decoded with
+    clap_pipeline.decode_clip, and text is tokenized with the tokenizer
+    saved next to the artifacts. With a single tower, only that encoder
+    (and for text, the tokenizer) is loaded.
+    """
+
+    def __init__(self, version: str, device: str, precision: str, tower: str = 'both'):
+        import json
+        from transformers import AutoTokenizer
+
+        if precision != 'fp32':
+            raise ValueError("Exported models run in fp32 only")
+
+        export_dir = Path(version)
+        meta_path = export_dir / 'meta.json'
+        if not meta_path.exists():
+            raise ValueError(f"No exported model in {export_dir} (missing meta.json)")
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        self.export_dir = export_dir
+        self.backend = meta['backend']
+        self.version = meta['version']
+        self.runtime = meta['format']
+        self.device = device
+        self.precision = precision
+        self.tower = tower
+        self.checkpoint_path = export_dir / meta['audio_encoder']
+        self.sample_rate = meta['sample_rate']
+        self.clip_samples = meta['clip_samples']
+        self.preprocessing = {**meta['preprocessing'], 'decode': 'pipeline'}
+        self.text_settings = meta['tokenizer']
+        self.text_inputs = meta['text_inputs']
+        self.tokenizer = self.audio_encoder = self.text_encoder = None
+        if tower != 'text':
+            self.audio_encoder = self._load(export_dir / meta['audio_encoder'])
+        if tower != 'audio':
+            self.tokenizer = AutoTokenizer.from_pretrained(str(export_dir / 'tokenizer'))
+            self.text_encoder = self._load(export_dir / meta['text_encoder'])
+        loaded = [name for name in ('audio_encoder', 'text_encoder') if getattr(self, name) is not None]
+        self.artifact_bytes = sum((export_dir / meta[name]).stat().st_size for name in loaded)
+
+    def _load(self, path: Path):
+        if self.runtime == 'onnx':
+            try:
+                import onnxruntime
+            except ImportError:
+                raise ImportError("Running ONNX exports needs onnxruntime: pip install onnxruntime") from None
+
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            providers = ['CPUExecutionProvider']
+            if self.device == 'cuda':
+                providers.insert(0, 'CUDAExecutionProvider')
+            return onnxruntime.InferenceSession(str(path), options, providers=providers)
+
+        import torch
+
+        module = torch.jit.load(str(path), map_location=self.device)
+        if self.device == 'cpu':
+            module = torch.jit.optimize_for_inference(module)
+        return module
+
+    def _run(self, encoder, inputs):
+        if self.runtime == 'onnx':
+            return encoder.run(['embedding'], inputs)[0]
+
+        import torch
+
+        with torch.inference_mode():
+            return _to_numpy(encoder(*(torch.as_tensor(value).to(self.device) for value in inputs.values())))
+
+    def modules(self):
+        return []
+
+    def embed_audio(self, audio_paths, resample: bool = True):
+        import numpy as np
+        from clap_pipeline import decode_clip
+
+        _require_tower(self, 'audio')
+        return self.embed_waveforms(np.stack([
+            decode_clip(path, self.sample_rate, self.clip_samples, resample) for path in audio_paths
+        ]))
+
+    def embed_waveforms(self, waveforms):
+        """Embed a (batch, clip_samples) array of mono audio at self.sample_rate."""
+        import numpy as np
+
+        _require_tower(self, 'audio')
+        waveforms = np.asarray(waveforms, dtype=np.float32)
+        if self.backend == 'laion':
+            waveforms = _int16_round_trip(waveforms)
+        return np.asarray(self._run(self.audio_encoder, {'waveform': waveforms}), dtype=np.float32)
+
+    def count_tokens(self, texts):
+        _require_tower(self, 'text')
+        suffix, max_length = self.text_settings['suffix'], self.text_settings['max_length']
+        counts = [len(ids) for ids in self.tokenizer([text + suffix for text in texts])['input_ids']]
+        return [min(count, max_length) for count in counts] if self.text_settings['truncation'] else counts
+
+    def embed_text(self, texts):
+        import numpy as np
+
+        _require_tower(self, 'text')
+        tokens = tokenize_texts(self.tokenizer, list(texts), **self.text_settings)
+        inputs = {name: tokens[name] for name in self.text_inputs}
+        return np.asarray(self._run(self.text_encoder, inputs), dtype=np.float32)
+
+
+_ENGINES = {
+    'msclap': MSClapEngine,
+    'laion': LaionClapEngine,
+    'exported': ExportedEngine,
+}
+
+
+def model_memory_bytes(engine) -> int:
+    """Bytes held by the parameters and buffers of a loaded engine."""
+    total = getattr(engine, 'artifact_bytes', 0)
+    for module in engine.modules():
+        for tensor in itertools.chain(module.parameters(), module.buffers()):
+            total += tensor.numel() * tensor.element_size()
+        # Quantized layers keep their weights in packed params, outside parameters()
+        for submodule in module.modules():
+            if type(submodule).__name__ == 'LinearPackedParams':
+                for tensor in submodule._weight_bias():
+                    if tensor is not None:
+                        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def get_model(backend: str = 'msclap', version: str = None, device: str = 'cpu', precision: str = 'fp32',
+              use_compile: bool = False, tower: str = 'both'):
+    """
+    Return a loaded CLAP engine, loading it on first use.
+
+    Engines are kept in a process-wide registry keyed by
+    (backend, version, device, precision, tower) so repeated calls reuse
+    the same weights instead of rebuilding the model. tower='audio' or
+    'text' loads only that encoder (see clap_towers); an engine already
+    loaded with both towers is reused for either. use_compile wraps the
+    encoders with torch.compile (see clap_compile) and warms them up; this
+    happens in place, so later callers share the compiled engine.
+    """
+    if backend not in _ENGINES:
+        raise ValueError(f"Unknown backend '{backend}'. Use 'msclap', 'laion' or 'exported'.")
+    if backend == 'exported' and not version:
+        raise ValueError("The exported backend needs the export directory as its version")
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}'. Use one of: {', '.join(PRECISIONS)}")
+    if precision in CPU_PRECISIONS and device != 'cpu':
+        raise ValueError(f"{precision} precision runs on CPU only")
+    if tower not in TOWERS:
+        raise ValueError(f"Unknown tower '{tower}'. Use one of: {', '.join(TOWERS)}")
+    if use_compile and backend == 'exported':
+        raise ValueError("Exported models cannot be compiled; they already run as optimized graphs")
+    if use_compile and precision != 'fp32':
+        raise ValueError("--compile supports fp32 only")
+
+    key = (backend, version or DEFAULT_VERSIONS[backend], device, precision, tower)
+    if key[:-1] + ('both',) in _MODEL_REGISTRY:
+        key = key[:-1] + ('both',)
+    engine = _MODEL_REGISTRY.get(key)
+    if engine is not None:
+        _MODEL_REGISTRY.move_to_end(key)
+    else:
+        print("Loading CLAP model..." if tower == 'both' else f"Loading CLAP model ({tower} tower only)...")
+        engine = _ENGINES[backend](key[1], device, precision, tower=tower)
+        engine.memory_bytes = model_memory_bytes(engine)
+        _MODEL_REGISTRY[key] = engine
+        evict_models(keep=key)
+
+    if use_compile:
+        from clap_compile import compile_engine
+        compile_engine(engine)
+    return engine
+
+
+def evict_models(budget_bytes: int = None, keep=None):
+    """
+    Drop least recently used models until the registry fits in budget_bytes.
+
+    Uses the configured memory budget when budget_bytes is None. The model
+    under `keep` is never evicted. Returns the keys that were dropped.
+    """
+    budget = _MODEL_MEMORY_BUDGET if budget_bytes is None else budget_bytes
+    if budget is None:
+        return []
+
+    evicted = []
+    total = sum(engine.memory_bytes for engine in _MODEL_REGISTRY.values())
+    for key in list(_MODEL_REGISTRY):
+        if total <= budget:
+            break
+        if key == keep:
+            continue
+        total -= _MODEL_REGISTRY.pop(key).memory_bytes
+        evicted.append(key)
+
+    if evicted:
+        gc.collect()
+        torch = sys.modules.get('torch')
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    return evicted
+
+
+def set_model_memory_budget(budget_bytes: int = None):
+    """Set the registry memory budget in bytes (None = unlimited) and evict to fit."""
+    global _MODEL_MEMORY_BUDGET
+    _MODEL_MEMORY_BUDGET = budget_bytes
+    return evict_models()
+
+
+def clear_models():
+    """Unload every cached model."""
+    return evict_models(budget_bytes=0)
+
+
+def set_batch_memory_budget(budget_bytes: int = None):
+    """Set the RSS budget batches are planned against, in bytes (None = derived from available memory)."""
+    global _BATCH_MEMORY_BUDGET
+    _BATCH_MEMORY_BUDGET = budget_bytes
+    for engine in _MODEL_REGISTRY.values():
+        if getattr(engine, 'memory_governor', None) is not None:
+            engine.memory_governor.budget_bytes = budget_bytes
+
+
+def get_memory_governor(model):
+    """Return the batch memory governor attached to a loaded engine, creating it once."""
+    if getattr(model, 'memory_governor', None) is None:
+        from clap_memory import MemoryGovernor
+        with _GOVERNOR_LOCK:
+            if getattr(model, 'memory_governor', None) is None:
+                model.memory_governor = MemoryGovernor(model, _BATCH_MEMORY_BUDGET)
+    return model.memory_governor
+
+
+def _batches(items, batch_size: int):
+    """Yield consecutive lists of at most batch_size items."""
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def get_audio_cache(model):
+    """Return the on-disk audio embedding cache attached to a loaded engine."""
+    if getattr(model, 'audio_cache', None) is None:
+        from clap_cache import AudioEmbeddingCache
+        model.audio_cache = AudioEmbeddingCache(model)
+    return model.audio_cache
+
+
+def get_decode_pipeline(model, workers: int = None):
+    """Return the multi-process decode pipeline attached to a loaded engine."""
+    pipeline = getattr(model, 'decode_pipeline', None)
+    if pipeline is None or (workers and pipeline.workers != workers):
+        from clap_pipeline import DecodePipeline
+        if pipeline is not None:
+            pipeline.close()
+        model.decode_pipeline = DecodePipeline(model.sample_rate, model.clip_samples, workers)
+    return model.decode_pipeline
+
+
+def get_worker_pool(model, workers: int = None, threads: int = None):
+    """
+    Return the forked worker pool attached to a loaded engine, starting it if needed.
+
+    While a pool is attached, embed_audio_batched embeds in-process-decoded
+    batches on the workers, which share the engine's weights copy-on-write.
+    """
+    pool = getattr(model, 'worker_pool', None)
+    if (pool is None or pool.broken or (workers and pool.workers != workers)
+            or (threads and pool.threads != threads)):
+        from clap_workers import WorkerPool
+        if pool is not None:
+            pool.close()
+        model.worker_pool = None
+        model.worker_pool = WorkerPool(model, workers, threads)
+        print(f"Forked {model.worker_pool.workers} workers x {model.worker_pool.threads} threads "
+              f"sharing the loaded model", file=sys.stderr)
+    return model.worker_pool
+
+
+def _active_worker_pool(model):
+    """The worker pool attached to an engine, unless there is none or a dead worker broke it."""
+    pool = getattr(model, 'worker_pool', None)
+    return None if pool is None or pool.broken else pool
+
+
+def get_silence_stats(model):
+    """Return the running silence-trimming totals attached to a loaded engine."""
+    if getattr(model, 'silence_stats', None) is None:
+        from clap_silence import SilenceStats
+        model.silence_stats = SilenceStats()
+    return model.silence_stats
+
 
-    print("Processing text...")
-    text_embed = model.get_text_embedding(
-        [text_description],
-        use_tensor=False
+def _embed_clips(model, waveforms, pool=None):
+    """
+    Embed a (batch, clip_samples) array, skipping rows that are all zeros.
+
+    Rows left empty by silence trimming share one embedding of a silent
+    clip, computed once per engine. With a worker pool, the remaining rows
+    are split between the workers.
+    """
+    import numpy as np
+    from clap_memory import run_splitting
+
+    def embed(part):
+        if pool is None:
+            return model.embed_waveforms(part)
+        chunks = np.array_split(part, min(pool.workers, len(part)))
+        with pool.running():
+            futures = [pool.submit('embed_waveforms', chunk) for chunk in chunks]
+            return np.concatenate([future.result() for future in futures])
+
+    stats = get_silence_stats(model)
+    silent = ~np.asarray(waveforms).any(axis=1)
+    stats.clips += len(silent)
+    stats.silent_clips += int(silent.sum())
+    if not silent.any():
+        return run_splitting(embed, waveforms, get_memory_governor(model), 'audio')
+    if getattr(model, 'silent_clip_embedding', None) is None:
+        model.silent_clip_embedding = model.embed_waveforms(np.zeros((1, model.clip_samples), dtype=np.float32))[0]
+    embeddings = np.empty((len(silent), len(model.silent_clip_embedding)), dtype=np.float32)
+    embeddings[silent] = model.silent_clip_embedding
+    if not silent.all():
+        embeddings[~silent] = run_splitting(embed, waveforms[~silent], get_memory_governor(model), 'audio')
+    return embeddings
+
+
+def _iter_pool_embeddings(pool, governor, batches, resample: bool):
+    """
+    Yield embeddings per batch of paths, each batch embedded on the worker pool.
+
+    At most one planned batch per worker is in flight. The next one is
+    submitted, in planned order, once the oldest has been collected, and
+    is split to the governor's row limit at that point, so a limit learned
+    from an out-of-memory failure applies to every later batch.
+    """
+    import numpy as np
+    from collections import deque
+    from clap_memory import run_splitting
+
+    def embed(part):
+        return pool.submit('embed_audio', part, resample=resample).result()
+
+    def submit(batch):
+        limit = governor.batch_limit('audio', len(batch))
+        return [(batch[i:i + limit], pool.submit('embed_audio', batch[i:i + limit], resample=resample))
+                for i in range(0, len(batch), limit)]
+
+    with pool.running():
+        pending = iter(batches)
+        in_flight = deque(submit(batch) for batch in itertools.islice(pending, pool.workers))
+        while in_flight:
+            pieces = in_flight.popleft()
+            embeddings = [run_splitting(embed, piece, governor, 'audio', first=future) for piece, future in pieces]
+            batch = next(pending, None)
+            if batch is not None:
+                in_flight.append(submit(batch))
+            yield embeddings[0] if len(embeddings) == 1 else np.concatenate(embeddings)
+
+
+def _iter_audio_embeddings(model, batches, resample: bool, decode_workers: int = 0, silence_db: float = None):
+    """
+    Yield embeddings per batch of paths, decoding in-process, on the worker pool or through the decode pipeline.
+
+    A batch that runs out of memory is split and retried (see clap_memory.run_splitting).
+    With silence_db, files are decoded and trimmed here or on the decode
+    workers (see clap_pipeline.decode_clip) and silent clips are skipped.
+    """
+    from clap_memory import run_splitting
+
+    governor = get_memory_governor(model)
+    pool = _active_worker_pool(model)
+    if silence_db is not None:
+        import numpy as np
+        from clap_pipeline import decode_clip
+
+        stats = get_silence_stats(model)
+        if decode_workers:
+            decoded = (waveforms for _, waveforms in
+                       get_decode_pipeline(model, decode_workers).iter_planned(batches, resample, silence_db, stats))
+        else:
+            decoded = (np.stack([decode_clip(path, model.sample_rate, model.clip_samples, resample, silence_db, stats)
+                                 for path in batch]) for batch in batches)
+        for waveforms in decoded:
+            yield _embed_clips(model, waveforms, None if decode_workers else pool)
+        return
+    if not decode_workers and pool is not None:
+        yield from _iter_pool_embeddings(pool, governor, batches, resample)
+        return
+    if not decode_workers:
+        for batch in batches:
+            yield run_splitting(lambda part: model.embed_audio(part, resample=resample), batch, governor, 'audio')
+        return
+
+    pipeline = get_decode_pipeline(model, decode_workers)
+    for _, waveforms in pipeline.iter_planned(batches, resample):
+        yield run_splitting(model.embed_waveforms, waveforms, governor, 'audio')
+
+
+def plan_audio_batches(model, audio_paths, batch_size: int, max_batch_seconds: float = DEFAULT_MAX_BATCH_SECONDS):
+    """
+    Group audio files into batches of index lists by duration (see clap_batching).
+
+    Batches are also capped to the memory headroom of the engine's governor,
+    split between the forked workers when they embed batches side by side.
+    A single file needs no planning and is not opened.
+    """
+    if len(audio_paths) <= 1:
+        return [list(range(len(audio_paths)))] if audio_paths else []
+    from clap_batching import plan_audio_batches as plan
+
+    governor = get_memory_governor(model)
+    headroom = governor.headroom_bytes()
+    pool = _active_worker_pool(model)
+    if headroom is not None and pool is not None:
+        headroom /= pool.workers
+    return plan(audio_paths, governor.batch_limit('audio', batch_size), model.clip_samples / model.sample_rate,
+                max_batch_seconds,
+                file_bytes=governor.audio_bytes, max_batch_bytes=headroom)
+
+
+def embed_audio_batched(model, audio_paths, batch_size: int = 32, resample: bool = True, use_cache: bool = True,
+                        decode_workers: int = 0, max_batch_seconds: float = DEFAULT_MAX_BATCH_SECONDS,
+                        silence_db: float = None, on_batch=None):
+    """
+    Embed audio files through the backend list API, batch_size files per call.
+
+    Files are read in order of duration, at most max_batch_seconds of audio
+    per call (None = no limit), and the embeddings are returned in input order.
+    With use_cache, embeddings already in the on-disk cache are returned
+    without running the audio encoder, and only the misses are batched.
+    With decode_workers, files are decoded and resampled by that many worker
+    processes into shared memory while the model embeds earlier batches.
+    Batches are capped to the memory governor's estimate of what fits, and
+    a batch that runs out of memory anyway is split and retried. With
+    silence_db, silence below that level is trimmed from both ends of each
+    file and silent files are not run through the encoder (see clap_silence);
+    the totals accumulate in get_silence_stats(model). on_batch(paths,
+    embeddings) is called as each batch leaves the encoder (cache hits are
+    only in the returned array).
+    """
+    import numpy as np
+    from clap_batching import scatter_rows
+
+    audio_paths = list(audio_paths)
+    if not use_cache:
+        batches = plan_audio_batches(model, audio_paths, batch_size, max_batch_seconds)
+        paths = [[audio_paths[i] for i in batch] for batch in batches]
+        embedded = _iter_audio_embeddings(model, paths, resample, decode_workers, silence_db)
+        if on_batch is not None:
+            def reported(embedded):
+                for batch, embeddings in zip(paths, embedded):
+                    on_batch(batch, embeddings)
+                    yield embeddings
+            embedded = reported(embedded)
+        return scatter_rows(batches, embedded, len(audio_paths))
+
+    cache = get_audio_cache(model)
+    # The pipeline (also used in-process when trimming) crops long files from the start
+    # instead of at a random offset
+    settings = {'decode': 'pipeline'} if decode_workers or silence_db is not None else {}
+    if silence_db is not None:
+        settings['silence_db'] = silence_db
+    keys = [cache.key(path, resample=resample, **settings) for path in audio_paths]
+    results = {key: cache.get(key) for key in dict.fromkeys(keys)}
+    missing = [key for key, embedding in results.items() if embedding is None]
+    paths_by_key = dict(zip(keys, audio_paths))
+    missing_paths = [paths_by_key[key] for key in missing]
+
+    batches = plan_audio_batches(model, missing_paths, batch_size, max_batch_seconds)
+    embedded = _iter_audio_embeddings(model, [[missing_paths[i] for i in batch] for batch in batches], resample,
+                                      decode_workers, silence_db)
+    for batch, embeddings in zip(batches, embedded):
+        for i, embedding in zip(batch, embeddings):
+            cache.put(missing[i], embedding)
+            results[missing[i]] = embedding
+        if on_batch is not None:
+            on_batch([missing_paths[i] for i in batch], embeddings)
+
+    if not keys:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.stack([results[key] for key in keys]).astype(np.float32)
+
+
+def get_text_cache(model):
+    """Return the text embedding cache (memory LRU + disk) attached to a loaded engine."""
+    if getattr(model, 'text_cache', None) is None:
+        from clap_cache import TextEmbeddingCache
+        model.text_cache = TextEmbeddingCache(model)
+    return model.text_cache
+
+
+def plan_text_batches(model, texts, batch_size: int, max_batch_tokens: int = None):
+    """
+    Group texts into batches of index lists by token count, so each batch pads to a similar length.
+
+    Batches are also capped to the memory headroom of the engine's governor.
+    """
+    if len(texts) <= 1:
+        return [list(range(len(texts)))] if texts else []
+    from clap_batching import plan_text_batches as plan
+
+    governor = get_memory_governor(model)
+    return plan(model.count_tokens(texts), governor.batch_limit('text', batch_size), max_batch_tokens,
+                batch_bytes=governor.text_bytes,
+                max_batch_bytes=governor.headroom_bytes())
+
+
+def embed_text_batched(model, texts, batch_size: int = 256, use_cache: bool = True, max_batch_tokens: int = None):
+    """
+    Embed text descriptions through the backend list API, batch_size texts per call.
+
+    Texts are batched in order of token count, and with max_batch_tokens
+    a batch also stays under that many padded tokens; embeddings are
+    returned in input order. With use_cache, cached descriptions are looked
+    up first and only the misses are sent to the text encoder. A batch that
+    runs out of memory is split and retried.
+    """
+    import numpy as np
+    from clap_batching import scatter_rows
+
+    from clap_memory import run_splitting
+
+    governor = get_memory_governor(model)
+    texts = list(texts)
+    if not use_cache:
+        batches = plan_text_batches(model, texts, batch_size, max_batch_tokens)
+        embedded = (run_splitting(model.embed_text, [texts[i] for i in batch], governor, 'text') for batch in batches)
+        return scatter_rows(batches, embedded, len(texts))
+
+    cache = get_text_cache(model)
+    keys = [cache.key(text) for text in texts]
+    results = {}
+    missing = []
+    for key, text in dict(zip(keys, texts)).items():
+        results[key] = cache.get(key)
+        if results[key] is None:
+            missing.append((key, text))
+
+    batches = plan_text_batches(model, [text for _, text in missing], batch_size, max_batch_tokens)
+    for batch in batches:
+        embeddings = run_splitting(model.embed_text, [missing[i][1] for i in batch], governor, 'text')
+        for i, embedding in zip(batch, embeddings):
+            cache.put(missing[i][0], embedding)
+            results[missing[i][0]] = embedding
+
+    if not keys:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.stack([results[key] for key in keys]).astype(np.float32)
+
+
+def split_threads(text_threads: int = None):
+    """
+    Split torch's intra-op threads between the audio and text towers.
+
+    The text encoder is the lighter of the two and gets a quarter of the
+    threads unless text_threads is given; audio gets the rest (at least 1).
+    """
+    import torch
+
+    total = torch.get_num_threads()
+    text_threads = text_threads or max(1, total // 4)
+    return max(1, total - text_threads), text_threads
+
+
+def embed_pair(model, audio_paths, texts, use_cache: bool = True, overlap: bool = True, text_threads: int = None,
+               silence_db: float = None):
+    """
+    Embed audio files and texts with both towers running at the same time.
+
+    Text is embedded on a helper thread while audio runs on the calling
+    thread. On CPU each side gets its own share of torch's intra-op threads
+    (split_threads); torch's OpenMP thread count is set per calling thread,
+    so the two do not contend for cores. Falls back to one after the other
+    without overlap or with a single CPU thread. Returns (audio, text).
+    """
+    import torch
+    from concurrent.futures import ThreadPoolExecutor
+
+    on_cpu = model.device == 'cpu'
+    if not overlap or (on_cpu and torch.get_num_threads() < 2):
+        return (embed_audio_batched(model, audio_paths, use_cache=use_cache, silence_db=silence_db),
+                embed_text_batched(model, texts, use_cache=use_cache))
+
+    audio_threads, text_threads = split_threads(text_threads)
+
+    def embed_texts():
+        if on_cpu:
+            # A thread's first torch call initializes its thread count from the global
+            # setting; make that happen now, so it does not later override ours
+            torch.get_num_threads()
+            torch.set_num_threads(text_threads)
+        return embed_text_batched(model, texts, use_cache=use_cache)
+
+    previous_threads = torch.get_num_threads()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        text_future = executor.submit(embed_texts)
+        if on_cpu:
+            torch.set_num_threads(audio_threads)
+        try:
+            audio_embeddings = embed_audio_batched(model, audio_paths, use_cache=use_cache, silence_db=silence_db)
+        finally:
+            torch.set_num_threads(previous_threads)
+        return audio_embeddings, text_future.result()
+
+
+def read_manifest(manifest_path: str):
+    """
+    Yield one record per audio/text pair listed in a CSV or JSONL manifest.
+
+    Each row needs an `audio` column plus either `text` (the description
+    itself) or `text_file` (a file holding it). Relative paths are resolved
+    against the manifest's directory. Yields dicts with `line`, `audio`,
+    `text` and, if the row cannot be used, `error`.
+    """
+    manifest_path = Path(manifest_path)
+    base_dir = manifest_path.parent
+
+    with open(manifest_path, 'r', encoding='utf-8', newline='') as f:
+        if manifest_path.suffix.lower() in ('.jsonl', '.ndjson'):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+
+        for line_number, row in enumerate(rows, 1):
+            record = {'line': line_number, 'audio': row.get('audio'), 'text': row.get('text')}
+            text_file = row.get('text_file')
+
+            if not record['audio']:
+                record['error'] = "missing 'audio' column"
+            elif not record['text'] and not text_file:
+                record['error'] = "missing 'text' or 'text_file' column"
+            else:
+                audio_path = base_dir / record['audio']
+                record['audio'] = str(audio_path)
+                if not audio_path.exists():
+                    record['error'] = f"audio file not found: {audio_path}"
+                elif not record['text']:
+                    text_path = base_dir / text_file
+                    if text_path.exists():
+                        record['text'] = load_text_file(text_path)
+                    else:
+                        record['error'] = f"text file not found: {text_path}"
+            yield record
+
+
+def score_records(model, records, batch_size: int = 32, text_batch_size: int = 256, use_cache: bool = True,
+                  decode_workers: int = 0, max_batch_seconds: float = DEFAULT_MAX_BATCH_SECONDS,
+                  silence_db: float = None):
+    """
+    Fill in `similarity` for each manifest record without an `error`.
+
+    Every distinct audio file and text in `records` is embedded exactly once.
+    """
+    valid = [r for r in records if 'error' not in r]
+    if not valid:
+        return records
+
+    audio_paths = list(dict.fromkeys(r['audio'] for r in valid))
+    texts = list(dict.fromkeys(r['text'] for r in valid))
+    audio_embeddings = embed_audio_batched(model, audio_paths, batch_size, use_cache=use_cache,
+                                           decode_workers=decode_workers, max_batch_seconds=max_batch_seconds,
+                                           silence_db=silence_db)
+    text_embeddings = embed_text_batched(model, texts, text_batch_size, use_cache=use_cache)
+
+    audio_index = {path: i for i, path in enumerate(audio_paths)}
+    text_index = {text: i for i, text in enumerate(texts)}
+    scores = paired_cosine_similarity(
+        audio_embeddings[[audio_index[r['audio']] for r in valid]],
+        text_embeddings[[text_index[r['text']] for r in valid]],
     )
+    for record, score in zip(valid, scores):
+        record['similarity'] = float(score)
+    return records
+
+
+def score_manifest(manifest_path: str, output_path: str = None, backend: str = 'msclap', use_cuda: bool = True,
+                   version: str = None, batch_size: int = 32, text_batch_size: int = 256, use_cache: bool = True,
+                   decode_workers: int = 0, precision: str = 'fp32', use_compile: bool = False, workers: int = 0,
+                   worker_threads: int = None, max_batch_seconds: float = DEFAULT_MAX_BATCH_SECONDS,
+                   silence_db: float = None):
+    """
+    Score every pair in a manifest and stream results as JSONL.
+
+    Pairs are read and scored in chunks so memory stays flat for large
+    manifests; results go to output_path, or stdout when it is None. With
+    workers, audio is embedded by a pool forked after the model is loaded.
+    """
+    if not Path(manifest_path).exists():
+        print(f"Error: Manifest not found: {manifest_path}", file=sys.stderr)
+        sys.exit(1)
+
+    model = get_model(backend, version, resolve_device(use_cuda, precision), precision, use_compile)
+    if workers:
+        get_worker_pool(model, workers, worker_threads)
+    out = open(output_path, 'w', encoding='utf-8') if output_path else sys.stdout
+    scored = failed = 0
+
+    try:
+        for chunk in _batches(read_manifest(manifest_path), max(batch_size, text_batch_size)):
+            for record in score_records(model, chunk, batch_size, text_batch_size, use_cache, decode_workers,
+                                        max_batch_seconds, silence_db):
+                out.write(json.dumps(record) + "\n")
+                if 'error' in record:
+                    failed += 1
+                else:
+                    scored += 1
+            out.flush()
+            print(f"Scored {scored} pairs ({failed} skipped)", file=sys.stderr)
+    finally:
+        if output_path:
+            out.close()
+    if silence_db is not None:
+        print(get_silence_stats(model).summary(), file=sys.stderr)
+
+    return scored, failed
+
+
+def fit_to_clip(waveform, clip_samples: int):
+    """Repeat-pad or truncate a mono waveform to exactly clip_samples, as the backends do."""
+    import numpy as np
+
+    if len(waveform) == 0:
+        return np.zeros(clip_samples, dtype=np.float32)
+    if len(waveform) < clip_samples:
+        waveform = np.tile(waveform, int(np.ceil(clip_samples / len(waveform))))
+    return np.asarray(waveform[:clip_samples], dtype=np.float32)
+
+
+def iter_audio_windows(audio_path: str, sample_rate: int, window: float, hop: float):
+    """
+    Yield (start_seconds, end_seconds, waveform) for overlapping windows of a file.
+
+    Windows are read from disk one at a time and resampled to sample_rate,
+    so memory does not grow with file length. A final window is aligned to
+    the end of the file if the regular hops would miss the tail; files
+    shorter than one window yield a single window.
+    """
+    import librosa
+    import numpy as np
+    import soundfile as sf
+
+    with sf.SoundFile(str(audio_path)) as f:
+        source_rate = f.samplerate
+        total = f.frames
+        window_frames = int(round(window * source_rate))
+        hop_frames = max(1, int(round(hop * source_rate)))
+
+        starts = list(range(0, max(total - window_frames, 0) + 1, hop_frames))
+        if starts[-1] + window_frames < total:
+            starts.append(total - window_frames)
+
+        for start in starts:
+            f.seek(start)
+            frames = f.read(min(window_frames, total - start), dtype='float32', always_2d=True)
+            waveform = frames.mean(axis=1)
+            if source_rate != sample_rate:
+                waveform = librosa.resample(waveform, orig_sr=source_rate, target_sr=sample_rate)
+            yield start / source_rate, (start + len(frames)) / source_rate, np.asarray(waveform, dtype=np.float32)
+
+
+def score_windows(model, audio_path: str, text_description: str, window: float = None, hop: float = None,
+                  batch_size: int = 16, use_cache: bool = True, silence_db: float = None):
+    """
+    Similarity curve of one text against overlapping windows of an audio file.
+
+    window defaults to the model's clip length and hop to half a window.
+    Windows are embedded batch_size at a time, so memory stays bounded for
+    any file length. With silence_db, windows with no frame above that
+    level are not embedded and are listed in `skipped` (start, end).
+    Returns a dict with per-window `windows` (start, end, score) and the
+    best-matching `best` window (None if every window was skipped).
+    """
+    import numpy as np
+    from clap_memory import run_splitting
+
+    window = window or model.clip_samples / model.sample_rate
+    hop = hop or window / 2
+    text_embedding = embed_text_batched(model, [text_description], use_cache=use_cache)
+
+    windows_iter = iter_audio_windows(audio_path, model.sample_rate, window, hop)
+    skipped = []
+    if silence_db is not None:
+        from clap_silence import is_silent
+
+        stats = get_silence_stats(model)
+
+        def audible(windows_iter):
+            for start, end, waveform in windows_iter:
+                stats.windows += 1
+                if is_silent(waveform, model.sample_rate, silence_db):
+                    stats.silent_windows += 1
+                    skipped.append((start, end))
+                else:
+                    yield start, end, waveform
+
+        windows_iter = audible(windows_iter)
+
+    windows = []
+    for batch in _batches(windows_iter, batch_size):
+        waveforms = np.stack([fit_to_clip(waveform, model.clip_samples) for _, _, waveform in batch])
+        embeddings = run_splitting(model.embed_waveforms, waveforms, get_memory_governor(model), 'audio')
+        scores = cosine_similarity_matrix(embeddings, text_embedding)[:, 0]
+        windows.extend((start, end, float(score)) for (start, end, _), score in zip(batch, scores))
+
+    best = max(windows, key=lambda w: w[2]) if windows else None
+    return {'window': window, 'hop': hop, 'windows': windows, 'skipped': skipped, 'best': best}
+
+
+def expand_audio_paths(patterns):
+    """
+    Expand audio arguments into a sorted, de-duplicated list of files.
+
+    Each entry may be an audio path, a glob pattern, or a .txt/.lst file
+    listing one audio path per line.
+    """
+    paths = []
+    for pattern in patterns:
+        if Path(pattern).suffix.lower() in ('.txt', '.lst') and Path(pattern).is_file():
+            with open(pattern, 'r', encoding='utf-8') as f:
+                paths.extend(line.strip() for line in f if line.strip())
+        elif glob.has_magic(pattern):
+            paths.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            paths.append(pattern)
+    return list(dict.fromkeys(paths))
+
+
+def expand_texts(values, text_list: str = None):
+    """
+    Expand text arguments into (label, description) pairs.
+
+    Values matching existing files (directly or as glob patterns) are read
+    as one description per file, labelled by file stem; anything else is
+    taken as a literal description. text_list names a file holding one
+    description per line.
+    """
+    texts = []
+    for value in values or []:
+        matches = sorted(glob.glob(value)) if glob.has_magic(value) else [value]
+        files = [m for m in matches if Path(m).is_file()]
+        if files:
+            texts.extend((Path(f).stem, load_text_file(f)) for f in files)
+        else:
+            texts.append((value, value))
+    if text_list:
+        with open(text_list, 'r', encoding='utf-8') as f:
+            texts.extend((line.strip(), line.strip()) for line in f if line.strip())
+    return texts
+
+
+def compute_similarity_matrix(model, audio_paths, texts, batch_size: int = 32, text_batch_size: int = 256,
+                              use_cache: bool = True, decode_workers: int = 0,
+                              max_batch_seconds: float = DEFAULT_MAX_BATCH_SECONDS, silence_db: float = None):
+    """Embed each audio file and text once and return the full N x M cosine matrix."""
+    audio_embeddings = embed_audio_batched(model, audio_paths, batch_size, use_cache=use_cache,
+                                           decode_workers=decode_workers, max_batch_seconds=max_batch_seconds,
+                                           silence_db=silence_db)
+    text_embeddings = embed_text_batched(model, texts, text_batch_size, use_cache=use_cache)
+    return cosine_similarity_matrix(audio_embeddings, text_embeddings)
+
+
+def write_similarity_matrix(matrix, row_labels, column_labels, output_path: str = None):
+    """
+    Write a similarity matrix as .npy (with a .labels.json sidecar) or CSV.
+
+    CSV goes to stdout when output_path is None.
+    """
+    import numpy as np
+
+    if output_path and Path(output_path).suffix.lower() == '.npy':
+        np.save(output_path, matrix)
+        labels_path = Path(output_path).with_suffix('.labels.json')
+        with open(labels_path, 'w', encoding='utf-8') as f:
+            json.dump({'rows': list(row_labels), 'columns': list(column_labels)}, f, indent=2)
+        return
+
+    out = open(output_path, 'w', encoding='utf-8', newline='') if output_path else sys.stdout
+    try:
+        writer = csv.writer(out)
+        writer.writerow(['audio'] + list(column_labels))
+        for label, row in zip(row_labels, matrix):
+            writer.writerow([label] + [f"{score:.6f}" for score in row])
+    finally:
+        if output_path:
+            out.close()
+
+
+def write_embeddings(embeddings, labels, output_path: str, model):
+    """Save embeddings as .npy with a .labels.json sidecar naming each row and the model that produced it."""
+    import numpy as np
+
+    np.save(output_path, embeddings)
+    labels_path = Path(output_path).with_suffix('.labels.json')
+    with open(labels_path, 'w', encoding='utf-8') as f:
+        json.dump({'backend': model.backend, 'version': model.version, 'rows': list(labels)}, f, indent=2)
+
+
+def _calculate_pair_similarity(backend: str, audio_path: str, text_description: str, use_cuda: bool = True,
+                               version: str = None, precision: str = 'fp32', use_cache: bool = True,
+                               use_compile: bool = False, overlap: bool = True, text_threads: int = None,
+                               silence_db: float = None):
+    """
+    Score one audio file against one description with any backend.
+
+    The audio and text towers run concurrently (embed_pair), except for
+    exported models: torch's per-thread counts do not reach their runtimes,
+    so their towers run one after the other.
+    """
+    device = resolve_device(use_cuda, precision)
+    names = {'msclap': 'Microsoft CLAP', 'laion': 'LAION CLAP'}
+    if backend in names:
+        print(f"Backend: {names[backend]}")
+        print(f"Using device: {device}")
+    model = get_model(backend, version, device, precision, use_compile)
+    if backend == 'exported':
+        print(f"Backend: exported {model.backend} {model.version} ({model.runtime})")
+        print(f"Using device: {device}")
+        overlap = False
+
+    print("Processing audio and text...")
+    audio_embeddings, text_embeddings = embed_pair(model, [audio_path], [text_description], use_cache=use_cache,
+                                                   overlap=overlap, text_threads=text_threads, silence_db=silence_db)
+    if silence_db is not None:
+        print(get_silence_stats(model).summary())
 
     # Calculate similarity (cosine similarity)
-    # Normalize embeddings to ensure proper cosine similarity calculation
-    audio_norm = audio_embed / np.linalg.norm(audio_embed, axis=1, keepdims=True)
-    text_norm = text_embed / np.linalg.norm(text_embed, axis=1, keepdims=True)
-    similarity = audio_norm @ text_norm.T
-    similarity_score = float(similarity[0][0])
+    similarity = cosine_similarity_matrix(audio_embeddings, text_embeddings)
+    return float(similarity[0][0])
+
+
+def calculate_similarity_msclap(audio_path: str, text_description: str, use_cuda: bool = True,
+                                version: str = None, precision: str = 'fp32', use_cache: bool = True,
+                                use_compile: bool = False, overlap: bool = True, text_threads: int = None,
+                                silence_db: float = None):
+    """Calculate similarity using Microsoft CLAP."""
+    return _calculate_pair_similarity('msclap', audio_path, text_description, use_cuda, version, precision,
+                                      use_cache, use_compile, overlap, text_threads, silence_db)
+
+
+def calculate_similarity_laion(audio_path: str, text_description: str, use_cuda: bool = True,
+                               version: str = None, precision: str = 'fp32', use_cache: bool = True,
+                               use_compile: bool = False, overlap: bool = True, text_threads: int = None,
+                               silence_db: float = None):
+    """Calculate similarity using LAION CLAP."""
+    return _calculate_pair_similarity('laion', audio_path, text_description, use_cuda, version, precision,
+                                      use_cache, use_compile, overlap, text_threads, silence_db)
 
-    return similarity_score
 
+def calculate_similarity_exported(audio_path: str, text_description: str, use_cuda: bool = True,
+                                  export_dir: str = None, use_cache: bool = True, silence_db: float = None):
+    """Calculate similarity using CLAP towers exported to ONNX or TorchScript."""
+    return _calculate_pair_similarity('exported', audio_path, text_description, use_cuda, export_dir,
+                                      use_cache=use_cache, silence_db=silence_db)
 
-def calculate_similarity(audio_path: str, text_path: str, backend: str = 'msclap', use_cuda: bool = True):
+
+def calculate_similarity(audio_path: str, text_path: str, backend: str = 'msclap', use_cuda: bool = True,
+                         version: str = None, use_cache: bool = True, precision: str = 'fp32',
+                         use_compile: bool = False, overlap: bool = True, text_threads: int = None,
+                         silence_db: float = None):
     """Calculate similarity between audio and text using CLAP."""
 
     # Check if files exist
@@ -101,16 +1366,15 @@ def calculate_similarity(audio_path: str, text_path: str, backend: str = 'msclap
     print(f"Text description: {text_description}")
     print("-" * 60)
 
-    # Calculate similarity based on backend
-    try:
-        if backend == 'msclap':
-            similarity_score = calculate_similarity_msclap(audio_path, text_description, use_cuda)
-        elif backend == 'laion':
-            similarity_score = calculate_similarity_laion(audio_path, text_description, use_cuda)
-        else:
-            print(f"Error: Unknown backend '{backend}'. Use 'msclap' or 'laion'.", file=sys.stderr)
-            sys.exit(1)
+    if backend not in _ENGINES:
+        print(f"Error: Unknown backend '{backend}'. Use 'msclap', 'laion' or 'exported'.", file=sys.stderr)
+        sys.exit(1)
 
+    try:
+        similarity_score = _calculate_pair_similarity(backend, audio_path, text_description, use_cuda, version,
+                                                       precision, use_cache=use_cache, use_compile=use_compile,
+                                                       overlap=overlap, text_threads=text_threads,
+                                                       silence_db=silence_db)
         print("-" * 60)
         print(f"Similarity Score: {similarity_score:.4f}")
         print("-" * 60)
@@ -124,40 +1388,1192 @@ def calculate_similarity(audio_path: str, text_path: str, backend: str = 'msclap
         sys.exit(1)
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Calculate CLAP similarity between audio and text"
+def _add_model_arguments(parser, select_model: bool = True):
+    """Options shared by every mode that loads a model."""
+    if select_model:
+        parser.add_argument(
+            "--backend",
+            type=str,
+            default="msclap",
+            choices=["msclap", "laion", "exported"],
+            help="CLAP backend to use; exported runs artifacts from `export` (default: msclap)"
+        )
+        parser.add_argument(
+            "--model-version",
+            type=str,
+            default=None,
+            help="Model checkpoint (msclap: 2022|2023, laion: 630k-best|630k-audioset-best|..., "
+                 "exported: export directory)"
+        )
+    parser.add_argument(
+        "--no-cuda",
+        action="store_true",
+        help="Disable CUDA and use CPU"
+    )
+    parser.add_argument(
+        "--precision",
+        type=str,
+        default="fp32",
+        choices=PRECISIONS,
+        help="Inference precision; int8 quantizes linear layers, bf16 runs the encoders in bfloat16; "
+             "both run on CPU (default: fp32)"
+    )
+    parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="Run the encoders through torch.compile at fixed batch-size buckets, compiled at load "
+             "(slower start, faster steady state)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the on-disk embedding cache"
+    )
+    parser.add_argument(
+        "--no-profile",
+        action="store_true",
+        help="Ignore the `autotune` profile for this machine on CPU runs"
+    )
+
+
+def _add_batch_arguments(parser, workers: bool = True):
+    """Batch size options for modes that embed many inputs; workers=False leaves out the worker processes."""
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Audio files per model call (default: from the `autotune` profile on CPU, else 32)"
+    )
+    parser.add_argument(
+        "--max-batch-seconds",
+        type=float,
+        default=DEFAULT_MAX_BATCH_SECONDS,
+        help="Seconds of audio decoded per model call; files are batched by duration, so long tracks go in "
+             f"smaller batches (default: {DEFAULT_MAX_BATCH_SECONDS:g})"
+    )
+    parser.add_argument(
+        "--text-batch-size",
+        type=int,
+        default=256,
+        help="Text descriptions per model call (default: 256)"
+    )
+    if workers:
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument(
+            "--decode-workers",
+            type=int,
+            default=0,
+            help="Worker processes that decode and resample audio ahead of the model (default: 0, decode in-process)"
+        )
+        group.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Fork this many CPU workers after loading the model; they share its weights and each decode "
+                 "and embed whole batches (default: from the `autotune` profile, else 0)"
+        )
+        parser.add_argument(
+            "--worker-threads",
+            type=int,
+            default=None,
+            help="Torch threads per --workers process, each pinned to that many CPUs (default: CPUs / workers)"
+        )
+    _add_memory_argument(parser)
+    parser.add_argument(
+        "--trim-silence",
+        action="store_true",
+        help="Trim leading and trailing silence from audio before encoding, skip clips and windows that are "
+             "silent throughout, and report what was saved"
+    )
+    parser.add_argument(
+        "--silence-db",
+        type=float,
+        default=DEFAULT_SILENCE_DB,
+        help=f"Frame level in dBFS below which --trim-silence treats audio as silent (default: {DEFAULT_SILENCE_DB:g})"
+    )
+
+
+def _silence_db(args):
+    """The --silence-db level when --trim-silence is given, else None."""
+    return args.silence_db if args.trim_silence else None
+
+
+def _add_memory_argument(parser):
+    """Batch memory budget option, applied by _apply_tuning_profile."""
+    parser.add_argument(
+        "--max-memory-mb",
+        type=float,
+        default=None,
+        help="Process memory budget; batches are sized to fit under it and split if they still run out of "
+             "memory (default: $CLAP_BATCH_MEMORY_MB, else 80%% of available memory)"
+    )
+
+
+def _apply_tuning_profile(args, backend: str, version: str = None):
+    """
+    Apply the `autotune` profile for backend, version and --precision on
+    this machine to a CPU run.
+
+    Sets torch's intra-op and inter-op threads and, unless given on the
+    command line, the tuned audio batch size (32 without a profile) and
+    the tuned number of --workers. Nothing is tuned on CUDA or with
+    --no-profile. Also applies --max-memory-mb.
+    """
+    profile = None
+    if not args.no_profile and resolve_device(not args.no_cuda, args.precision) == 'cpu':
+        from clap_autotune import apply_threads, load_profile
+        version = version or getattr(args, 'model_version', None) or DEFAULT_VERSIONS.get(backend)
+        profile = load_profile(backend, version, args.precision)
+
+    if profile:
+        apply_threads(profile['intra_threads'], profile['interop_threads'])
+        summary = f"{profile['intra_threads']} intra-op / {profile['interop_threads']} inter-op threads"
+        if getattr(args, 'batch_size', 0) is None:
+            args.batch_size = profile['batch_size']
+            summary += f", batch size {args.batch_size}"
+        if getattr(args, 'workers', 0) is None and not args.decode_workers and profile['instances'] > 1:
+            args.workers = profile['instances']
+            args.worker_threads = args.worker_threads or profile['intra_threads']
+            summary += f", {args.workers} workers"
+        print(f"Using tuned CPU profile: {summary}", file=sys.stderr)
+    if getattr(args, 'batch_size', 0) is None:
+        args.batch_size = 32
+    if getattr(args, 'workers', 0) is None:
+        args.workers = 0
+    if getattr(args, 'max_memory_mb', None):
+        set_batch_memory_budget(int(args.max_memory_mb * 1024 * 1024))
+
+
+def matrix_command(argv):
+    """Entry point for `clap_similarity.py matrix`."""
+    parser = argparse.ArgumentParser(
+        prog="clap_similarity.py matrix",
+        description="Compute the N x M CLAP similarity matrix between audio files and texts"
+    )
+    parser.add_argument(
+        "--audio",
+        type=str,
+        nargs="+",
+        required=True,
+        help="Audio files, glob patterns, or .txt lists of audio paths"
+    )
+    parser.add_argument(
+        "--texts",
+        type=str,
+        nargs="+",
+        default=[],
+        help="Description files, glob patterns of description files, or literal descriptions"
+    )
+    parser.add_argument(
+        "--text-list",
+        type=str,
+        default=None,
+        help="File with one description per line"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        nargs="+",
+        default=[None],
+        help="Output .npy (labels written to .labels.json) and/or .csv files (default: CSV to stdout)"
+    )
+    _add_model_arguments(parser)
+    _add_batch_arguments(parser)
+    args = parser.parse_args(argv)
+
+    audio_paths = expand_audio_paths(args.audio)
+    missing = [path for path in audio_paths if not Path(path).exists()]
+    if missing:
+        print(f"Error: Audio file not found: {missing[0]}", file=sys.stderr)
+        sys.exit(1)
+    texts = expand_texts(args.texts, args.text_list)
+    if not audio_paths or not texts:
+        parser.error("need at least one audio file and one text")
+
+    _apply_tuning_profile(args, args.backend)
+    print(f"Embedding {len(audio_paths)} audio files and {len(texts)} texts...", file=sys.stderr)
+    model = get_model(args.backend, args.model_version, resolve_device(not args.no_cuda, args.precision),
+                      args.precision, args.compile)
+    if args.workers:
+        get_worker_pool(model, args.workers, args.worker_threads)
+    matrix = compute_similarity_matrix(
+        model,
+        audio_paths,
+        [text for _, text in texts],
+        batch_size=args.batch_size,
+        text_batch_size=args.text_batch_size,
+        use_cache=not args.no_cache,
+        decode_workers=args.decode_workers,
+        max_batch_seconds=args.max_batch_seconds,
+        silence_db=_silence_db(args)
+    )
+    if args.trim_silence:
+        print(get_silence_stats(model).summary(), file=sys.stderr)
+
+    for output_path in args.output:
+        write_similarity_matrix(matrix, audio_paths, [label for label, _ in texts], output_path)
+        if output_path:
+            print(f"Similarity matrix saved to: {output_path}", file=sys.stderr)
+    return matrix
+
+
+def embed_text_command(argv):
+    """Entry point for `clap_similarity.py embed-text`."""
+    parser = argparse.ArgumentParser(
+        prog="clap_similarity.py embed-text",
+        description="Embed text descriptions with only the text tower of a CLAP model loaded"
+    )
+    parser.add_argument(
+        "texts",
+        type=str,
+        nargs="*",
+        help="Description files, glob patterns of description files, or literal descriptions"
+    )
+    parser.add_argument(
+        "--text-list",
+        type=str,
+        default=None,
+        help="File with one description per line"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        required=True,
+        help="Output .npy file (labels written to .labels.json)"
+    )
+    _add_model_arguments(parser)
+    parser.add_argument(
+        "--text-batch-size",
+        type=int,
+        default=256,
+        help="Text descriptions per model call (default: 256)"
+    )
+    _add_memory_argument(parser)
+    args = parser.parse_args(argv)
+
+    texts = expand_texts(args.texts, args.text_list)
+    if not texts:
+        parser.error("need at least one text")
+
+    _apply_tuning_profile(args, args.backend)
+    model = get_model(args.backend, args.model_version, resolve_device(not args.no_cuda, args.precision),
+                      args.precision, args.compile, tower='text')
+    print(f"Embedding {len(texts)} texts...", file=sys.stderr)
+    embeddings = embed_text_batched(model, [text for _, text in texts], args.text_batch_size,
+                                    use_cache=not args.no_cache)
+    write_embeddings(embeddings, [label for label, _ in texts], args.output, model)
+    print(f"Text embeddings saved to: {args.output}", file=sys.stderr)
+    return embeddings
+
+
+def embed_audio_command(argv):
+    """Entry point for `clap_similarity.py embed-audio`."""
+    parser = argparse.ArgumentParser(
+        prog="clap_similarity.py embed-audio",
+        description="Embed audio files with only the audio tower of a CLAP model loaded"
+    )
+    parser.add_argument(
+        "audio",
+        type=str,
+        nargs="+",
+        help="Audio files, directories (searched recursively), glob patterns, or .txt lists of audio paths"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        required=True,
+        help="Output .npy file (labels written to .labels.json)"
+    )
+    _add_model_arguments(parser)
+    _add_batch_arguments(parser)
+    args = parser.parse_args(argv)
+
+    from clap_index import collect_audio_files
+
+    audio_paths = []
+    for path in expand_audio_paths(args.audio):
+        audio_paths.extend(collect_audio_files([path]) if Path(path).is_dir() else [path])
+    missing = [path for path in audio_paths if not Path(path).exists()]
+    if missing:
+        print(f"Error: Audio file not found: {missing[0]}", file=sys.stderr)
+        sys.exit(1)
+    if not audio_paths:
+        print("Error: No audio files found", file=sys.stderr)
+        sys.exit(1)
+
+    _apply_tuning_profile(args, args.backend)
+    model = get_model(args.backend, args.model_version, resolve_device(not args.no_cuda, args.precision),
+                      args.precision, args.compile, tower='audio')
+    if args.workers:
+        get_worker_pool(model, args.workers, args.worker_threads)
+    print(f"Embedding {len(audio_paths)} audio files...", file=sys.stderr)
+    embeddings = embed_audio_batched(model, audio_paths, args.batch_size, use_cache=not args.no_cache,
+                                     decode_workers=args.decode_workers, max_batch_seconds=args.max_batch_seconds,
+                                     silence_db=_silence_db(args))
+    if args.trim_silence:
+        print(get_silence_stats(model).summary(), file=sys.stderr)
+    write_embeddings(embeddings, audio_paths, args.output, model)
+    print(f"Audio embeddings saved to: {args.output}", file=sys.stderr)
+    return embeddings
+
+
+def index_command(argv):
+    """Entry point for `clap_similarity.py index`."""
+    parser = argparse.ArgumentParser(
+        prog="clap_similarity.py index",
+        description="Build a persistent CLAP retrieval index over a directory of audio"
+    )
+    parser.add_argument(
+        "paths",
+        type=str,
+        nargs="+",
+        help="Audio files or directories (searched recursively)"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="clap_index",
+        help="Index directory to write (default: clap_index)"
+    )
+    parser.add_argument(
+        "--captions",
+        action="store_true",
+        help="Also index <stem>_description.txt captions for audio-to-text search"
+    )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        default="exact",
+        choices=["exact", "ivf"],
+        help="Search engine stored with the index (default: exact)"
+    )
+    parser.add_argument(
+        "--ivf-lists",
+        type=int,
+        default=None,
+        help="Number of IVF lists (default: sqrt of the number of clips)"
+    )
+    _add_model_arguments(parser)
+    _add_batch_arguments(parser)
+    args = parser.parse_args(argv)
+
+    from clap_index import ClapIndex, collect_audio_files, find_caption
+
+    audio_paths = collect_audio_files(args.paths)
+    if not audio_paths:
+        print("Error: No audio files found", file=sys.stderr)
+        sys.exit(1)
+
+    _apply_tuning_profile(args, args.backend)
+    model = get_model(args.backend, args.model_version, resolve_device(not args.no_cuda, args.precision),
+                      args.precision, args.compile, tower='both' if args.captions else 'audio')
+    if args.workers:
+        get_worker_pool(model, args.workers, args.worker_threads)
+    print(f"Embedding {len(audio_paths)} audio files...")
+    audio_embeddings = embed_audio_batched(model, audio_paths, args.batch_size, use_cache=not args.no_cache,
+                                           decode_workers=args.decode_workers, max_batch_seconds=args.max_batch_seconds,
+                                           silence_db=_silence_db(args))
+    if args.trim_silence:
+        print(get_silence_stats(model).summary())
+
+    captions = caption_embeddings = caption_rows = None
+    if args.captions:
+        # Only clips with a caption go into the caption index
+        captioned = [(row, caption) for row, caption in enumerate(map(find_caption, audio_paths)) if caption]
+        caption_rows = [row for row, _ in captioned]
+        captions = [caption for _, caption in captioned]
+        if captions:
+            print(f"Embedding {len(captions)} captions (of {len(audio_paths)} clips)...")
+            caption_embeddings = embed_text_batched(model, captions, args.text_batch_size,
+                                                    use_cache=not args.no_cache)
+        else:
+            print("Warning: No <stem>_description.txt captions found; the index has no audio-to-text search",
+                  file=sys.stderr)
+
+    index = ClapIndex(audio_paths, audio_embeddings, model.backend, model.version,
+                      captions, caption_embeddings, engine=args.engine, n_lists=args.ivf_lists,
+                      caption_rows=caption_rows)
+    index.save(args.output)
+    print(f"Index of {len(audio_paths)} clips saved to: {args.output}")
+    return index
+
+
+def search_command(argv):
+    """Entry point for `clap_similarity.py search`."""
+    parser = argparse.ArgumentParser(
+        prog="clap_similarity.py search",
+        description="Search a CLAP index with free text (text-to-audio) or an audio file (audio-to-text)"
+    )
+    parser.add_argument(
+        "query",
+        type=str,
+        nargs="?",
+        help="Text query, e.g. \"buzzer ringing\""
+    )
+    parser.add_argument(
+        "--audio",
+        type=str,
+        default=None,
+        help="Audio file to query captions with instead of text"
+    )
+    parser.add_argument(
+        "--index",
+        type=str,
+        default="clap_index",
+        help="Index directory (default: clap_index)"
+    )
+    parser.add_argument(
+        "--k",
+        type=int,
+        default=10,
+        help="Number of results (default: 10)"
+    )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        default=None,
+        choices=["exact", "ivf"],
+        help="Override the engine stored with the index"
+    )
+    parser.add_argument(
+        "--nprobe",
+        type=int,
+        default=None,
+        help="IVF lists scanned per query (default: 1/8 of the lists)"
+    )
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        help="Report IVF recall@k and latency against exact search"
+    )
+    _add_model_arguments(parser, select_model=False)
+    args = parser.parse_args(argv)
+
+    if not args.query and not args.audio and not args.report:
+        parser.error("give a text query, --audio, or --report")
+
+    from clap_index import ClapIndex, benchmark_index
+
+    index = ClapIndex.load(args.index, engine=args.engine)
+    _apply_tuning_profile(args, index.backend, index.version)
+    if args.query or args.audio:
+        # Text queries need only the text tower and audio queries only the audio tower
+        tower = 'both' if args.query and args.audio else 'text' if args.query else 'audio'
+        model = get_model(index.backend, index.version, resolve_device(not args.no_cuda, args.precision),
+                          args.precision, args.compile, tower=tower)
+    search_kwargs = {'nprobe': args.nprobe} if index.engine == 'ivf' and args.nprobe else {}
+
+    if args.query:
+        query_embedding = embed_text_batched(model, [args.query], use_cache=not args.no_cache)
+        print(f"Top {args.k} clips for: {args.query}")
+        print("-" * 60)
+        for rank, (path, score) in enumerate(index.search_audio(query_embedding, args.k, **search_kwargs)[0], 1):
+            print(f"{rank:3d}. {score:.4f}  {path}")
+
+    if args.audio:
+        query_embedding = embed_audio_batched(model, [args.audio], use_cache=not args.no_cache)
+        print(f"Top {args.k} captions for: {args.audio}")
+        print("-" * 60)
+        for rank, (path, caption, score) in enumerate(
+                index.search_captions(query_embedding, args.k, **search_kwargs)[0], 1):
+            print(f"{rank:3d}. {score:.4f}  {Path(path).name}: {caption}")
+
+    if args.report:
+        # Captions are realistic text queries; fall back to the clips themselves
+        if index.caption_index is not None:
+            queries = index.caption_index.embeddings
+        else:
+            queries = index.audio.embeddings
+        print(f"\nRecall@{args.k} vs latency over {len(queries)} queries ({len(index.audio)} clips)")
+        print("-" * 60)
+        for row in benchmark_index(index, queries, args.k):
+            setting = "exact" if row['engine'] == 'exact' else f"ivf nprobe={row['nprobe']}"
+            print(f"{setting:18s} recall={row['recall']:.3f}  latency={row['latency_ms']:.3f} ms/query")
+
+
+def serve_command(argv):
+    """Entry point for `clap_similarity.py serve`."""
+    parser = argparse.ArgumentParser(
+        prog="clap_similarity.py serve",
+        description="Keep a CLAP model resident and serve /embed/audio, /embed/text and /score over HTTP"
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="Interface to bind (default: 127.0.0.1)"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="Port to listen on (default: 8765)"
+    )
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=32,
+        help="Most requests coalesced into one model call (default: 32)"
+    )
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=10.0,
+        help="Longest a request waits for others to join its batch (default: 10)"
+    )
+    _add_model_arguments(parser)
+    args = parser.parse_args(argv)
+
+    from clap_server import serve
+
+    _apply_tuning_profile(args, args.backend)
+    model = get_model(args.backend, args.model_version, resolve_device(not args.no_cuda, args.precision),
+                      args.precision, args.compile)
+    serve(model, args.host, args.port, args.max_batch_size, args.max_wait_ms, use_cache=not args.no_cache)
+
+
+def compare_command(argv):
+    """Entry point for `clap_similarity.py compare`."""
+    parser = argparse.ArgumentParser(
+        prog="clap_similarity.py compare",
+        description="Score a reference set at two precisions (or with and without --trim-silence) and report "
+                    "speedup, memory and accuracy cost"
+    )
+    parser.add_argument(
+        "paths",
+        type=str,
+        nargs="*",
+        default=["test_data"],
+        help="Audio files or directories paired with their <stem>_description.txt (default: test_data)"
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="CSV/JSONL manifest of audio,text pairs to use as the reference set instead"
+    )
+    parser.add_argument(
+        "--reference",
+        type=str,
+        default="fp32",
+        choices=PRECISIONS,
+        help="Precision the candidate is compared against, and that --trim-silence is compared at (default: fp32)"
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Timed runs per precision; the fastest is reported (default: 3)"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Also write the report as JSON"
+    )
+    _add_model_arguments(parser)
+    _add_batch_arguments(parser, workers=False)
+    parser.set_defaults(precision="int8")
+    args = parser.parse_args(argv)
+
+    from clap_compare import compare_precisions, compare_trimming, print_report
+    from clap_index import collect_audio_files, find_caption
+
+    if args.manifest:
+        pairs = [(r['audio'], r['text']) for r in read_manifest(args.manifest) if 'error' not in r]
+    else:
+        pairs = [(path, find_caption(path)) for path in collect_audio_files(args.paths)]
+        pairs = [(path, caption) for path, caption in pairs if caption]
+    if len(pairs) < 2:
+        print("Error: Need at least two audio/description pairs to compare", file=sys.stderr)
+        sys.exit(1)
+
+    _apply_tuning_profile(args, args.backend)
+    # Both precisions run on the same device so timings are comparable
+    device = resolve_device(not args.no_cuda and not set(CPU_PRECISIONS) & {args.reference, args.precision})
+    if args.trim_silence:
+        # Trimming is compared at the reference precision
+        report = compare_trimming(
+            args.backend,
+            [audio for audio, _ in pairs],
+            [text for _, text in pairs],
+            version=args.model_version,
+            device=resolve_device(not args.no_cuda, args.reference),
+            precision=args.reference,
+            silence_db=args.silence_db,
+            batch_size=args.batch_size,
+            text_batch_size=args.text_batch_size,
+            repeats=args.repeats,
+            use_compile=args.compile
+        )
+    else:
+        report = compare_precisions(
+            args.backend,
+            [audio for audio, _ in pairs],
+            [text for _, text in pairs],
+            version=args.model_version,
+            device=device,
+            reference=args.reference,
+            candidate=args.precision,
+            batch_size=args.batch_size,
+            text_batch_size=args.text_batch_size,
+            repeats=args.repeats,
+            use_compile=args.compile
+        )
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to: {args.output}")
+    return report
+
+
+def evaluate_command(argv):
+    """Entry point for `clap_similarity.py evaluate`."""
+    parser = argparse.ArgumentParser(
+        prog="clap_similarity.py evaluate",
+        description="Score every audio file of one or more datasets against its own description "
+                    "(or, with --negatives, against every description)"
+    )
+    parser.add_argument(
+        "datasets",
+        type=str,
+        nargs="*",
+        help="Bundled dataset names (dcase, librispeech, musiccaps) or directories of audio with "
+             "<stem>_description.txt files (default: all bundled datasets unless --manifest is given)"
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="CSV/JSONL manifest of audio,text pairs to evaluate as one more dataset"
+    )
+    parser.add_argument(
+        "--negatives",
+        action="store_true",
+        help="Score every audio file against every description across the datasets and report "
+             "positive/negative separation, Recall@K, mAP and ROC-AUC per dataset"
+    )
+    parser.add_argument(
+        "--results-dir",
+        type=str,
+        default=None,
+        help="Directory for the reports (default: data_sanity_checks/results/positive_tests, "
+             "or data_sanity_checks/results/negative_tests with --negatives)"
+    )
+    ledger_group = parser.add_mutually_exclusive_group()
+    ledger_group.add_argument(
+        "--ledger",
+        type=str,
+        default=None,
+        help="SQLite results ledger; pairs already scored there are not scored again "
+             "(default: data_sanity_checks/results/ledger.sqlite3)"
+    )
+    ledger_group.add_argument(
+        "--no-ledger",
+        action="store_true",
+        help="Score every pair without reading or writing the results ledger"
+    )
+    _add_model_arguments(parser)
+    _add_batch_arguments(parser)
+    args = parser.parse_args(argv)
+
+    from clap_evaluate import DATASETS, LEDGER_PATH, run_evaluation
+
+    sources = args.datasets or ([] if args.manifest else list(DATASETS))
+    for source in sources:
+        if source not in DATASETS and not Path(source).is_dir():
+            parser.error(f"'{source}' is neither a bundled dataset ({', '.join(DATASETS)}) nor a directory")
+    if args.manifest and not Path(args.manifest).exists():
+        print(f"Error: Manifest not found: {args.manifest}", file=sys.stderr)
+        sys.exit(1)
+
+    _apply_tuning_profile(args, args.backend)
+    results = run_evaluation(
+        sources,
+        manifest=args.manifest,
+        backend=args.backend,
+        version=args.model_version,
+        device=resolve_device(not args.no_cuda, args.precision),
+        precision=args.precision,
+        use_compile=args.compile,
+        workers=args.workers,
+        worker_threads=args.worker_threads,
+        results_dir=args.results_dir,
+        negatives=args.negatives,
+        ledger_path=None if args.no_ledger else (args.ledger or LEDGER_PATH),
+        batch_size=args.batch_size,
+        text_batch_size=args.text_batch_size,
+        use_cache=not args.no_cache,
+        decode_workers=args.decode_workers,
+        max_batch_seconds=args.max_batch_seconds,
+        silence_db=_silence_db(args)
+    )
+    if not results:
+        sys.exit(1)
+    return results
+
+
+def export_command(argv):
+    """Entry point for `clap_similarity.py export`."""
+    parser = argparse.ArgumentParser(
+        prog="clap_similarity.py export",
+        description="Export the audio and text encoders to ONNX or TorchScript and check parity"
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        default="onnx",
+        choices=["onnx", "torchscript"],
+        help="Artifact format (default: onnx)"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Export directory (default: exports/<backend>-<version>-<format>)"
+    )
+    parser.add_argument(
+        "--opset",
+        type=int,
+        default=17,
+        help="ONNX opset version (default: 17)"
+    )
+    parser.add_argument(
+        "--parity-data",
+        type=str,
+        nargs="+",
+        default=["test_data"],
+        help="Audio files or directories with <stem>_description.txt used for the parity check (default: test_data)"
+    )
+    parser.add_argument(
+        "--parity-samples",
+        type=int,
+        default=4,
+        help="Clips and descriptions compared in the parity check (default: 4)"
+    )
+    parser.add_argument(
+        "--atol",
+        type=float,
+        default=1e-3,
+        help="Largest allowed absolute embedding difference (default: 1e-3)"
+    )
+    parser.add_argument(
+        "--skip-parity",
+        action="store_true",
+        help="Do not compare the exported engine against the original model"
+    )
+    _add_model_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.backend == 'exported':
+        parser.error("choose the msclap or laion backend to export")
+    if args.compile:
+        parser.error("--compile does not apply to export; export traces the eager model")
+
+    from clap_export import check_parity, export_model
+    from clap_index import collect_audio_files, find_caption
+
+    model = get_model(args.backend, args.model_version, 'cpu')
+    output_dir = args.output or f"exports/{model.backend}-{model.version}-{args.format}"
+    print(f"Exporting {model.backend} {model.version} to {args.format}...")
+    try:
+        export_model(model, output_dir, args.format, args.opset)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Exported model saved to: {output_dir}")
+    print(f"Use it with: --backend exported --model-version {output_dir}")
+
+    if args.skip_parity:
+        return output_dir
+
+    pairs = [(path, find_caption(path)) for path in collect_audio_files(args.parity_data)]
+    pairs = [(path, caption) for path, caption in pairs if caption][:args.parity_samples]
+    if not pairs:
+        print("Warning: No audio with descriptions found; parity not checked", file=sys.stderr)
+        return output_dir
+
+    exported = get_model('exported', output_dir, 'cpu')
+    report = check_parity(model, exported, [path for path, _ in pairs], [caption for _, caption in pairs])
+    print("-" * 60)
+    failed = False
+    for tower in ('audio', 'text'):
+        if tower not in report:
+            continue
+        result = report[tower]
+        ok = result['max_abs_diff'] <= args.atol
+        failed = failed or not ok
+        print(f"{'✓' if ok else '✗'} {tower}: max |diff| {result['max_abs_diff']:.2e}, "
+              f"min cosine {result['min_cosine']:.6f} over {result['count']} samples")
+    if 'truncated_text' in report:
+        result = report['truncated_text']
+        print(f"  {result['count']} descriptions are longer than {exported.text_settings['max_length']} tokens and "
+              f"were left out: the exported text tower truncates them, the original model does not "
+              f"(min cosine {result['min_cosine']:.6f})")
+    print("-" * 60)
+    if failed:
+        print(f"Error: Exported embeddings differ from the original model by more than {args.atol}",
+              file=sys.stderr)
+        sys.exit(1)
+    return output_dir
+
+
+def autotune_command(argv):
+    """Entry point for `clap_similarity.py autotune`."""
+    parser = argparse.ArgumentParser(
+        prog="clap_similarity.py autotune",
+        description="Benchmark CPU thread, instance and batch-size settings and save the fastest as this "
+                    "machine's profile"
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default="msclap",
+        choices=["msclap", "laion"],
+        help="CLAP backend to tune (default: msclap)"
+    )
+    parser.add_argument(
+        "--model-version",
+        type=str,
+        default=None,
+        help="Model checkpoint to benchmark (default: the backend's default)"
+    )
+    parser.add_argument(
+        "--precision",
+        type=str,
+        default="fp32",
+        choices=PRECISIONS,
+        help="Precision to benchmark at (default: fp32)"
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Intra-op thread counts to try (default: powers of two up to the CPU count)"
+    )
+    parser.add_argument(
+        "--interop-threads",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Inter-op thread counts to try (default: 1 2)"
+    )
+    parser.add_argument(
+        "--instances",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Parallel model instances to try (default: powers of two, within the CPU count)"
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Audio batch sizes to try (default: 4 8 16 32)"
+    )
+    parser.add_argument(
+        "--batches",
+        type=int,
+        default=None,
+        help="Timed batches per setting, after a warm-up batch (default: 3)"
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="Profile file to update (default: $CLAP_TUNING_PROFILES or $TORCH_HOME/clap_tuning.json)"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Report the results without saving a profile"
+    )
+    args = parser.parse_args(argv)
+
+    from clap_autotune import DEFAULT_BATCH_SIZES, DEFAULT_BATCHES, autotune, save_profile
+
+    try:
+        profile, _ = autotune(
+            args.backend,
+            args.model_version,
+            args.precision,
+            threads=args.threads,
+            interop_threads=args.interop_threads,
+            instances=args.instances,
+            batch_sizes=args.batch_sizes or DEFAULT_BATCH_SIZES,
+            batches=args.batches or DEFAULT_BATCHES
+        )
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print("-" * 60)
+    print(f"Best: {profile['intra_threads']} intra-op threads, {profile['interop_threads']} inter-op threads, "
+          f"{profile['instances']} instance(s), batch size {profile['batch_size']} "
+          f"({profile['clips_per_second']:.2f} clips/s)")
+    if not args.dry_run:
+        path = save_profile(profile, args.profile)
+        print(f"Profile saved to: {path}")
+    return profile
+
+
+def snapshot_command(argv):
+    """Entry point for `clap_similarity.py snapshot`."""
+    parser = argparse.ArgumentParser(
+        prog="clap_similarity.py snapshot",
+        description="Save a fully built model as a memory-mapped snapshot that later runs load instead"
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default="msclap",
+        choices=["msclap", "laion"],
+        help="CLAP backend to snapshot (default: msclap)"
+    )
+    parser.add_argument(
+        "--model-version",
+        type=str,
+        default=None,
+        help="Model checkpoint to snapshot (default: the backend's default)"
+    )
+    parser.add_argument(
+        "--remove",
+        action="store_true",
+        help="Delete the snapshot instead, so the model is built from its checkpoint again"
+    )
+    args = parser.parse_args(argv)
+
+    import shutil
+    import time
+    from clap_snapshot import save_snapshot, snapshot_path, snapshot_status
+
+    version = args.model_version or DEFAULT_VERSIONS[args.backend]
+    path = snapshot_path(args.backend, version)
+    if args.remove:
+        if path.exists():
+            shutil.rmtree(path)
+            print(f"Removed snapshot: {path}")
+        else:
+            print(f"No snapshot at: {path}")
+        return path
+
+    start = time.perf_counter()
+    engine = _ENGINES[args.backend](version, 'cpu', 'fp32', use_snapshot=False)
+    build_seconds = time.perf_counter() - start
+    print(f"Built {args.backend} {version} in {build_seconds:.2f}s")
+
+    try:
+        save_snapshot(engine, path.parent)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Snapshot saved to: {path}")
+
+    # Load it back the way get_model will and check it embeds the same
+    start = time.perf_counter()
+    restored = _ENGINES[args.backend](version, 'cpu', 'fp32')
+    load_seconds = time.perf_counter() - start
+    if not restored.from_snapshot:
+        _, reason = snapshot_status(args.backend, version)
+        print(f"Error: The snapshot cannot be loaded: {reason}", file=sys.stderr)
+        sys.exit(1)
+    difference = float(abs(engine.embed_text([SNAPSHOT_CHECK_TEXT]) - restored.embed_text([SNAPSHOT_CHECK_TEXT])).max())
+    if difference > 1e-5:
+        print(f"Error: Snapshot embeddings differ from the built model by {difference:.2e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Snapshot loads in {load_seconds:.2f}s (vs {build_seconds:.2f}s to build)")
+    return path
+
+
+# Subcommands; anything else on the command line is the single-pair / --manifest mode
+SUBCOMMANDS = {
+    'matrix': matrix_command,
+    'embed-text': embed_text_command,
+    'embed-audio': embed_audio_command,
+    'index': index_command,
+    'search': search_command,
+    'serve': serve_command,
+    'compare': compare_command,
+    'evaluate': evaluate_command,
+    'export': export_command,
+    'autotune': autotune_command,
+    'snapshot': snapshot_command,
+}
+
+
+def calculate_windowed_similarity(audio_path: str, text_path: str, backend: str = 'msclap', use_cuda: bool = True,
+                                  version: str = None, window: float = None, hop: float = None,
+                                  batch_size: int = 16, use_cache: bool = True, precision: str = 'fp32',
+                                  use_compile: bool = False, silence_db: float = None):
+    """Print the per-window similarity curve and the best-matching time span."""
+    for path, kind in ((audio_path, "Audio"), (text_path, "Text")):
+        if not Path(path).exists():
+            print(f"Error: {kind} file not found: {path}", file=sys.stderr)
+            sys.exit(1)
+
+    text_description = load_text_file(text_path)
+    print(f"Audio file: {audio_path}")
+    print(f"Text description: {text_description}")
+    print("-" * 60)
+
+    model = get_model(backend, version, resolve_device(use_cuda, precision), precision, use_compile)
+    result = score_windows(model, audio_path, text_description, window, hop, batch_size, use_cache, silence_db)
+
+    rows = [(start, end, f"{score:.4f}") for start, end, score in result['windows']]
+    rows += [(start, end, "silent (skipped)") for start, end in result['skipped']]
+    print(f"Window: {result['window']:.2f}s, hop: {result['hop']:.2f}s, {len(rows)} windows")
+    for start, end, label in sorted(rows):
+        print(f"  {start:8.2f}s - {end:8.2f}s: {label}")
+    if silence_db is not None:
+        print(get_silence_stats(model).summary())
+
+    print("-" * 60)
+    if result['best'] is None:
+        print("Best match: none (every window is silent)")
+    else:
+        start, end, score = result['best']
+        print(f"Best match: {start:.2f}s - {end:.2f}s (Similarity Score: {score:.4f})")
+    print("-" * 60)
+    return result
+
+
+def main():
+    # Run as a script, this module is __main__, and `import clap_similarity` in the
+    # other clap_* modules would load a second copy with its own model registry and
+    # memory budgets; point that import here so flags like --max-memory-mb reach them
+    sys.modules.setdefault('clap_similarity', sys.modules[__name__])
+
+    argv = sys.argv[1:]
+    if argv and argv[0] in SUBCOMMANDS:
+        from concurrent.futures.process import BrokenProcessPool
+
+        try:
+            return SUBCOMMANDS[argv[0]](argv[1:])
+        except BrokenProcessPool as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    parser = argparse.ArgumentParser(
+        description="Calculate CLAP similarity between audio and text",
+        epilog="Subcommands: " + ", ".join(SUBCOMMANDS) + " (run `clap_similarity.py <subcommand> --help`)"
     )
     parser.add_argument(
         "audio_file",
         type=str,
+        nargs="?",
         help="Path to audio file"
     )
     parser.add_argument(
         "text_file",
         type=str,
+        nargs="?",
         help="Path to text description file"
     )
     parser.add_argument(
-        "--backend",
+        "--manifest",
         type=str,
-        default="msclap",
-        choices=["msclap", "laion"],
-        help="CLAP backend to use (default: msclap)"
+        default=None,
+        help="CSV/JSONL file of audio,text (or audio,text_file) pairs to score in batches"
     )
     parser.add_argument(
-        "--no-cuda",
+        "--output",
+        type=str,
+        default=None,
+        help="JSONL file for --manifest results (default: stdout)"
+    )
+    parser.add_argument(
+        "--window",
+        type=float,
+        default=None,
+        help="Score overlapping windows of this many seconds and report the best-matching span"
+    )
+    parser.add_argument(
+        "--hop",
+        type=float,
+        default=None,
+        help="Seconds between window starts in --window mode (default: half a window)"
+    )
+    parser.add_argument(
+        "--text-threads",
+        type=int,
+        default=None,
+        help="CPU threads for the text tower while audio is embedded alongside it (default: a quarter)"
+    )
+    parser.add_argument(
+        "--sequential",
         action="store_true",
-        help="Disable CUDA and use CPU"
+        help="Embed the audio and then the text instead of both at once"
     )
+    _add_batch_arguments(parser)
+    _add_model_arguments(parser)
+
+    args = parser.parse_args(argv)
+
+    if args.manifest:
+        if args.audio_file or args.text_file:
+            parser.error("audio_file/text_file cannot be combined with --manifest")
+        _apply_tuning_profile(args, args.backend)
+        score_manifest(
+            args.manifest,
+            args.output,
+            backend=args.backend,
+            use_cuda=not args.no_cuda,
+            version=args.model_version,
+            batch_size=args.batch_size,
+            text_batch_size=args.text_batch_size,
+            use_cache=not args.no_cache,
+            decode_workers=args.decode_workers,
+            precision=args.precision,
+            use_compile=args.compile,
+            workers=args.workers,
+            worker_threads=args.worker_threads,
+            max_batch_seconds=args.max_batch_seconds,
+            silence_db=_silence_db(args)
+        )
+        return
+
+    if not args.audio_file or not args.text_file:
+        parser.error("audio_file and text_file are required unless --manifest is given")
+    if args.workers or args.worker_threads or args.decode_workers:
+        parser.error("--workers, --worker-threads and --decode-workers apply to --manifest only; "
+                     "a single pair (and --window) is embedded in this process")
+    # Nor does an `autotune` worker count apply to it
+    args.workers = 0
+    _apply_tuning_profile(args, args.backend)
 
-    args = parser.parse_args()
+    if args.window or args.hop:
+        calculate_windowed_similarity(
+            args.audio_file,
+            args.text_file,
+            backend=args.backend,
+            use_cuda=not args.no_cuda,
+            version=args.model_version,
+            window=args.window,
+            hop=args.hop,
+            batch_size=args.batch_size,
+            use_cache=not args.no_cache,
+            precision=args.precision,
+            use_compile=args.compile,
+            silence_db=_silence_db(args)
+        )
+        return
 
     calculate_similarity(
         args.audio_file,
         args.text_file,
         backend=args.backend,
-        use_cuda=not args.no_cuda
+        use_cuda=not args.no_cuda,
+        version=args.model_version,
+        use_cache=not args.no_cache,
+        precision=args.precision,
+        use_compile=args.compile,
+        overlap=not args.sequential,
+        text_threads=args.text_threads,
+        silence_db=_silence_db(args)
     )
 
 
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+CLAP Model Snapshots
+Saves a fully constructed backend model (msclap.CLAP or CLAP_Module) as a
+pickled skeleton, whose tensors are replaced by references, plus one
+safetensors file holding the tensors. Loading unpickles the skeleton and
+maps the weights from the file lazily, skipping HuggingFace model
+construction and checkpoint parsing.
+"""
+
+import importlib
+import importlib.metadata
+import io
+import json
+import os
+import pickle
+import shutil
+import time
+import types
+from pathlib import Path
+import torch
+from safetensors.torch import load_file, save_file
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Lives in the model cache next to the downloaded checkpoints
+DEFAULT_SNAPSHOT_DIR = Path(os.environ.get(
+    'CLAP_SNAPSHOT_DIR',
+    Path(os.environ.get('TORCH_HOME', Path.home() / '.cache' / 'torch')) / 'clap_snapshots'
+))
+
+# Packages whose classes the skeleton pickles; a snapshot is only used with the same versions
+_PACKAGES = {
+    'msclap': ('msclap', 'transformers', 'torch'),
+    'laion': ('laion_clap', 'transformers', 'torch'),
+}
+
+
+def snapshot_path(backend: str, version: str, snapshot_dir=None) -> Path:
+    return Path(snapshot_dir or DEFAULT_SNAPSHOT_DIR) / f"{backend}-{version}"
+
+
+def _package_versions(backend: str):
+    versions = {}
+    for package in _PACKAGES[backend]:
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def _checkpoint_stamp(checkpoint_path):
+    """Size and mtime of the source checkpoint, so a replaced checkpoint invalidates the snapshot."""
+    try:
+        stat = Path(checkpoint_path).stat()
+    except (OSError, TypeError):
+        return None
+    return {'path': str(checkpoint_path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _dict_keys(keys):
+    return dict.fromkeys(keys).keys()
+
+
+class _SkeletonPickler(pickle.Pickler):
+    """Pickle an object graph with every tensor replaced by a numbered reference."""
+
+    def __init__(self, file):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.tensors = {}
+        self._ids = {}
+        self._storages = set()
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, torch.Tensor):
+            return None
+        if id(obj) not in self._ids:
+            if obj.device.type != 'cpu' or obj.layout != torch.strided or obj.is_quantized:
+                raise ValueError("Only dense CPU tensors can be snapshotted; snapshot an fp32 model loaded on CPU")
+            name = f"t{len(self._ids)}"
+            tensor = obj.detach()
+            # safetensors stores every tensor on its own; copy views of storage already saved
+            storage = tensor.untyped_storage().data_ptr()
+            if storage in self._storages or not tensor.is_contiguous():
+                tensor = tensor.clone(memory_format=torch.contiguous_format)
+            self._storages.add(tensor.untyped_storage().data_ptr())
+            self.tensors[name] = tensor
+            self._ids[id(obj)] = (name, isinstance(obj, torch.nn.Parameter), obj.requires_grad)
+        return self._ids[id(obj)]
+
+    def reducer_override(self, obj):
+        # msclap keeps the tokenizer's output keys as a dict_keys view, and
+        # modules it references (e.g. its config's source) are re-imported by name
+        if type(obj) is type({}.keys()):
+            return _dict_keys, (list(obj),)
+        if isinstance(obj, types.ModuleType):
+            return importlib.import_module, (obj.__name__,)
+        return NotImplemented
+
+
+class _SkeletonUnpickler(pickle.Unpickler):
+    """Unpickle a skeleton, resolving tensor references against the mapped weights."""
+
+    def __init__(self, file, tensors):
+        super().__init__(file)
+        self.tensors = tensors
+
+    def persistent_load(self, pid):
+        name, is_parameter, requires_grad = pid
+        tensor = self.tensors[name]
+        return torch.nn.Parameter(tensor, requires_grad=requires_grad) if is_parameter else tensor
+
+
+def save_snapshot(engine, snapshot_dir=None) -> Path:
+    """
+    Snapshot the backend model of an fp32 engine loaded on CPU.
+
+    Writes skeleton.pkl, weights.safetensors and meta.json to a fresh
+    directory and swaps it into place, so readers never see a partial
+    snapshot. Returns the snapshot directory.
+    """
+    if engine.backend not in _PACKAGES:
+        raise ValueError(f"Backend '{engine.backend}' cannot be snapshotted")
+    if engine.device != 'cpu' or engine.precision != 'fp32':
+        raise ValueError("Snapshot an fp32 model loaded on CPU; precision is applied when the snapshot loads")
+    if getattr(engine, 'tower', 'both') != 'both':
+        raise ValueError("Snapshot a model loaded with both towers; a single tower is split off when it loads")
+
+    path = snapshot_path(engine.backend, engine.version, snapshot_dir)
+    tmp_path = path.with_name(path.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+
+    try:
+        skeleton = io.BytesIO()
+        pickler = _SkeletonPickler(skeleton)
+        pickler.dump(engine.model)
+        save_file(pickler.tensors, str(tmp_path / 'weights.safetensors'))
+        (tmp_path / 'skeleton.pkl').write_bytes(skeleton.getvalue())
+
+        meta = {
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'backend': engine.backend,
+            'version': engine.version,
+            'packages': _package_versions(engine.backend),
+            'checkpoint': _checkpoint_stamp(engine.checkpoint_path),
+            'tensors': len(pickler.tensors),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        with open(tmp_path / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    if path.exists():
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def snapshot_status(backend: str, version: str, snapshot_dir=None):
+    """
+    Return (meta, reason): meta when a usable snapshot exists, else None and why not.
+
+    The source checkpoint is compared with the one snapshotted only while
+    it is still on disk, so a container can ship the snapshot alone.
+    """
+    path = snapshot_path(backend, version, snapshot_dir)
+    try:
+        with open(path / 'meta.json', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None, "no snapshot"
+    if meta.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        return None, "snapshot format changed"
+    if meta.get('packages') != _package_versions(backend):
+        return None, "installed package versions differ from the snapshot's"
+    checkpoint = meta.get('checkpoint')
+    if checkpoint and Path(checkpoint['path']).exists() and _checkpoint_stamp(checkpoint['path']) != checkpoint:
+        return None, "checkpoint changed since the snapshot"
+    return meta, None
+
+
+def load_snapshot(backend: str, version: str, snapshot_dir=None):
+    """
+    Return the snapshotted backend model for (backend, version), or None if there is no usable snapshot.
+
+    Weights are memory-mapped from weights.safetensors and only paged in
+    as inference touches them.
+    """
+    meta, _ = snapshot_status(backend, version, snapshot_dir)
+    if meta is None:
+        return None
+
+    path = snapshot_path(backend, version, snapshot_dir)
+    tensors = load_file(str(path / 'weights.safetensors'))
+    with open(path / 'skeleton.pkl', 'rb') as f:
+        return _SkeletonUnpickler(f, tensors).load()
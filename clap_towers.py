@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+CLAP Tower-Only Loading
+Builds an engine's backend model with just one of its two encoder towers
+(audio or text) for jobs that only embed one modality. msclap builds only
+the requested encoder and reads only its weights from the checkpoint;
+otherwise the full model is built or restored and the unused tower is
+released afterwards.
+"""
+
+# Submodule names of each tower, per backend model
+_MSCLAP_TOWERS = {
+    'audio': ('audio_encoder',),
+    'text': ('caption_encoder',),
+}
+
+# LAION's CLAP keeps projections and text-transformer pieces beside its branches;
+# attributes a given checkpoint does not have are skipped
+_LAION_TOWERS = {
+    'audio': ('audio_branch', 'audio_transform', 'audio_projection'),
+    'text': ('text_branch', 'text_transform', 'text_projection', 'token_embedding',
+             'positional_embedding', 'ln_final'),
+}
+
+
+def _other(tower: str) -> str:
+    return 'text' if tower == 'audio' else 'audio'
+
+
+def _load_checkpoint(path):
+    """Load a torch checkpoint memory-mapped where supported, so unused tensors are never read."""
+    import torch
+
+    try:
+        return torch.load(path, map_location='cpu', mmap=True)
+    except (TypeError, RuntimeError):
+        # torch < 2.1, or a checkpoint in the legacy (non-zip) format
+        return torch.load(path, map_location='cpu')
+
+
+def build_msclap_tower(version: str, use_cuda: bool, tower: str):
+    """
+    Return an msclap.CLAP wrapper whose `clap` module holds only one encoder.
+
+    The other encoder attribute is None. For the audio tower the GPT-2 text
+    model and its tokenizer are never constructed; for the text tower HTSAT
+    is skipped. Only the tower's entries are taken from the checkpoint.
+    """
+    import msclap
+    import torch
+    from msclap.models.clap import AudioEncoder, TextEncoder
+
+    class TowerCLAP(msclap.CLAP):
+        """msclap.CLAP that builds and loads a single encoder tower."""
+
+        def load_clap(self):
+            args = self.read_config_as_args(self.config_as_str, is_config_str=True)
+            if 'roberta' in args.text_model or 'clip' in args.text_model or 'gpt' in args.text_model:
+                self.token_keys = ['input_ids', 'attention_mask']
+            elif 'bert' in args.text_model:
+                self.token_keys = ['input_ids', 'token_type_ids', 'attention_mask']
+
+            clap = torch.nn.Module()
+            clap.audio_encoder = clap.caption_encoder = None
+            if tower == 'audio':
+                clap.audio_encoder = AudioEncoder(
+                    args.audioenc_name, args.out_emb, args.d_proj, args.sampling_rate, args.window_size,
+                    args.hop_size, args.mel_bins, args.fmin, args.fmax, args.num_classes)
+            else:
+                clap.caption_encoder = TextEncoder(args.d_proj, args.text_model, args.transformer_embed_dim)
+
+            prefix = _MSCLAP_TOWERS[tower][0] + '.'
+            state_dict = _load_checkpoint(self.model_fp)['model']
+            clap.load_state_dict({key: value for key, value in state_dict.items() if key.startswith(prefix)},
+                                 strict=False)
+            clap.eval()
+
+            tokenizer = None
+            if tower == 'text':
+                from transformers import AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(args.text_model)
+                if 'gpt' in args.text_model:
+                    tokenizer.add_special_tokens({'pad_token': '!'})
+
+            if self.use_cuda and torch.cuda.is_available():
+                clap = clap.cuda()
+            return clap, tokenizer, args
+
+    return TowerCLAP(version=version, use_cuda=use_cuda)
+
+
+def drop_tower(model, backend: str, tower: str):
+    """
+    Release the tower a loaded backend model does not need, in place.
+
+    Its submodules are replaced by None, so their weights are freed (or,
+    for a memory-mapped snapshot, never paged in).
+    """
+    if tower == 'both':
+        return model
+    if backend == 'msclap':
+        parent, names = model.clap, _MSCLAP_TOWERS[_other(tower)]
+        if tower == 'audio':
+            model.tokenizer = None
+    else:
+        parent, names = model.model, _LAION_TOWERS[_other(tower)]
+    for name in names:
+        if getattr(parent, name, None) is not None:
+            setattr(parent, name, None)
+    return model
+
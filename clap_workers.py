@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+CLAP Worker Pool
+Forks worker processes after the model has been loaded, so every worker
+runs the parent's model with its weight pages shared copy-on-write
+instead of loading a private copy. Each worker is pinned to its own CPU
+set with a matching torch thread count.
+"""
+
+import contextlib
+import gc
+import multiprocessing
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Engine handed to forked workers; only set while the pool is being created
+_MODEL = None
+
+
+def _cpu_sets(workers: int, threads: int):
+    """Split the CPUs this process may use into one contiguous set per worker (wrapping if oversubscribed)."""
+    try:
+        cpus = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return [None] * workers
+    return [sorted({cpus[(i * threads + j) % len(cpus)] for j in range(threads)}) for i in range(workers)]
+
+
+def _init_worker(counter, cpu_sets, threads: int, started):
+    """Pin this worker to its CPU set, size torch's thread pool to match and report in."""
+    import torch
+
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    cpus = cpu_sets[index % len(cpu_sets)]
+    if cpus is not None:
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(threads)
+    started.put({'pid': os.getpid(), 'cpus': cpus, 'threads': torch.get_num_threads()})
+
+
+def _noop():
+    return None
+
+
+def _call(method: str, batch, kwargs):
+    return getattr(_MODEL, method)(batch, **kwargs)
+
+
+def _release(executor):
+    executor.shutdown(wait=True, cancel_futures=True)
+
+
+class WorkerPool:
+    """
+    Forked processes that run embedding calls on an already loaded engine.
+
+    The pool forks once, at construction. Weights are only read during
+    inference, so their pages stay shared with the parent and total memory
+    stays close to one model however many workers run. Requires the fork
+    start method (Linux) and a model on CPU.
+    """
+
+    def __init__(self, model, workers: int = None, threads: int = None):
+        global _MODEL
+
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise ValueError("The worker pool needs the fork start method, which this platform lacks")
+        if model.device != 'cpu':
+            raise ValueError("The worker pool runs CPU models only; CUDA state cannot be forked")
+
+        try:
+            cpu_count = len(os.sched_getaffinity(0))
+        except AttributeError:
+            cpu_count = os.cpu_count() or 1
+        self.workers = workers or cpu_count
+        self.threads = threads or max(1, cpu_count // self.workers)
+        self.cpu_sets = _cpu_sets(self.workers, self.threads)
+
+        ctx = multiprocessing.get_context('fork')
+        counter = ctx.Value('i', 0)
+        started = ctx.Queue()
+        # Objects that exist at fork time are never moved by the collector in
+        # the workers, so its bookkeeping does not dirty the shared pages
+        gc.collect()
+        gc.freeze()
+        _MODEL = model
+        try:
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=ctx, initializer=_init_worker,
+                                                initargs=(counter, self.cpu_sets, self.threads, started))
+            # A fork-context executor starts every worker on the first submit; do it now,
+            # while _MODEL is set, and record where each worker ended up
+            self.executor.submit(_noop).result()
+            self.worker_info = [started.get(timeout=60) for _ in range(self.workers)]
+        finally:
+            _MODEL = None
+            gc.unfreeze()
+        self.broken = False
+        self._finalizer = weakref.finalize(self, _release, self.executor)
+
+    def submit(self, method: str, batch, **kwargs):
+        """Run model.<method>(batch, **kwargs) on a worker; return its future."""
+        return self.executor.submit(_call, method, batch, kwargs)
+
+    @contextlib.contextmanager
+    def running(self):
+        """
+        Wrap work that waits on this pool's futures: a worker that died
+        (usually killed by the kernel when memory ran short) marks the pool
+        broken, shuts it down and raises BrokenProcessPool saying so. The
+        batch cannot be retried on this pool.
+        """
+        try:
+            yield
+        except BrokenProcessPool as e:
+            self.broken = True
+            self.close()
+            raise BrokenProcessPool(
+                "A worker process died, most likely killed by the system when memory ran short; the worker pool "
+                "cannot be used again. Retry with fewer --workers, a smaller --batch-size or --max-memory-mb"
+            ) from e
+
+    def map(self, method: str, batches, **kwargs):
+        """Run model.<method>(batch, **kwargs) for each batch across the workers; yield results in order."""
+        with self.running():
+            futures = [self.submit(method, batch, **kwargs) for batch in batches]
+            for future in futures:
+                yield future.result()
+
+    def close(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
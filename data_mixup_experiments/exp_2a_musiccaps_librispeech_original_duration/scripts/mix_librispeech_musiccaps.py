@@ -15,7 +15,7 @@ import librosa
 # Add parent directory to path to import clap_similarity
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
 
-from clap_similarity import calculate_similarity_msclap
+from clap_similarity import get_model, embed_audio_batched, embed_text_batched, cosine_similarity_matrix
 
 # Paths
 SCRIPT_DIR = Path(__file__).parent
@@ -126,8 +126,7 @@ def run_mixup_experiment(num_mixtures=5):
     print("=" * 80)
 
     # Initialize CLAP model once
-    import msclap
-    model = msclap.CLAP(version='2023', use_cuda=False)
+    model = get_model('msclap', device='cpu')
 
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -173,22 +172,13 @@ def run_mixup_experiment(num_mixtures=5):
         print(f"  Combined: '{combined_desc}'")
 
         # Calculate CLAP similarity
-        audio_embeddings = model.get_audio_embeddings([str(mixed_audio_path)], resample=True)
-
-        # Test against combined description
-        text_embeddings_combined = model.get_text_embeddings([combined_desc])
-        audio_norm = audio_embeddings / np.linalg.norm(audio_embeddings, axis=1, keepdims=True)
-        text_norm_combined = text_embeddings_combined / np.linalg.norm(text_embeddings_combined, axis=1, keepdims=True)
-        similarity_combined = float((audio_norm @ text_norm_combined.T)[0][0])
-
-        # Test against individual descriptions
-        text_embeddings_speech = model.get_text_embeddings([librispeech_desc])
-        text_norm_speech = text_embeddings_speech / np.linalg.norm(text_embeddings_speech, axis=1, keepdims=True)
-        similarity_speech = float((audio_norm @ text_norm_speech.T)[0][0])
-
-        text_embeddings_dcase = model.get_text_embeddings([musiccaps_desc])
-        text_norm_dcase = text_embeddings_dcase / np.linalg.norm(text_embeddings_dcase, axis=1, keepdims=True)
-        similarity_musiccaps = float((audio_norm @ text_norm_dcase.T)[0][0])
+        audio_embeddings = embed_audio_batched(model, [mixed_audio_path], resample=True)
+
+        # Test against combined and individual descriptions in one text encoder call;
+        # component descriptions repeat across mixtures and come from the text cache
+        text_embeddings = embed_text_batched(model, [combined_desc, librispeech_desc, musiccaps_desc])
+        similarities = cosine_similarity_matrix(audio_embeddings, text_embeddings)[0]
+        similarity_combined, similarity_speech, similarity_musiccaps = (float(score) for score in similarities)
 
         print(f"  CLAP Scores - Combined: {similarity_combined:.4f} | Speech: {similarity_speech:.4f} | MusicCaps: {similarity_musiccaps:.4f}")
 
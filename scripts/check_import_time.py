@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Startup budget check for clap_similarity.
+Measures the cold import of clap_similarity with `python -X importtime` and
+fails if it exceeds the budget or pulls in heavy dependencies (torch, numpy,
+the CLAP backends) that should only load once a backend is used.
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).parent.parent
+
+# Modules that must not be imported by `import clap_similarity`
+HEAVY_MODULES = ['torch', 'numpy', 'msclap', 'laion_clap', 'transformers', 'librosa', 'torchaudio']
+
+# Cumulative import time budget in milliseconds
+DEFAULT_BUDGET_MS = 100
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_import(module: str = "clap_similarity"):
+    """Import module in a fresh interpreter; return (cumulative ms, set of imported modules)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        raise RuntimeError(f"import {module} failed")
+
+    cumulative_us = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        imported.add(name.split('.')[0])
+        if name == module:
+            cumulative_us = int(match.group(2))
+
+    if cumulative_us is None:
+        raise RuntimeError(f"no importtime entry for {module}")
+    return cumulative_us / 1000, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the cold import time of clap_similarity")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help=f"Maximum cumulative import time in milliseconds (default: {DEFAULT_BUDGET_MS})"
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=5,
+        help="Number of fresh interpreters to measure; the fastest run is compared (default: 5)"
+    )
+    args = parser.parse_args()
+
+    timings = []
+    imported = set()
+    for _ in range(args.runs):
+        elapsed_ms, modules = measure_import()
+        timings.append(elapsed_ms)
+        imported |= modules
+
+    best = min(timings)
+    heavy = sorted(set(HEAVY_MODULES) & imported)
+
+    print(f"import clap_similarity: best {best:.1f} ms, worst {max(timings):.1f} ms "
+          f"over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if heavy:
+        print(f"✗ Heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if best > args.budget_ms:
+        print(f"✗ Import time over budget by {best - args.budget_ms:.1f} ms")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("✓ Startup within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Shared fixtures. The tests cover the pure logic around the models and run
+against a stand-in engine, so no weights are downloaded.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class FakeEngine:
+    """The engine attributes and embedding methods the batching code uses, returning constant embeddings."""
+
+    backend = 'msclap'
+    version = '2023'
+    device = 'cpu'
+    precision = 'fp32'
+    runtime = None
+    sample_rate = 16000
+    clip_samples = 16000
+    checkpoint_path = None
+    preprocessing = {'sample_rate': 16000}
+
+    def __init__(self, dim: int = 4):
+        self.dim = dim
+
+    def embed_audio(self, audio_paths, resample=True):
+        return np.ones((len(audio_paths), self.dim), dtype=np.float32)
+
+    def embed_waveforms(self, waveforms):
+        return np.ones((len(waveforms), self.dim), dtype=np.float32)
+
+    def embed_text(self, texts):
+        return np.ones((len(texts), self.dim), dtype=np.float32)
+
+    def count_tokens(self, texts):
+        return [len(text.split()) for text in texts]
+
+
+@pytest.fixture
+def engine():
+    return FakeEngine()
@@ -0,0 +1,26 @@
+from clap_autotune import load_profile, save_profile
+
+
+def _profile(version='2023', precision='fp32'):
+    return {'intra_threads': 4, 'interop_threads': 1, 'instances': 1, 'batch_size': 16, 'clips_per_second': 10.0,
+            'backend': 'msclap', 'version': version, 'precision': precision}
+
+
+def test_profile_is_keyed_by_version_and_precision(tmp_path):
+    path = tmp_path / 'profiles.json'
+    save_profile(_profile(), path)
+
+    assert load_profile('msclap', '2023', 'fp32', path)['batch_size'] == 16
+    assert load_profile('msclap', '2023', 'int8', path) is None
+    assert load_profile('msclap', '2023', 'bf16', path) is None
+    assert load_profile('msclap', '2022', 'fp32', path) is None
+    assert load_profile('laion', '2023', 'fp32', path) is None
+
+
+def test_precisions_keep_their_own_profiles(tmp_path):
+    path = tmp_path / 'profiles.json'
+    save_profile(_profile(precision='fp32'), path)
+    save_profile({**_profile(precision='int8'), 'batch_size': 32}, path)
+
+    assert load_profile('msclap', '2023', 'fp32', path)['batch_size'] == 16
+    assert load_profile('msclap', '2023', 'int8', path)['batch_size'] == 32
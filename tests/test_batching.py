@@ -0,0 +1,16 @@
+import numpy as np
+
+from clap_batching import scatter_rows
+
+
+def test_scatter_rows_restores_input_order():
+    batches = [[2, 0], [3], [1]]
+    outputs = [np.array([[2.0, 20.0], [0.0, 0.0]]), np.array([[3.0, 30.0]]), np.array([[1.0, 10.0]])]
+
+    result = scatter_rows(batches, outputs, 4)
+    np.testing.assert_array_equal(result, [[0, 0], [1, 10], [2, 20], [3, 30]])
+    assert result.dtype == np.float64
+
+
+def test_scatter_rows_without_batches_is_empty():
+    assert scatter_rows([], [], 0).shape == (0, 0)
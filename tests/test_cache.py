@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+
+from clap_cache import AudioEmbeddingCache, EmbeddingStore, TextEmbeddingCache, cache_namespace
+from conftest import FakeEngine
+
+
+def _engine(checkpoint_path):
+    engine = FakeEngine()
+    engine.checkpoint_path = checkpoint_path
+    return engine
+
+
+def test_audio_key_hashes_file_bytes_without_decoding(tmp_path):
+    # Not audio at all: computing a key must not try to decode it
+    clip = tmp_path / "clip.wav"
+    clip.write_bytes(b"not really audio")
+    cache = AudioEmbeddingCache(_engine(None), cache_dir=tmp_path / "cache")
+
+    key = cache.key(clip, resample=True)
+    assert key == cache.key(clip, resample=True)
+    assert key != cache.key(clip, resample=False)
+
+    clip.write_bytes(b"different bytes")
+    assert cache.key(clip, resample=True) != key
+
+
+def test_checkpoints_with_the_same_backend_and_version_keep_separate_caches(tmp_path):
+    first, second = tmp_path / "first.pth", tmp_path / "second.pth"
+    first.write_bytes(b"weights one")
+    second.write_bytes(b"weights two")
+    assert cache_namespace('audio', _engine(first)) != cache_namespace('audio', _engine(second))
+
+    embedding = np.arange(4, dtype=np.float32)
+    cache = TextEmbeddingCache(_engine(first), cache_dir=tmp_path / "cache")
+    cache.put(cache.key("a dog barking"), embedding)
+
+    # Alternating between the checkpoints does not wipe the other one's entries
+    TextEmbeddingCache(_engine(second), cache_dir=tmp_path / "cache")
+    reopened = TextEmbeddingCache(_engine(first), cache_dir=tmp_path / "cache")
+    np.testing.assert_array_equal(reopened.get(reopened.key("a dog barking")), embedding)
+
+
+def test_changed_checkpoint_file_invalidates_its_namespace(tmp_path):
+    checkpoint = tmp_path / "model.pth"
+    checkpoint.write_bytes(b"weights one")
+    cache = TextEmbeddingCache(_engine(checkpoint), cache_dir=tmp_path / "cache")
+    cache.put(cache.key("rain"), np.ones(4, dtype=np.float32))
+
+    checkpoint.write_bytes(b"retrained weights")
+    reopened = TextEmbeddingCache(_engine(checkpoint), cache_dir=tmp_path / "cache")
+    assert reopened.get(reopened.key("rain")) is None
+
+
+def _entries(store, namespace):
+    return sorted(path.stem for path in (store.root / namespace).rglob('*.npy'))
+
+
+def test_eviction_drops_least_recently_used_entries(tmp_path):
+    store = EmbeddingStore(tmp_path, max_bytes=1 << 20)
+    for i, key in enumerate(["aa01", "bb02", "cc03"]):
+        store.put("audio", key, np.full(4, i, dtype=np.float32))
+        os.utime(store._path("audio", key), (1000 + i, 1000 + i))
+
+    # A hit makes the oldest entry the most recently used
+    assert store.get("audio", "aa01") is not None
+
+    entry_bytes = store._path("audio", "aa01").stat().st_size
+    store.max_bytes = 2 * entry_bytes
+    assert store.evict() == 2
+    assert _entries(store, "audio") == ["aa01"]
+
+    # Within the limit, nothing is evicted
+    assert store.evict() == 0
+
+
+def test_reset_namespace_only_clears_on_a_new_fingerprint(tmp_path):
+    store = EmbeddingStore(tmp_path, max_bytes=1 << 20)
+    assert store.reset_namespace("audio", "checkpoint-a")
+    store.put("audio", "aa01", np.ones(4, dtype=np.float32))
+    store.put("text", "bb02", np.ones(4, dtype=np.float32))
+
+    assert not store.reset_namespace("audio", "checkpoint-a")
+    assert _entries(store, "audio") == ["aa01"]
+
+    assert store.reset_namespace("audio", "checkpoint-b")
+    assert _entries(store, "audio") == []
+    assert (tmp_path / "audio" / "CHECKPOINT").read_text() == "checkpoint-b"
+    assert _entries(store, "text") == ["bb02"]
@@ -0,0 +1,52 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+
+import clap_similarity
+from conftest import FakeEngine
+
+
+class ThreadRecordingEngine(FakeEngine):
+    """Records torch's thread count as seen inside each tower, after a parallel op."""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = {}
+
+    def _record(self, tower):
+        # Large enough to enter a parallel region, which is where torch initializes a thread's count
+        torch.ones(256, 256) @ torch.ones(256, 256)
+        self.threads[tower] = torch.get_num_threads()
+
+    def embed_audio(self, audio_paths, resample=True):
+        self._record('audio')
+        return super().embed_audio(audio_paths, resample)
+
+    def embed_text(self, texts):
+        self._record('text')
+        return super().embed_text(texts)
+
+
+@pytest.fixture
+def eight_threads():
+    previous = torch.get_num_threads()
+    torch.set_num_threads(8)
+    yield
+    torch.set_num_threads(previous)
+
+
+@pytest.mark.parametrize('run', range(5))
+def test_towers_run_with_their_own_thread_counts(eight_threads, run):
+    engine = ThreadRecordingEngine()
+    audio, text = clap_similarity.embed_pair(engine, ['clip.wav'], ['a dog barking'], use_cache=False,
+                                             text_threads=2)
+    assert engine.threads == {'audio': 6, 'text': 2}
+    assert audio.shape == text.shape == (1, engine.dim)
+    assert torch.get_num_threads() == 8
+
+
+def test_no_overlap_keeps_thread_count(eight_threads):
+    engine = ThreadRecordingEngine()
+    clap_similarity.embed_pair(engine, ['clip.wav'], ['a dog barking'], use_cache=False, overlap=False)
+    assert engine.threads == {'audio': 8, 'text': 8}
+    assert torch.get_num_threads() == 8
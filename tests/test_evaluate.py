@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+import clap_evaluate
+from clap_evaluate import mean_average_precision, recall_at_k, roc_auc
+from clap_ledger import ResultsLedger
+from conftest import FakeEngine
+
+# Row 0 ranks its match first, row 1 second (behind 0.8), row 2 first
+MATRIX = np.array([
+    [0.9, 0.1, 0.5],
+    [0.2, 0.3, 0.8],
+    [0.4, 0.6, 0.7],
+])
+
+
+def test_recall_at_k_counts_queries_whose_match_is_in_the_top_k():
+    assert recall_at_k(MATRIX, np.eye(3, dtype=bool), ks=(1, 2, 5)) == {
+        'R@1': pytest.approx(2 / 3), 'R@2': 1.0, 'R@5': 1.0}
+
+
+def test_recall_at_k_ranks_tied_negatives_above_the_match():
+    assert recall_at_k(np.array([[0.5, 0.5]]), np.array([[True, False]]), ks=(1, 2)) == {'R@1': 0.0, 'R@2': 1.0}
+
+
+def test_mean_average_precision_by_hand():
+    # Average precisions 1, 1/2 and 1
+    assert mean_average_precision(MATRIX, np.eye(3, dtype=bool)) == pytest.approx(5 / 6)
+    # Matches at ranks 1 and 3: (1/1 + 2/3) / 2
+    assert mean_average_precision(np.array([[0.9, 0.8, 0.7, 0.6]]),
+                                  np.array([[True, False, True, False]])) == pytest.approx(5 / 6)
+    # A tie puts the match second
+    assert mean_average_precision(np.array([[0.5, 0.5]]), np.array([[True, False]])) == pytest.approx(0.5)
+
+
+def test_roc_auc_by_hand():
+    # 0.9 beats both negatives, 0.7 beats only 0.1
+    assert roc_auc(np.array([0.9, 0.7]), np.array([0.8, 0.1])) == pytest.approx(3 / 4)
+    # Ties count half
+    assert roc_auc(np.array([0.5]), np.array([0.5])) == pytest.approx(0.5)
+    assert roc_auc(np.array([0.5, 0.9]), np.array([0.5])) == pytest.approx(3 / 4)
+    assert roc_auc(np.array([]), np.array([0.5])) is None
+    assert roc_auc(np.array([0.5]), np.array([])) is None
+
+
+class CountingEngine(FakeEngine):
+    """Records which audio files reach the encoder."""
+
+    def __init__(self):
+        super().__init__()
+        self.embedded = []
+
+    def embed_audio(self, audio_paths, resample=True):
+        self.embedded.extend(audio_paths)
+        return super().embed_audio(audio_paths, resample)
+
+
+@pytest.fixture
+def clips(tmp_path):
+    soundfile = pytest.importorskip('soundfile')
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"clip_{i}.wav"
+        soundfile.write(path, np.full(1600, 0.1 * (i + 1), dtype=np.float32), 16000)
+        paths.append(str(path))
+    return paths
+
+
+def test_ledger_resume_only_scores_new_and_changed_files(tmp_path, clips):
+    import soundfile
+
+    cells = [(path, f"description {i}") for i, path in enumerate(clips)]
+    with ResultsLedger(tmp_path / "ledger.sqlite3") as ledger:
+        engine = CountingEngine()
+        first = clap_evaluate.score_cells(engine, cells[:2], ledger, use_cache=False)
+        assert sorted(engine.embedded) == sorted(clips[:2])
+
+        # Recorded cells come back from the ledger; only the new file is embedded
+        engine = CountingEngine()
+        scores = clap_evaluate.score_cells(engine, cells, ledger, use_cache=False)
+        assert engine.embedded == [clips[2]]
+        assert {cell: scores[cell] for cell in first} == first
+
+        # A file whose bytes changed is scored again
+        soundfile.write(clips[0], np.full(3200, 0.5, dtype=np.float32), 16000)
+        engine = CountingEngine()
+        clap_evaluate.score_cells(engine, cells, ledger, use_cache=False)
+        assert engine.embedded == [clips[0]]
@@ -0,0 +1,127 @@
+import contextlib
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('transformers')
+soundfile = pytest.importorskip('soundfile')
+
+import clap_export
+import clap_similarity
+from conftest import FakeEngine
+
+WORDS = "a dog barks in the distance rain falls on roof while cars pass by".split()
+
+# Stub text length: captions over this many tokens are truncated by the exported graph
+MAX_TOKENS = 8
+
+
+class AudioTower(torch.nn.Module):
+    input_names = ['waveform']
+
+    def __init__(self, clip_samples):
+        super().__init__()
+        self.projection = torch.nn.Linear(clip_samples, 8)
+
+    def forward(self, waveform):
+        return self.projection(waveform)
+
+
+class TextTower(torch.nn.Module):
+    """Mean of the token embeddings, so every token (and any truncation) changes the result."""
+
+    input_names = ['input_ids']
+
+    def __init__(self, vocab_size):
+        super().__init__()
+        self.embedding = torch.nn.Embedding(vocab_size, 8)
+
+    def forward(self, input_ids):
+        return self.embedding(input_ids).mean(dim=1)
+
+
+def _tokenizer():
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import PreTrainedTokenizerFast
+
+    vocab = {word: i for i, word in enumerate(['[PAD]', '[UNK]'] + WORDS)}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token='[UNK]'))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, pad_token='[PAD]', unk_token='[UNK]')
+
+
+class TowerEngine(FakeEngine):
+    """Runs the stub towers eagerly and, like msclap, reads texts of any length whole."""
+
+    clip_samples = 1600
+
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.audio_tower = AudioTower(self.clip_samples).eval()
+        self.text_tower = TextTower(len(WORDS) + 2).eval()
+        self.tokenizer = _tokenizer()
+        self.text_settings = {'suffix': '', 'max_length': MAX_TOKENS, 'truncation': False}
+
+    def embed_waveforms(self, waveforms):
+        with torch.no_grad():
+            return self.audio_tower(torch.as_tensor(np.asarray(waveforms, dtype=np.float32))).numpy()
+
+    def embed_text(self, texts):
+        tokens = clap_similarity.tokenize_texts(self.tokenizer, list(texts), **self.text_settings)
+        with torch.no_grad():
+            return self.text_tower(torch.as_tensor(tokens['input_ids'])).numpy()
+
+    def count_tokens(self, texts):
+        return [len(ids) for ids in self.tokenizer(list(texts))['input_ids']]
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = TowerEngine()
+    monkeypatch.setattr(clap_export, 'engine_towers', lambda engine: (
+        engine.audio_tower, engine.text_tower, engine.tokenizer, engine.text_settings, None))
+    monkeypatch.setattr(clap_export, '_traceable_htsat', lambda module_name: contextlib.nullcontext())
+    return engine
+
+
+@pytest.fixture
+def clips(tmp_path):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"clip_{i}.wav"
+        soundfile.write(path, (rng.standard_normal(1600) * 0.1).astype(np.float32), 16000)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize('fmt', ['onnx', 'torchscript'])
+def test_exported_towers_match_the_original(engine, clips, tmp_path, fmt):
+    if fmt == 'onnx':
+        pytest.importorskip('onnx')
+        pytest.importorskip('onnxruntime')
+    output_dir = clap_export.export_model(engine, tmp_path / fmt, fmt)
+    exported = clap_similarity.ExportedEngine(str(output_dir), 'cpu', 'fp32')
+
+    report = clap_export.check_parity(engine, exported, clips, ["a dog barks", "rain falls on roof", "cars pass by"])
+
+    for tower in ('audio', 'text'):
+        assert report[tower]['max_abs_diff'] < 1e-4
+        assert report[tower]['min_cosine'] > 0.9999
+        assert report[tower]['count'] == 3
+    assert 'truncated_text' not in report
+
+
+def test_truncated_descriptions_are_reported_apart_from_parity(engine, clips, tmp_path):
+    output_dir = clap_export.export_model(engine, tmp_path / 'torchscript', 'torchscript')
+    exported = clap_similarity.ExportedEngine(str(output_dir), 'cpu', 'fp32')
+    long_text = "a dog barks in the distance while rain falls on roof"
+
+    report = clap_export.check_parity(engine, exported, clips[:2], ["a dog barks", long_text])
+
+    assert report['text']['count'] == 1
+    assert report['text']['max_abs_diff'] < 1e-4
+    assert report['truncated_text']['count'] == 1
+    assert report['truncated_text']['max_abs_diff'] > 1e-4
@@ -0,0 +1,48 @@
+import json
+
+import numpy as np
+import pytest
+
+from clap_index import ClapIndex
+
+AUDIO = np.eye(4, dtype=np.float32)
+PATHS = ['a.wav', 'b.wav', 'c.wav', 'd.wav']
+
+
+@pytest.fixture(params=['exact', 'ivf'])
+def index(request):
+    # Only b and d have captions; each caption points the same way as its own clip
+    return ClapIndex(PATHS, AUDIO, 'msclap', '2023', ['caption b', 'caption d'], AUDIO[[1, 3]],
+                     engine=request.param, n_lists=1, caption_rows=[1, 3])
+
+
+def test_audio_queries_only_return_captioned_clips(index):
+    (results,) = index.search_captions(AUDIO[[3]], k=4)
+    assert results[0][:2] == ('d.wav', 'caption d')
+    assert {path for path, _, _ in results} == {'b.wav', 'd.wav'}
+
+    # A clip without a caption finds no caption of its own
+    (results,) = index.search_captions(AUDIO[[0]], k=4)
+    assert 'a.wav' not in {path for path, _, _ in results}
+
+
+def test_caption_rows_survive_save_and_load(index, tmp_path):
+    index.save(tmp_path / 'index')
+    loaded = ClapIndex.load(tmp_path / 'index')
+    assert loaded.caption_rows == [1, 3]
+    assert loaded.search_captions(AUDIO[[1]], k=1)[0][0][:2] == ('b.wav', 'caption b')
+
+
+def test_indexes_with_an_empty_caption_per_clip_load_without_them(tmp_path):
+    # The older layout: one caption (possibly empty) and one caption embedding per clip
+    ClapIndex(PATHS, AUDIO, 'msclap', '2023', ['', 'caption b', '', 'caption d'], AUDIO).save(tmp_path / 'index')
+    meta_path = tmp_path / 'index' / 'meta.json'
+    meta = json.loads(meta_path.read_text())
+    del meta['caption_rows']
+    meta_path.write_text(json.dumps(meta))
+
+    loaded = ClapIndex.load(tmp_path / 'index')
+    assert loaded.captions == ['caption b', 'caption d']
+    assert len(loaded.caption_index) == 2
+    (results,) = loaded.search_captions(AUDIO[[0]], k=4)
+    assert {path for path, _, _ in results} == {'b.wav', 'd.wav'}
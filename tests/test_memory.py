@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from clap_memory import MemoryGovernor, run_splitting
+from conftest import FakeEngine
+
+
+def _embed_at_most(max_rows, calls):
+    """An encoder that runs out of memory above max_rows inputs and otherwise embeds each input as itself."""
+
+    def embed(batch):
+        calls.append(len(batch))
+        if len(batch) > max_rows:
+            raise MemoryError()
+        return np.array(batch, dtype=np.float32)[:, None]
+
+    return embed
+
+
+def test_run_splitting_halves_until_batches_fit():
+    governor = MemoryGovernor(FakeEngine())
+    calls = []
+
+    result = run_splitting(_embed_at_most(2, calls), list(range(8)), governor, 'audio')
+
+    np.testing.assert_array_equal(result[:, 0], range(8))
+    # 8 and 4 fail; the second half of 4 is split before it is tried, under the learned limit
+    assert calls == [8, 4, 2, 2, 2, 2]
+    assert governor.max_rows == {'audio': 2}
+    assert governor.failures == 2
+
+
+def test_run_splitting_splits_batches_over_the_learned_limit_up_front():
+    governor = MemoryGovernor(FakeEngine())
+    governor.max_rows['audio'] = 3
+    calls = []
+
+    result = run_splitting(_embed_at_most(3, calls), list(range(6)), governor, 'audio')
+
+    np.testing.assert_array_equal(result[:, 0], range(6))
+    assert calls == [3, 3]
+    assert governor.failures == 0
+
+
+def test_run_splitting_gives_up_on_a_single_item_and_on_other_errors():
+    governor = MemoryGovernor(FakeEngine())
+    with pytest.raises(MemoryError):
+        run_splitting(_embed_at_most(0, []), [0, 1], governor, 'audio')
+
+    def broken(batch):
+        raise ValueError("not a memory problem")
+
+    with pytest.raises(ValueError):
+        run_splitting(broken, [0, 1, 2, 3], MemoryGovernor(FakeEngine()), 'audio')
+
+
+class LoadableEngine(FakeEngine):
+    """FakeEngine with the constructor and modules() the model registry expects."""
+
+    def __init__(self, version, device, precision, tower='both'):
+        super().__init__()
+        self.version = version
+
+    def modules(self):
+        return []
+
+
+def test_max_memory_mb_reaches_the_governor_used_by_evaluate(tmp_path, monkeypatch):
+    import importlib.util
+    import sys
+    from pathlib import Path
+
+    soundfile = pytest.importorskip('soundfile')
+
+    # Load the CLI the way `python clap_similarity.py` does: as a module that is not named clap_similarity,
+    # before anything has imported clap_similarity or the modules that do
+    monkeypatch.delitem(sys.modules, 'clap_similarity', raising=False)
+    monkeypatch.delitem(sys.modules, 'clap_evaluate', raising=False)
+    spec = importlib.util.spec_from_file_location(
+        'clap_script', Path(__file__).resolve().parent.parent / 'clap_similarity.py')
+    script = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, 'clap_script', script)
+    spec.loader.exec_module(script)
+    script._ENGINES['msclap'] = LoadableEngine
+
+    manifest = tmp_path / 'pairs.csv'
+    rows = ['audio,text']
+    for i in range(2):
+        soundfile.write(tmp_path / f'clip_{i}.wav', np.zeros(1600, dtype=np.float32), 16000)
+        rows.append(f'clip_{i}.wav,description {i}')
+    manifest.write_text('\n'.join(rows) + '\n')
+
+    monkeypatch.setattr(sys, 'argv', [
+        'clap_similarity.py', 'evaluate', '--manifest', str(manifest), '--max-memory-mb', '64',
+        '--no-ledger', '--no-cache', '--no-profile', '--no-cuda', '--results-dir', str(tmp_path / 'results')])
+    script.main()
+
+    assert sys.modules['clap_similarity'] is script
+    (engine,) = script._MODEL_REGISTRY.values()
+    assert engine.memory_governor.budget_bytes == 64 * 1024 * 1024
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+
+import pytest
+
+import clap_similarity
+from clap_similarity import clear_models, evict_models, get_model, set_model_memory_budget
+
+
+class StubEngine:
+    """Loads nothing; reports a fixed size to the registry's memory accounting."""
+
+    loads = 0
+
+    def __init__(self, version, device, precision, tower='both'):
+        StubEngine.loads += 1
+        self.version = version
+        self.device = device
+        self.precision = precision
+        self.tower = tower
+        self.artifact_bytes = 100
+
+    def modules(self):
+        return []
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """An empty registry with the stub registered as the 'stub' backend."""
+    monkeypatch.setitem(clap_similarity._ENGINES, 'stub', StubEngine)
+    monkeypatch.setitem(clap_similarity.DEFAULT_VERSIONS, 'stub', 'v1')
+    monkeypatch.setattr(clap_similarity, '_MODEL_REGISTRY', OrderedDict())
+    monkeypatch.setattr(clap_similarity, '_MODEL_MEMORY_BUDGET', None)
+    StubEngine.loads = 0
+    return clap_similarity._MODEL_REGISTRY
+
+
+def test_models_are_reused_per_backend_version_device_and_precision(registry):
+    engine = get_model('stub')
+    assert get_model('stub', 'v1', 'cpu', 'fp32') is engine
+    assert StubEngine.loads == 1
+    assert engine.memory_bytes == 100
+
+    assert get_model('stub', 'v2') is not engine
+    assert get_model('stub', 'v1', 'cuda') is not engine
+    assert get_model('stub', 'v1', 'cpu', 'int8') is not engine
+    assert StubEngine.loads == 4
+    assert list(registry) == [('stub', 'v1', 'cpu', 'fp32', 'both'), ('stub', 'v2', 'cpu', 'fp32', 'both'),
+                              ('stub', 'v1', 'cuda', 'fp32', 'both'), ('stub', 'v1', 'cpu', 'int8', 'both')]
+
+
+def test_a_loaded_model_serves_single_tower_requests():
+    engine = get_model('stub')
+    assert get_model('stub', tower='audio') is engine
+    assert get_model('stub', tower='text') is engine
+    assert StubEngine.loads == 1
+
+
+def test_invalid_requests_are_rejected():
+    with pytest.raises(ValueError, match="Unknown backend"):
+        get_model('missing')
+    with pytest.raises(ValueError, match="Unknown precision"):
+        get_model('stub', precision='fp8')
+    with pytest.raises(ValueError, match="runs on CPU only"):
+        get_model('stub', device='cuda', precision='int8')
+
+
+def test_eviction_drops_least_recently_used_models_first(registry):
+    first = get_model('stub', 'a')
+    get_model('stub', 'b')
+    get_model('stub', 'c')
+    # A hit makes the oldest model the most recently used
+    assert get_model('stub', 'a') is first
+
+    assert evict_models(budget_bytes=250) == [('stub', 'b', 'cpu', 'fp32', 'both')]
+    assert [key[1] for key in registry] == ['c', 'a']
+    assert evict_models(budget_bytes=250) == []
+
+
+def test_loading_over_the_budget_evicts_others_but_never_the_new_model(registry):
+    set_model_memory_budget(150)
+    get_model('stub', 'a')
+    get_model('stub', 'b')
+    assert [key[1] for key in registry] == ['b']
+
+    # A budget below one model still keeps the model just loaded
+    set_model_memory_budget(50)
+    assert [key[1] for key in registry] == []
+    get_model('stub', 'c')
+    assert [key[1] for key in registry] == ['c']
+
+
+def test_set_budget_evicts_to_fit_and_clear_models_unloads_everything(registry):
+    for version in 'abc':
+        get_model('stub', version)
+
+    assert set_model_memory_budget(200) == [('stub', 'a', 'cpu', 'fp32', 'both')]
+    assert set_model_memory_budget(None) == []
+    assert len(registry) == 2
+
+    assert len(clear_models()) == 2
+    assert not registry
+    get_model('stub', 'a')
+    assert StubEngine.loads == 4
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from clap_server import MicroBatcher
+
+
+def _collect(batcher, items):
+    """Submit items from one thread each, so they coalesce into shared batches."""
+    futures = [None] * len(items)
+    barrier = threading.Barrier(len(items))
+
+    def submit(i):
+        barrier.wait()
+        futures[i] = batcher.submit(items[i])
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(items))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return futures
+
+
+def test_results_follow_submission_order():
+    batcher = MicroBatcher(lambda items: [item * 10 for item in items], max_batch_size=4, max_wait_ms=50)
+    assert batcher.map(list(range(10))) == [item * 10 for item in range(10)]
+    assert batcher.items == 10
+    assert batcher.batches >= 3
+
+
+def test_concurrent_items_are_batched_and_get_their_own_results():
+    calls = []
+
+    def process(items):
+        calls.append(list(items))
+        return [f"result-{item}" for item in items]
+
+    batcher = MicroBatcher(process, max_batch_size=16, max_wait_ms=200)
+    futures = _collect(batcher, list(range(8)))
+    assert [future.result(timeout=5) for future in futures] == [f"result-{i}" for i in range(8)]
+    assert max(len(call) for call in calls) > 1
+
+
+def test_failing_item_only_fails_its_own_request():
+    def process(items):
+        if 'bad' in items:
+            raise ValueError("cannot read bad")
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(process, max_batch_size=16, max_wait_ms=200)
+    items = ['a', 'b', 'bad', 'c', 'd']
+    futures = _collect(batcher, items)
+    for item, future in zip(items, futures):
+        if item == 'bad':
+            with pytest.raises(ValueError, match="cannot read bad"):
+                future.result(timeout=5)
+        else:
+            assert future.result(timeout=5) == item.upper()
+    assert batcher.items == 4
+
+
+def test_towers_share_one_memory_governor(monkeypatch):
+    import time
+
+    import clap_memory
+    import clap_similarity
+    from conftest import FakeEngine
+
+    class SlowGovernor(clap_memory.MemoryGovernor):
+        def __init__(self, *args):
+            time.sleep(0.05)  # Widen the window between the check and the assignment
+            super().__init__(*args)
+
+    monkeypatch.setattr(clap_memory, 'MemoryGovernor', SlowGovernor)
+    engine = FakeEngine()
+    governors = [None] * 2
+
+    def get(i):
+        governors[i] = clap_similarity.get_memory_governor(engine)
+
+    threads = [threading.Thread(target=get, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert governors[0] is governors[1] is engine.memory_governor
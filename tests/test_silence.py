@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from clap_silence import active_span, trim_silence
+
+# 20-sample frames and a 100-sample margin
+SAMPLE_RATE = 1000
+
+
+def _tone(start, end, length=2000):
+    audio = np.zeros(length, dtype=np.float32)
+    audio[start:end] = 0.5
+    return audio
+
+
+@pytest.mark.parametrize('start, end, span', [
+    (500, 1000, (400, 1100)),
+    # The margin is clamped at both ends of the waveform
+    (0, 100, (0, 200)),
+    (1950, 2000, (1840, 2000)),
+    # A partly loud frame counts as loud, so the span covers whole frames
+    (510, 515, (400, 620)),
+])
+def test_trim_keeps_the_active_span_plus_margin(start, end, span):
+    audio = _tone(start, end)
+    assert active_span(audio, SAMPLE_RATE) == span
+    np.testing.assert_array_equal(trim_silence(audio, SAMPLE_RATE), audio[span[0]:span[1]])
+
+
+def test_silent_and_empty_audio_trim_to_nothing():
+    assert len(trim_silence(np.zeros(2000, dtype=np.float32), SAMPLE_RATE)) == 0
+    assert len(trim_silence(np.zeros(0, dtype=np.float32), SAMPLE_RATE)) == 0
+
+
+def test_untrimmed_loud_audio_is_kept_whole():
+    audio = _tone(0, 2000)
+    assert len(trim_silence(audio, SAMPLE_RATE)) == 2000
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+import clap_similarity
+from conftest import FakeEngine
+
+
+class PairEngine(FakeEngine):
+    """Audio and text embeddings 60 degrees apart, so every backend should score 0.5."""
+
+    def embed_audio(self, audio_paths, resample=True):
+        return np.tile(np.array([1, 0, 0, 0], dtype=np.float32), (len(audio_paths), 1))
+
+    def embed_text(self, texts):
+        return np.tile(np.array([0.5, np.sqrt(3) / 2, 0, 0], dtype=np.float32), (len(texts), 1))
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Replace get_model with a PairEngine factory and record what was asked for."""
+    calls = []
+
+    def get_model(backend, version=None, device='cpu', precision='fp32', use_compile=False):
+        calls.append((backend, version, precision))
+        engine = PairEngine()
+        engine.backend = backend
+        return engine
+
+    monkeypatch.setattr(clap_similarity, 'get_model', get_model)
+    return calls
+
+
+@pytest.mark.parametrize('wrapper, backend, version', [
+    (clap_similarity.calculate_similarity_msclap, 'msclap', '2022'),
+    (clap_similarity.calculate_similarity_laion, 'laion', '630k-best'),
+    (clap_similarity.calculate_similarity_exported, 'exported', 'exports/msclap'),
+])
+def test_backend_wrappers_share_one_path(loads, wrapper, backend, version):
+    score = wrapper('clip.wav', 'a dog barking', False, version, use_cache=False)
+
+    assert score == pytest.approx(0.5)
+    assert loads == [(backend, version, 'fp32')]
@@ -0,0 +1,84 @@
+import contextlib
+import os
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+import clap_similarity
+from clap_memory import MemoryGovernor, is_out_of_memory
+from conftest import FakeEngine
+
+
+class FakePool:
+    """Runs submissions inline; batches over max_rows fail with MemoryError."""
+
+    workers = 2
+    broken = False
+
+    def __init__(self, max_rows: int):
+        self.max_rows = max_rows
+        self.submitted = []
+
+    def submit(self, method, batch, **kwargs):
+        self.submitted.append(list(batch))
+        future = Future()
+        if len(batch) > self.max_rows:
+            future.set_exception(MemoryError())
+        else:
+            future.set_result(np.array([[float(item)] for item in batch], dtype=np.float32))
+        return future
+
+    @contextlib.contextmanager
+    def running(self):
+        yield
+
+
+def test_pool_batches_are_submitted_lazily_under_the_learned_limit():
+    pool = FakePool(max_rows=2)
+    governor = MemoryGovernor(FakeEngine())
+    batches = [list(range(i, i + 4)) for i in range(0, 16, 4)]
+
+    embedded = list(clap_similarity._iter_pool_embeddings(pool, governor, batches, resample=True))
+
+    np.testing.assert_array_equal(np.concatenate(embedded)[:, 0], np.arange(16))
+    # Only the batches in flight when the first one failed ran at full size
+    assert [batch for batch in pool.submitted if len(batch) > 2] == [batches[0], batches[1]]
+    assert governor.max_rows['audio'] == 2
+
+
+class DyingEngine(FakeEngine):
+    def die(self, batch):
+        os._exit(1)
+
+
+def test_dead_worker_breaks_the_pool_with_a_clear_error():
+    pytest.importorskip('torch')
+    from clap_workers import WorkerPool
+
+    pool = WorkerPool(DyingEngine(), workers=1, threads=1)
+    with pytest.raises(BrokenProcessPool, match="worker process died"):
+        list(pool.map('die', [[1]]))
+    assert pool.broken
+
+
+def test_broken_pool_is_not_treated_as_out_of_memory():
+    assert is_out_of_memory(MemoryError())
+    assert is_out_of_memory(RuntimeError("CUDA out of memory. Tried to allocate 2.00 GiB"))
+    assert not is_out_of_memory(BrokenProcessPool("A child process terminated abruptly"))
+    assert not is_out_of_memory(ValueError("out of memory"))
+
+
+@pytest.mark.parametrize('argv', [
+    ['clip.wav', 'caption.txt', '--workers', '2'],
+    ['clip.wav', 'caption.txt', '--decode-workers', '2'],
+    ['clip.wav', 'caption.txt', '--window', '5', '--workers', '2'],
+    ['compare', 'test_data', '--workers', '2'],
+])
+def test_modes_that_embed_in_process_reject_worker_options(argv, monkeypatch, capsys):
+    monkeypatch.setattr('sys.argv', ['clap_similarity.py'] + argv)
+    with pytest.raises(SystemExit) as exit_info:
+        clap_similarity.main()
+    assert exit_info.value.code == 2
+    assert 'workers' in capsys.readouterr().err